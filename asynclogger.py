@@ -0,0 +1,95 @@
+"""
+Python module with a MultiLogger for asyncio programs. Log calls only put
+the record on the queue of a background DispatchWorker, so the syslog
+sends and console writes never run on the event loop thread. flush(),
+aclose() and aget_email_log() return futures to await.
+Needs asyncio (Python 3); the methods return plain futures and not
+coroutines so that the module also imports on Python 2.
+
+Usage:
+    logger = AsyncMultiLogger(places={'logger': True, 'email': True,
+        'console': True}, facility='local1')
+    logger.info('request served', path)
+    await logger.flush()
+    await logger.aclose()
+"""
+
+from multilogger import MultiLogger
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+class AsyncMultiLogger(MultiLogger):
+    """
+    Class to log at the places of a MultiLogger from asyncio code without
+    blocking the event loop. The level methods, get_email_log() and the
+    other MultiLogger methods keep their behaviour; get_email_log() waits
+    for the queued records, use aget_email_log() to do that off the loop.
+    Init arguments: as MultiLogger, without background, and
+        overflow: policy when the queue is full, see DispatchWorker.
+                Default: 'drop-low-severity': records below WARNING are
+                dropped first and the calls logging them never wait for
+                the worker; WARNING and above only wait when every queued
+                record is WARNING or above
+        loop: event loop the futures belong to. Default: the running loop
+                at the time of the call
+    Class extends: MultiLogger
+    """
+    def __init__(self, places={'logger': True, 'email': True, 'console': False},
+            loglevel='INFO', facility=None, enable_color=True,
+            queue_size=10000, overflow='drop-low-severity', stats=True,
+            loop=None):
+        """
+        Constructor to initialize AsyncMultiLogger object.
+        """
+        if asyncio is None:
+            raise RuntimeError('AsyncMultiLogger needs asyncio (Python 3)')
+        MultiLogger.__init__(self, places, loglevel, facility, enable_color,
+            True, queue_size, overflow, stats)
+        self.loop = loop
+
+    def run_off_loop(self, method):
+        """
+        Return: future of 'method' run in the default executor of the loop
+        """
+        loop = self.loop or asyncio.get_event_loop()
+        return loop.run_in_executor(None, method)
+
+    def flush(self):
+        """
+        Return: future done once every record logged so far has reached
+        its places and buffered places have written it out
+        """
+        return self.run_off_loop(self.flush_now)
+
+    def flush_now(self):
+        """
+        Method to flush on the calling thread, like MultiLogger.flush()
+        """
+        MultiLogger.flush(self)
+
+    def aclose(self):
+        """
+        Return: future done once the queued records are logged and the
+        places are closed
+        """
+        return self.run_off_loop(self.close)
+
+    def aget_email_log(self, min_level=None, since=None, until=None,
+            contains=None, limit=None):
+        """
+        Return: future of get_email_log() with the same arguments
+        """
+        return self.run_off_loop(lambda: self.get_email_log(min_level, since,
+            until, contains, limit))
+
+    def sync_email_log(self):
+        """
+        Method to bring the email logs up to date on the calling thread
+        """
+        self.flush_now()
+        if self.aggregator is not None:
+            self.aggregator.collect()
@@ -1,3 +1,382 @@
+"""
+Python module with the standard every custom logger follows and the log
+record shared by all of them.
+"""
+
+import atexit
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+# Number of failure sites whose formatted stacks are kept by traceback_cache
+TRACEBACK_CACHE_SIZE = 256
+CAUSE_TEXT = ('\nThe above exception was the direct cause of the following '
+    'exception:\n\n')
+CONTEXT_TEXT = ('\nDuring handling of the above exception, another exception '
+    'occurred:\n\n')
+
+# Prefixed templates cached per LogContext
+MAX_CONTEXT_TEMPLATES = 1024
+# Names logging.Logger.makeRecord() refuses in 'extra'
+LOGGING_RESERVED = frozenset(list(logging.LogRecord('', logging.INFO, '', 0,
+    '', (), None).__dict__) + ['message', 'asctime'])
+
+try:
+    ExceptionGroup = BaseExceptionGroup
+except NameError:
+    ExceptionGroup = None
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def form_log_text(error_message, *args):
+    """
+    Method for forming a string using error_message & *args
+    """
+    messages = [error_message]
+    messages.extend(args)
+    try:
+        return ', '.join(messages)
+    except TypeError:
+        # Numbers, objects... are shown with their str() form
+        return ', '.join(['%s' % (message,) for message in messages])
+
+
+def text_args(args):
+    """
+    Method to return the args of a log call as strings, for places keeping
+    them to form the text later. Args that are not strings are replaced by
+    their str() form, so that a stored record can always be formed and
+    later changes to a mutable arg do not show in it
+    """
+    for arg in args:
+        if not isinstance(arg, string_types):
+            return tuple([isinstance(arg, string_types) and arg or
+                '%s' % (arg,) for arg in args])
+    return args
+
+
+class TracebackCache(object):
+    """
+    Bounded LRU of formatted stacks, keyed by the exception type and the
+    code location (code object, line & instruction) of every frame of the
+    traceback. A failure repeating at the same place costs a walk over the
+    traceback and a lookup; only the last line, holding the exception
+    value, is formatted each time. The text is the one
+    traceback.format_exception() gives, chained exceptions included
+    """
+    def __init__(self, size=TRACEBACK_CACHE_SIZE):
+        self.size = size
+        self.stacks = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def format(self, exc_info):
+        """
+        Return: the formatted traceback of an (type, value, traceback)
+        tuple as one string
+        """
+        etype, value, tb = exc_info
+        if etype is None:
+            return ''
+        return self.format_chain(etype, value, tb, set())
+
+    def format_chain(self, etype, value, tb, seen):
+        """
+        Method to format an exception after the ones it was raised from
+        """
+        if ExceptionGroup is not None and isinstance(value, ExceptionGroup):
+            # Printed as a tree of its exceptions, not worth caching
+            return ''.join(traceback.format_exception(etype, value, tb))
+        seen.add(id(value))
+        chunks = []
+        cause = getattr(value, '__cause__', None)
+        context = getattr(value, '__context__', None)
+        if cause is not None and id(cause) not in seen:
+            chunks.append(self.format_chain(type(cause), cause,
+                cause.__traceback__, seen))
+            chunks.append(CAUSE_TEXT)
+        elif (context is not None and id(context) not in seen and
+                not getattr(value, '__suppress_context__', False)):
+            chunks.append(self.format_chain(type(context), context,
+                context.__traceback__, seen))
+            chunks.append(CONTEXT_TEXT)
+        if tb is not None:
+            chunks.append(self.format_stack(etype, tb))
+        chunks.extend(traceback.format_exception_only(etype, value))
+        return ''.join(chunks)
+
+    def format_stack(self, etype, tb):
+        """
+        Return: the 'Traceback' header and the formatted frames of tb, from
+        the cache if the same type was raised at the same place before
+        """
+        key = [etype]
+        frame = tb
+        while frame is not None:
+            key.append((frame.tb_frame.f_code, frame.tb_lineno,
+                frame.tb_lasti))
+            frame = frame.tb_next
+        key = tuple(key)
+        self.lock.acquire()
+        try:
+            text = self.stacks.pop(key, None)
+            if text is not None:
+                self.stacks[key] = text
+                self.hits += 1
+                return text
+            self.misses += 1
+        finally:
+            self.lock.release()
+        text = 'Traceback (most recent call last):\n' + ''.join(
+            traceback.format_list(traceback.extract_tb(tb)))
+        self.lock.acquire()
+        try:
+            self.stacks[key] = text
+            while len(self.stacks) > self.size:
+                self.stacks.popitem(False)
+        finally:
+            self.lock.release()
+        return text
+
+    def stats(self):
+        """
+        Return: dictionary with the hits, misses and size of the cache
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+            'size': len(self.stacks)}
+
+
+# Shared by all loggers, so a failure logged in several places or by
+# several loggers is formatted once
+traceback_cache = TracebackCache()
+
+
+class LogContext(object):
+    """
+    Fields bound to a logger by MultiLogger.bind(). Their text forms are
+    rendered once, when the context is created or first used, and reused
+    by every record logged with it:
+        prefix: '[request_id=42 job=import] ', put before the messages
+        extra: the fields the logging module accepts as 'extra'
+        prefixed(): error_message templates with the prefix, cached
+    A nested bind() starts from the fields of its parent; fields bound
+    again take the new value. The prefix shows the values as they were at
+    bind time
+    """
+    __slots__ = ('items', 'fields', 'prefix', 'extra', 'templates')
+
+    def __init__(self, fields, parent=None):
+        items = []
+        if parent is not None:
+            items = [(key, fields.get(key, value))
+                for key, value in parent.items]
+        for key in sorted(fields):
+            if parent is None or key not in parent.fields:
+                items.append((key, fields[key]))
+        self.items = tuple(items)
+        self.fields = dict(items)
+        self.prefix = '[%s] ' % ' '.join(['%s=%s' % (key, value)
+            for key, value in items])
+        self.extra = dict((key, value) for key, value in items
+            if key not in LOGGING_RESERVED)
+        self.templates = {}
+
+    def prefixed(self, error_message):
+        """
+        Return: error_message with the prefix put before it
+        """
+        templates = self.templates
+        template = templates.get(error_message)
+        if template is None:
+            template = self.prefix + error_message
+            if len(templates) < MAX_CONTEXT_TEMPLATES:
+                templates[error_message] = template
+        return template
+
+
+class LogRecord(object):
+    """
+    A single log call. MultiLogger creates one record per call and hands the
+    same record to every place it logs in. The message is formed from
+    error_message & args when it is first used and reused afterwards.
+    levelname is one of DEBUG, INFO, WARNING, ERROR, EXCEPTION & CRITICAL.
+    The traceback of kwargs['exc_info'] is likewise formatted once, see
+    exc_text. Records of bound loggers carry their LogContext in 'context'
+    """
+    __slots__ = ('levelno', 'levelname', 'created', 'error_message', 'args',
+        'kwargs', 'context', '_message', '_exc_text')
+
+    def __init__(self, levelno, levelname, error_message, args=(),
+            kwargs=None, created=None, context=None):
+        self.levelno = levelno
+        self.levelname = levelname
+        if created is None:
+            created = time.time()
+        self.created = created
+        self.error_message = error_message
+        self.args = args
+        self.kwargs = kwargs
+        self.context = context
+        self._message = None
+        self._exc_text = None
+
+    @property
+    def message(self):
+        """
+        The log text formed from error_message & args, after the prefix
+        of the context
+        """
+        if self._message is None:
+            template = self.error_message
+            if self.context is not None:
+                template = self.context.prefixed(template)
+            self._message = form_log_text(template, *self.args)
+        return self._message
+
+    @property
+    def size(self):
+        """
+        Length of the message. Before the message is formed it is added up
+        from the lengths of the template & args, without forming it; args
+        that are not strings count as empty
+        """
+        if self._message is not None:
+            return len(self._message)
+        size = 2 * len(self.args)
+        for text in (self.template,) + tuple(self.args):
+            if isinstance(text, string_types):
+                size += len(text)
+        return size
+
+    @property
+    def template(self):
+        """
+        error_message with the prefix of the context, if any
+        """
+        if self.context is None:
+            return self.error_message
+        return self.context.prefixed(self.error_message)
+
+    @property
+    def fields(self):
+        """
+        The bound fields of the record, as a dictionary
+        """
+        if self.context is None:
+            return {}
+        return self.context.fields
+
+    @property
+    def exc_text(self):
+        """
+        The formatted traceback of kwargs['exc_info'] ('' without one),
+        through traceback_cache. exc_info True stands for sys.exc_info() at
+        the time of the first use
+        """
+        if self._exc_text is None:
+            text = ''
+            exc_info = self.kwargs and self.kwargs.get('exc_info')
+            if exc_info:
+                if not isinstance(exc_info, tuple):
+                    exc_info = sys.exc_info()
+                text = traceback_cache.format(exc_info)
+            self._exc_text = text
+        return self._exc_text
+
+
+# Objects with a method to call at exit, mapped to (order added, method
+# name). Weak so that it keeps neither closed nor dropped loggers alive
+exit_hooks = weakref.WeakKeyDictionary()
+exit_hooks_lock = threading.Lock()
+exit_hooks_added = [0]
+
+
+def call_at_exit(obj, method):
+    """
+    Method to call obj.<method>() at interpreter exit, the objects added
+    last first as with atexit. obj is only weakly referenced; close()
+    methods take it out again with cancel_at_exit()
+    """
+    exit_hooks_lock.acquire()
+    try:
+        exit_hooks_added[0] += 1
+        exit_hooks[obj] = (exit_hooks_added[0], method)
+    finally:
+        exit_hooks_lock.release()
+
+
+def cancel_at_exit(obj):
+    """
+    Method to undo call_at_exit() for obj
+    """
+    exit_hooks_lock.acquire()
+    try:
+        exit_hooks.pop(obj, None)
+    finally:
+        exit_hooks_lock.release()
+
+
+def run_exit_hooks():
+    """
+    Method registered with atexit, once, to call the methods added by
+    call_at_exit() of the objects still alive
+    """
+    exit_hooks_lock.acquire()
+    try:
+        hooks = sorted([(order, method, obj) for obj, (order, method) in
+            list(exit_hooks.items())], key=lambda hook: hook[0], reverse=True)
+        exit_hooks.clear()
+    finally:
+        exit_hooks_lock.release()
+    for order, method, obj in hooks:
+        try:
+            getattr(obj, method)()
+        except Exception:
+            traceback.print_exc()
+
+
+atexit.register(run_exit_hooks)
+
+
+class PeriodicFlusher(object):
+    """
+    Daemon thread calling 'flush' every 'interval' seconds until stopped.
+    Used by the buffering loggers for their time based flush. The thread
+    is stopped at exit, before the interpreter tears down
+    """
+    def __init__(self, flush, interval):
+        self.flush = flush
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+            name='multilogger-flush')
+        self.thread.daemon = True
+        self.thread.start()
+        call_at_exit(self, 'stop')
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def stop(self):
+        cancel_at_exit(self)
+        self.stopped.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+
 class BaseLoggerClass(object):
     """
     class to be inherited by custom loggers. This class serves as a standard
@@ -46,13 +425,35 @@ class BaseLoggerClass(object):
         """
         pass
 
+    def emit(self, record):
+        """
+        Logs a LogRecord on this logger. Level filtering is done by the
+        caller. Child loggers override this to use record.message instead
+        of forming the text again; by default the level method is called
+        """
+        if record.levelname == 'EXCEPTION':
+            self.exception(record.error_message, *record.args)
+        else:
+            getattr(self, record.levelname.lower())(record.error_message,
+                *record.args, **(record.kwargs or {}))
+
+    def flush(self):
+        """
+        Writes out any buffered logs. Nothing to do by default
+        """
+        pass
+
+    def close(self):
+        """
+        Flushes and releases the resources held by this logger. Nothing to
+        do by default
+        """
+        pass
+
     def form_log_text(self, error_message, *args, **kwargs):
         """
         Common method across all child loggers for forming a string using
         error_message, *args & **kwargs
         TODO: kwargs for string formation not added
         """
-        messages = [error_message]
-        messages.extend(args)
-        final_message = ', '.join(messages)
-        return final_message
+        return form_log_text(error_message, *args)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark of mailing the email logs of many failing jobs to a local SMTP
+stand-in: a new smtplib connection per mail, as scripts do, against
+EmailSender with pooled connections and with a digest. Reports the time
+the jobs spend handing over their log, the total time until all mails are
+sent and the connections and mails the server saw.
+Usage: python benchmarks/bench_email_sender.py [jobs] [server delay]
+"""
+
+import os
+import smtplib
+import sys
+
+from email.mime.text import MIMEText
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+from standins import SMTPServer
+from emailsender import EmailSender
+from multilogger import MultiLogger
+
+PLACES = {'logger': False, 'email': True, 'console': False}
+
+
+def failed_job(index):
+    logger = MultiLogger(PLACES)
+    logger.info('starting job', str(index))
+    logger.error('job failed', str(index))
+    return logger
+
+
+def bench_smtplib(server, jobs):
+    start = default_timer()
+    for index in range(jobs):
+        logger = failed_job(index)
+        message = MIMEText(logger.get_email_log())
+        message['Subject'] = 'job %d' % index
+        smtp = smtplib.SMTP(*server.address)
+        smtp.sendmail('jobs@localhost', ['ops@localhost'],
+            message.as_string())
+        smtp.quit()
+    elapsed = default_timer() - start
+    return elapsed, elapsed
+
+
+def bench_sender(server, jobs, **kwargs):
+    sender = EmailSender('jobs@localhost', ['ops@localhost'],
+        *server.address, **kwargs)
+    start = default_timer()
+    for index in range(jobs):
+        failed_job(index).send_email_log(sender, 'job %d' % index)
+    handed_over = default_timer() - start
+    sender.close()
+    return handed_over, default_timer() - start
+
+
+def main():
+    jobs = len(sys.argv) > 1 and int(sys.argv[1]) or 200
+    delay = len(sys.argv) > 2 and float(sys.argv[2]) or 0.0
+    for name, bench, kwargs in (
+            ('smtplib per mail', bench_smtplib, {}),
+            ('EmailSender pool=4', bench_sender, {'pool_size': 4}),
+            ('EmailSender digest', bench_sender, {'digest_interval': 60})):
+        server = SMTPServer(delay).start()
+        handed_over, total = bench(server, jobs, **kwargs)
+        server.stop()
+        sys.stdout.write('%-20s jobs %.3fs, all sent %.3fs, %d connections, '
+            '%d mails\n' % (name, handed_over, total, server.connections,
+            len(server.messages)))
+
+
+if __name__ == '__main__':
+    main()
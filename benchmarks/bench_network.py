@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+End-to-end check of the 'network' place: a MultiLogger ships records to a
+LogCollector on this machine. Reports the rate of the log calls, the time
+until every record arrived, the bytes sent per record and the records lost,
+with and without compression, across a collector restart and with a
+collector too slow to keep up.
+Usage: python benchmarks/bench_network.py [records]
+"""
+
+import os
+import sys
+import time
+
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+from logcollector import LogCollector
+from multilogger import MultiLogger
+
+
+class Counter(object):
+    """
+    Collector handler counting the distinct records, and the ones received
+    again after a reconnect, optionally sleeping per batch
+    """
+    def __init__(self, delay=0.0):
+        self.received = 0
+        self.duplicates = 0
+        self.seen = set()
+        self.delay = delay
+
+    def __call__(self, source, records):
+        for record in records:
+            if record[2] in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(record[2])
+                self.received += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+
+def network_logger(port, **options):
+    options['address'] = ('127.0.0.1', port)
+    return MultiLogger(places={'logger': False, 'email': False,
+        'console': False, 'network': options}, stats=False)
+
+
+def wait_for(counter, records, timeout=30):
+    deadline = time.time() + timeout
+    while counter.received < records and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def throughput(records, compress_level):
+    counter = Counter()
+    collector = LogCollector(('127.0.0.1', 0), counter)
+    collector.start()
+    logger = network_logger(collector.address[1],
+        compress_level=compress_level)
+    start = default_timer()
+    for i in range(records):
+        logger.info('request served in', str(i), 'ms')
+    logged = default_timer() - start
+    wait_for(counter, records)
+    delivered = default_timer() - start
+    logger.close()
+    collector.stop()
+    sys.stdout.write('compress %-4s: %9.0f calls/s, all delivered after '
+        '%.3fs, %5.1f bytes/record, %d lost\n' % (compress_level, records /
+        logged, delivered, float(collector.bytes) / max(1, counter.received),
+        records - counter.received))
+
+
+def restart(records):
+    counter = Counter()
+    collector = LogCollector(('127.0.0.1', 0), counter)
+    collector.start()
+    port = collector.address[1]
+    logger = network_logger(port, max_backoff=0.2)
+    half = records // 2
+    for i in range(half):
+        logger.info('before restart', str(i))
+    wait_for(counter, half)
+    collector.stop()
+    for i in range(half, records):
+        logger.info('while down', str(i))
+    collector = LogCollector(('127.0.0.1', port), counter)
+    collector.start()
+    wait_for(counter, records)
+    logger.close()
+    collector.stop()
+    sys.stdout.write('restart      : %d of %d received, %d twice, %d '
+        'dropped\n' % (counter.received, records, counter.duplicates,
+        logger.network_logger.dropped))
+
+
+def slow_collector(records):
+    counter = Counter(delay=0.01)
+    collector = LogCollector(('127.0.0.1', 0), counter)
+    collector.start()
+    logger = network_logger(collector.address[1],
+        max_pending_bytes=256 * 1024)
+    slowest = 0.0
+    for i in range(records):
+        before = default_timer()
+        logger.info('slow collector', str(i))
+        slowest = max(slowest, default_timer() - before)
+    network = logger.network_logger
+    network.flush(30)
+    logger.close()
+    collector.stop()
+    sys.stdout.write('slow         : slowest call %.1fus, %d received, %d '
+        'dropped, %d lost otherwise\n' % (slowest * 1e6, counter.received,
+        network.dropped, records - counter.received - network.dropped))
+
+
+def main():
+    records = len(sys.argv) > 1 and int(sys.argv[1]) or 200000
+    throughput(records, None)
+    throughput(records, 6)
+    restart(records)
+    slow_collector(records)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark of burst throughput to the system logger: the stock
+logging SysLogHandler against SysLogLogger, both sending to a local Unix
+datagram stand-in for rsyslog.
+Usage: python benchmarks/bench_syslog.py [records]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+from logging.handlers import SysLogHandler
+from standins import UnixDatagramServer
+from sysloglogger import SysLogLogger
+
+
+def wait_received(server, count, timeout=5.0):
+    deadline = time.time() + timeout
+    while server.received < count and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def bench_sysloghandler(server, records):
+    logger = logging.getLogger('bench_sysloghandler')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = SysLogHandler(address=server.path, facility='local1')
+    handler.setFormatter(logging.Formatter('%(name)s: %(levelname)s %(message)r'))
+    logger.addHandler(handler)
+    start = time.time()
+    for i in range(records):
+        logger.info('burst record %d', i)
+    elapsed = time.time() - start
+    logger.removeHandler(handler)
+    handler.close()
+    return elapsed
+
+
+def bench_sysloglogger(server, records):
+    logger = SysLogLogger('INFO', 'local1', address=server.path)
+    start = time.time()
+    for i in range(records):
+        logger.info('burst record', str(i))
+    logger.flush()
+    elapsed = time.time() - start
+    logger.close()
+    return elapsed
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, bench in (('SysLogHandler', bench_sysloghandler),
+            ('SysLogLogger', bench_sysloglogger)):
+        server = UnixDatagramServer().start()
+        elapsed = bench(server, records)
+        wait_received(server, records)
+        server.stop()
+        sys.stdout.write('%-14s %8d records %8.3fs %10.0f records/s '
+            '%8d received\n' % (name, records, elapsed, records / elapsed,
+            server.received))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Failover check of SysLogLogger: logs a burst while the rsyslog stand-in is
+stopped, starts it again and reports how many records arrived, the time
+the log calls took while it was down, and what went through the spool.
+Usage: python benchmarks/bench_syslog_failover.py [records]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+from standins import UnixDatagramServer
+from sysloglogger import SysLogLogger
+
+
+def main():
+    records = len(sys.argv) > 1 and int(sys.argv[1]) or 20000
+    spool_dir = tempfile.mkdtemp()
+    server = UnixDatagramServer().start()
+    logger = SysLogLogger('INFO', 'local1', server.path, flush_interval=0.1,
+        spool_path=os.path.join(spool_dir, 'syslog.spool'))
+    try:
+        server.stop()
+        slowest = 0.0
+        start = default_timer()
+        for i in range(records):
+            before = default_timer()
+            logger.info('while rsyslog is down', str(i))
+            slowest = max(slowest, default_timer() - before)
+        elapsed = default_timer() - start
+        sys.stdout.write('logged %d records while down in %.3fs, slowest '
+            'call %.1fus, %d spooled\n' % (records, elapsed, slowest * 1e6,
+            logger.spooled))
+        server.start()
+        deadline = time.time() + 30
+        while server.received < records and time.time() < deadline:
+            time.sleep(0.05)
+        sys.stdout.write('received %d of %d after restart, %d dropped, '
+            'circuit open: %s\n' % (server.received, records, logger.dropped,
+            logger.circuit_open))
+    finally:
+        logger.close()
+        server.stop()
+        shutil.rmtree(spool_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Compare two JSON result files of run_benchmarks.py, e.g. of two versions.
+Every timing is printed with the ratio new / old; ratios above 'threshold'
+for throughput drops or latency increases are marked as regressions.
+Usage: python benchmarks/compare.py OLD.json NEW.json [threshold]
+"""
+
+import json
+import sys
+
+# Metrics where a higher value is better; for all others lower is better
+HIGHER_IS_BETTER = ('records_per_second',)
+COMPARED = ('records_per_second', 'p50_us', 'p99_us', 'bytes_per_record',
+    'first_call_seconds', 'after_append_seconds', 'query_seconds')
+
+
+def flatten(results, prefix=''):
+    values = {}
+    for key, value in results.items():
+        if key == 'meta':
+            continue
+        if isinstance(value, dict):
+            values.update(flatten(value, prefix + key + '/'))
+        elif key in COMPARED:
+            values[prefix + key] = value
+    return values
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.stderr.write(__doc__.strip() + '\n')
+        sys.exit(2)
+    old = flatten(json.load(open(sys.argv[1])))
+    new = flatten(json.load(open(sys.argv[2])))
+    threshold = len(sys.argv) > 3 and float(sys.argv[3]) or 1.1
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        if not old[name] or not new[name]:
+            continue
+        ratio = float(new[name]) / old[name]
+        slower = name.rsplit('/', 1)[1] in HIGHER_IS_BETTER and (
+            1 / ratio) or ratio
+        mark = ''
+        if slower > threshold:
+            mark = '  REGRESSION'
+            regressions += 1
+        sys.stdout.write('%-60s %14.3f %14.3f %7.2fx%s\n' % (name, old[name],
+            new[name], ratio, mark))
+    sys.stdout.write('%d regressions above %.2fx\n' % (regressions,
+        threshold))
+    sys.exit(regressions and 1 or 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for MultiLogger, EmailLogger and ConsoleLogger. The places
+are swapped for local stand-ins: a Unix datagram receiver for rsyslog and
+/dev/null for the console. Results are written as JSON so that two runs,
+e.g. of two versions, can be compared with compare.py.
+Usage: python benchmarks/run_benchmarks.py [--records N] [--output FILE]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir))
+
+import base_logger
+
+from standins import UnixDatagramServer
+from emaillogger import EmailLogger
+from multilogger import MultiLogger
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+LEVEL_METHODS = ('debug', 'info', 'warning', 'error', 'exception', 'critical')
+PLACE_COMBINATIONS = (
+    ('email', ('email',)),
+    ('console', ('console',)),
+    ('logger', ('logger',)),
+    ('email+console', ('email', 'console')),
+    ('all', ('logger', 'email', 'console')),
+)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def time_calls(call, records):
+    """
+    Return: throughput and per call latency percentiles of 'call'
+    """
+    latencies = []
+    append = latencies.append
+    gc.disable()
+    try:
+        start = default_timer()
+        for i in range(records):
+            before = default_timer()
+            call(i)
+            append(default_timer() - before)
+        elapsed = default_timer() - start
+    finally:
+        gc.enable()
+    latencies.sort()
+    return {
+        'records': records,
+        'seconds': elapsed,
+        'records_per_second': records / elapsed,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+    }
+
+
+def make_logger(places, server, devnull, loglevel='DEBUG'):
+    options = {
+        'logger': 'logger' in places and {'address': server.path} or False,
+        'email': 'email' in places,
+        'console': 'console' in places and {'stream': devnull} or False,
+    }
+    return MultiLogger(options, loglevel, facility='local1')
+
+
+def bench_level_methods(records, server, devnull):
+    results = {}
+    for name, places in PLACE_COMBINATIONS:
+        for method in LEVEL_METHODS:
+            logger = make_logger(places, server, devnull)
+            log = getattr(logger, method)
+            if method == 'exception':
+                try:
+                    raise ValueError('benchmark')
+                except ValueError:
+                    result = time_calls(lambda i: log('record', str(i)),
+                        records)
+            else:
+                result = time_calls(lambda i: log('record', str(i)), records)
+            logger.close()
+            results['%s/%s' % (name, method)] = result
+    return results
+
+
+def bench_disabled_levels(records, server, devnull):
+    logger = make_logger(('logger', 'email', 'console'), server, devnull,
+        'CRITICAL')
+    results = {
+        'debug': time_calls(lambda i: logger.debug('record', str(i)), records),
+        'is_enabled_for': time_calls(lambda i: logger.is_enabled_for(10),
+            records),
+    }
+    logger.close()
+    return results
+
+
+def failing_call(depth):
+    if depth:
+        return failing_call(depth - 1)
+    return {}['missing']
+
+
+def bench_tracebacks(records, devnull):
+    """
+    exception() for a failure repeating at one place, with the traceback
+    cache and with every traceback formatted anew
+    """
+    results = {}
+    cache = base_logger.traceback_cache
+    size = cache.size
+    for name, cache_size in (('cached', size), ('uncached', 0)):
+        cache.size = cache_size
+        cache.stacks.clear()
+        logger = MultiLogger({'logger': False, 'email': True,
+            'console': {'stream': devnull}}, 'DEBUG')
+
+        def call(i):
+            try:
+                failing_call(10)
+            except KeyError:
+                logger.exception('lookup failed', str(i))
+        results[name] = time_calls(call, records)
+        logger.close()
+    cache.size = size
+    return results
+
+
+def bench_bound_logger(records, devnull):
+    """
+    info() with context fields: bound with bind(), concatenated by the
+    caller, and without fields for reference
+    """
+    fields = {'request_id': 'r-1', 'job_id': 7, 'host': 'node1'}
+    prefix = '[host=node1 job_id=7 request_id=r-1] '
+    results = {}
+    for name in ('plain', 'concatenated', 'bound'):
+        logger = MultiLogger({'logger': False, 'email': True,
+            'console': {'stream': devnull}}, 'DEBUG')
+        bound = logger.bind(**fields)
+        if name == 'plain':
+            call = lambda i: logger.info('served in', str(i))
+        elif name == 'concatenated':
+            call = lambda i: logger.info(prefix + 'served in', str(i))
+        else:
+            call = lambda i: bound.info('served in', str(i))
+        results[name] = time_calls(call, records)
+        logger.close()
+    return results
+
+
+def bench_profiling(records, devnull):
+    """
+    info() with profiling mode off and on
+    """
+    results = {}
+    for name in ('off', 'on'):
+        logger = MultiLogger({'logger': False, 'email': True,
+            'console': {'stream': devnull}}, 'DEBUG')
+        logger.set_profiling(name == 'on')
+        results[name] = time_calls(lambda i: logger.info('record', str(i)),
+            records)
+        logger.close()
+    return results
+
+
+def stored_size(email_logger):
+    """
+    Return: bytes held by the record columns & rendered chunks of an
+    EmailLogger, summed with sys.getsizeof. Objects shared between records,
+    like the templates, are counted once. Used where tracemalloc is missing
+    """
+    seen = set()
+    total = [0]
+
+    def add(obj):
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            total[0] += sys.getsizeof(obj)
+    for column in (email_logger.log_times, email_logger.log_levels):
+        add(column)
+    for column in (email_logger.log_templates, email_logger.log_args,
+            email_logger._rendered or []):
+        add(column)
+        for item in column:
+            add(item)
+            if isinstance(item, tuple):
+                for arg in item:
+                    add(arg)
+    add(email_logger.log_elided)
+    return total[0]
+
+
+def bench_email_memory(counts):
+    results = {}
+    for count in counts:
+        gc.collect()
+        if tracemalloc is not None:
+            tracemalloc.start()
+        email_logger = EmailLogger('DEBUG')
+        for i in range(count):
+            email_logger.info('record', str(i))
+        if tracemalloc is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measure = 'tracemalloc'
+        else:
+            current = peak = stored_size(email_logger)
+            measure = 'getsizeof'
+        results[str(count)] = {'bytes': current, 'peak_bytes': peak,
+            'bytes_per_record': float(current) / count, 'measure': measure}
+        del email_logger
+    return results
+
+
+def bench_get_email_log(counts):
+    results = {}
+    for count in counts:
+        email_logger = EmailLogger('DEBUG')
+        for i in range(count):
+            email_logger.info('record', str(i))
+        start = default_timer()
+        text = email_logger.get_email_log()
+        first = default_timer() - start
+        email_logger.info('one more')
+        start = default_timer()
+        email_logger.get_email_log()
+        rebuilt = default_timer() - start
+        results[str(count)] = {'first_call_seconds': first,
+            'after_append_seconds': rebuilt, 'characters': len(text)}
+    return results
+
+
+def bench_email_query(count):
+    email_logger = EmailLogger('DEBUG')
+    for i in range(count):
+        if i % 100 == 0:
+            email_logger.error('request failed', str(i))
+        else:
+            email_logger.info('request served', str(i))
+    middle = email_logger.log_times[count * 95 // 100]
+    queries = {
+        'errors_first_call': lambda: email_logger.get_email_log('ERROR'),
+        'errors': lambda: email_logger.get_email_log('ERROR'),
+        'last_5_percent': lambda: email_logger.get_email_log(since=middle),
+        'contains_newest_10': lambda: email_logger.get_email_log(
+            contains='failed', limit=10),
+        'full_log_and_filter': lambda: [line for line in
+            email_logger.get_email_log().split('\n') if '[ERROR]' in line],
+    }
+    results = {}
+    for name in ('errors_first_call', 'errors', 'last_5_percent',
+            'contains_newest_10', 'full_log_and_filter'):
+        start = default_timer()
+        queries[name]()
+        results[name] = {'query_seconds': default_timer() - start}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--records', type=int, default=20000,
+        help='log calls per timed benchmark')
+    parser.add_argument('--output', help='write the JSON results here '
+        'instead of stdout')
+    arguments = parser.parse_args()
+
+    server = UnixDatagramServer().start()
+    devnull = open(os.devnull, 'w')
+    counts = [1000, 10000, 100000]
+    try:
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'time': time.time(),
+                'records': arguments.records,
+            },
+            'level_methods': bench_level_methods(arguments.records, server,
+                devnull),
+            'disabled_levels': bench_disabled_levels(arguments.records,
+                server, devnull),
+            'tracebacks': bench_tracebacks(arguments.records, devnull),
+            'bound_logger': bench_bound_logger(arguments.records, devnull),
+            'profiling': bench_profiling(arguments.records, devnull),
+            'email_memory': bench_email_memory(counts),
+            'get_email_log': bench_get_email_log(counts),
+            'email_query': bench_email_query(counts[-1]),
+        }
+    finally:
+        devnull.close()
+        server.stop()
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
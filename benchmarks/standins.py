@@ -0,0 +1,148 @@
+"""
+Local stand-ins for the places MultiLogger logs in, so that benchmarks can
+run without rsyslog, a mail server or a terminal.
+"""
+
+import os
+import socket
+import tempfile
+import threading
+import time
+
+
+class UnixDatagramServer(object):
+    """
+    Stand-in for rsyslog: a Unix datagram socket counting what it receives
+    on a background thread. It can be stopped and started again to simulate
+    rsyslog restarts; the socket path stays the same.
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(), 'log.sock')
+        self.path = path
+        self.received = 0
+        self.received_bytes = 0
+        self.sock = None
+        self.thread = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind(self.path)
+        self.sock.settimeout(0.1)
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def run(self):
+        sock = self.sock
+        while self.running:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            self.received += 1
+            self.received_bytes += len(data)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SMTPServer(object):
+    """
+    Stand-in for a mail server: accepts SMTP sessions on a local TCP port,
+    one thread per connection, and counts connections and messages. An
+    optional 'delay' in seconds is added to every reply to simulate a slow
+    server.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.sock = None
+        self.address = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(64)
+        self.sock.settimeout(0.1)
+        self.address = self.sock.getsockname()
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def run(self):
+        while self.running:
+            try:
+                conn, address = self.sock.accept()
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            with self.lock:
+                self.connections += 1
+            thread = threading.Thread(target=self.session, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def session(self, conn):
+        conn.settimeout(None)
+        reader = conn.makefile('rb')
+
+        def reply(line):
+            if self.delay:
+                time.sleep(self.delay)
+            conn.sendall(line.encode('ascii') + b'\r\n')
+        try:
+            reply('220 standin ESMTP')
+            while True:
+                line = reader.readline()
+                if not line:
+                    break
+                command = line.strip().split(b' ', 1)[0].upper()
+                if command in (b'EHLO', b'HELO'):
+                    reply('250 standin')
+                elif command == b'DATA':
+                    reply('354 end data with <CR><LF>.<CR><LF>')
+                    data = []
+                    while True:
+                        line = reader.readline()
+                        if not line or line.rstrip(b'\r\n') == b'.':
+                            break
+                        data.append(line)
+                    with self.lock:
+                        self.messages.append(b''.join(data))
+                    reply('250 queued')
+                elif command == b'QUIT':
+                    reply('221 bye')
+                    break
+                else:
+                    reply('250 ok')
+        except socket.error:
+            pass
+        finally:
+            reader.close()
+            conn.close()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
@@ -8,7 +8,11 @@ Class extends: BaseLoggerClass
 """
 
 import logging
-from base_logger import BaseLoggerClass
+import sys
+import threading
+
+from base_logger import (BaseLoggerClass, LogRecord, PeriodicFlusher,
+    call_at_exit, cancel_at_exit)
 
 LOGLEVELS = {
     'DEBUG': logging.DEBUG,
@@ -29,9 +33,23 @@ class ConsoleLogger(BaseLoggerClass):
     execution. It can be usefull for initial development of programs as a
     alternative of print statements. This logger uses the same methods to
     log errors as a conventional python logger
+    Init arguments:
+        loglevel: Log Level for logs. Default: 'INFO'
+        enable_color: color the output. Colors are only used when the
+                stream is a terminal
+        buffered: collect lines and write them together instead of one
+                write per line
+        buffer_size: in buffered mode, write once this many characters
+                are collected
+        flush_interval: in buffered mode, seconds between time based writes
+        flush_level: in buffered mode, lines of this level or above are
+                written at once
+        stream: file object to write to. Default: sys.stdout at write time
     Class extends: BaseLoggerClass
     """
-    def __init__(self, loglevel='INFO', enable_color=True):
+    def __init__(self, loglevel='INFO', enable_color=True, buffered=False,
+            buffer_size=8192, flush_interval=1.0, flush_level='ERROR',
+            stream=None):
         """
         Constructor to initialize ConsoleLogger object.
         """
@@ -39,6 +57,11 @@ class ConsoleLogger(BaseLoggerClass):
             self.loglevel = loglevel
         else:
             self.loglevel = LOGLEVELS[loglevel]
+        if type(flush_level) != type(logging.INFO):
+            flush_level = LOGLEVELS[flush_level]
+        self.stream = stream
+        if enable_color == True and not self.is_tty():
+            enable_color = False
         if enable_color == True:
             self.HEADER = '\033[95m'
             self.OKBLUE = '\033[94m'
@@ -55,6 +78,110 @@ class ConsoleLogger(BaseLoggerClass):
             self.ERROR = ''
             self.CRITICAL = ''
             self.ENDCOLOR = ''
+        # prefix & suffix around the text of every level, built only once
+        self.decorations = {
+            'DEBUG': (self.HEADER + '[DEBUG] ' + self.ENDCOLOR, ''),
+            'INFO': (self.HEADER + '[INFO] ' + self.ENDCOLOR, ''),
+            'WARNING': (self.HEADER + '[WARNING] ' + self.ENDCOLOR +
+                self.WARNING, self.ENDCOLOR),
+            'ERROR': (self.HEADER + '[ERROR] ' + self.ENDCOLOR + self.ERROR,
+                self.ENDCOLOR),
+            'EXCEPTION': (self.HEADER + '[EXCEPTION] ' + self.ENDCOLOR +
+                self.ERROR, self.ENDCOLOR),
+            'CRITICAL': (self.HEADER + '[CRITICAL] ' + self.ENDCOLOR +
+                self.CRITICAL, self.ENDCOLOR),
+        }
+        self.level_strings = {
+            'DEBUG': self.debug_string,
+            'INFO': self.info_string,
+            'WARNING': self.warning_string,
+            'ERROR': self.error_string,
+            'EXCEPTION': self.exception_string,
+            'CRITICAL': self.critical_string,
+        }
+        self.buffered = buffered
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        self.buffer = []
+        self.buffer_length = 0
+        self.lock = threading.Lock()
+        if buffered:
+            if flush_interval:
+                self.flusher = PeriodicFlusher(self.flush, flush_interval)
+            else:
+                self.flusher = None
+            call_at_exit(self, 'flush')
+        else:
+            self.flusher = None
+
+    def is_tty(self):
+        """
+        Return: True if the output stream is a terminal
+        """
+        stream = self.stream or sys.stdout
+        isatty = getattr(stream, 'isatty', None)
+        try:
+            return bool(isatty and isatty())
+        except ValueError:
+            # closed stream
+            return False
+
+    def write(self, text, levelno):
+        """
+        Method to write a line on the console. In buffered mode the line is
+        collected and written with the others on the next flush
+        """
+        if not self.buffered:
+            stream = self.stream or sys.stdout
+            stream.write(text + '\n')
+            return
+        self.lock.acquire()
+        try:
+            self.buffer.append(text)
+            self.buffer_length += len(text) + 1
+            full = self.buffer_length >= self.buffer_size
+        finally:
+            self.lock.release()
+        if full or levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        """
+        Method to write the collected lines in a single write
+        """
+        self.lock.acquire()
+        try:
+            if not self.buffer:
+                return
+            self.buffer.append('')
+            text = '\n'.join(self.buffer)
+            self.buffer = []
+            self.buffer_length = 0
+            stream = self.stream or sys.stdout
+            stream.write(text)
+            stream.flush()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        """
+        Method to write the collected lines and stop the time based flush
+        """
+        cancel_at_exit(self)
+        if self.flusher is not None:
+            self.flusher.stop()
+        self.flush()
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller
+        """
+        prefix, suffix = self.decorations[record.levelname]
+        text = prefix + record.message + suffix
+        if record.kwargs and record.exc_text:
+            text = '%s\n%s' % (text, record.exc_text.rstrip())
+        self.write(text, record.levelno)
 
     def debug(self, error_message, *args, **kwargs):
         """
@@ -62,7 +189,7 @@ class ConsoleLogger(BaseLoggerClass):
         """
         if logging.DEBUG >= self.loglevel:
             final_message = self.form_log_text(error_message, *args, **kwargs)
-            print self.debug_string(final_message)
+            self.write(self.debug_string(final_message), logging.DEBUG)
 
     def info(self, error_message, *args, **kwargs):
         """
@@ -70,7 +197,7 @@ class ConsoleLogger(BaseLoggerClass):
         """
         if logging.INFO >= self.loglevel:
             final_message = self.form_log_text(error_message, *args, **kwargs)
-            print self.info_string(final_message)
+            self.write(self.info_string(final_message), logging.INFO)
 
     def warning(self, error_message, *args, **kwargs):
         """
@@ -78,7 +205,7 @@ class ConsoleLogger(BaseLoggerClass):
         """
         if logging.WARNING >= self.loglevel:
             final_message = self.form_log_text(error_message, *args, **kwargs)
-            print self.warning_string(final_message)
+            self.write(self.warning_string(final_message), logging.WARNING)
 
     def error(self, error_message, *args, **kwargs):
         """
@@ -86,7 +213,7 @@ class ConsoleLogger(BaseLoggerClass):
         """
         if logging.ERROR >= self.loglevel:
             final_message = self.form_log_text(error_message, *args, **kwargs)
-            print self.error_string(final_message)
+            self.write(self.error_string(final_message), logging.ERROR)
 
     def exception(self, error_message, *args):
         """
@@ -95,55 +222,61 @@ class ConsoleLogger(BaseLoggerClass):
         from an exception
         """
         if logging.ERROR >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args)
-            print self.exception_string(final_message)
+            self.emit(LogRecord(logging.ERROR, 'EXCEPTION', error_message,
+                args, {'exc_info': sys.exc_info()}))
 
     def critical(self, error_message, *args, **kwargs):
         """
         Logs a message with level CRITICAL on this logger
         """
-        if  logging.CRITICAL >= self.loglevel:
+        if logging.CRITICAL >= self.loglevel:
             final_message = self.form_log_text(error_message, *args, **kwargs)
-            print self.critical_string(final_message)
+            self.write(self.critical_string(final_message), logging.CRITICAL)
 
     def debug_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in debug color (white/default) & [DEBUG] tag.
         """
-        return "%s[DEBUG] %s%s" % (self.HEADER, self.ENDCOLOR, text)
+        prefix, suffix = self.decorations['DEBUG']
+        return prefix + text + suffix
 
     def info_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in info color (white/default) & [INFO] tag.
         """
-        return "%s[INFO] %s%s" % (self.HEADER, self.ENDCOLOR, text)
+        prefix, suffix = self.decorations['INFO']
+        return prefix + text + suffix
 
     def warning_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in warning color (Yellow) & [WARNING] tag.
         """
-        return "%s[WARNING] %s%s%s%s" % (self.HEADER, self.ENDCOLOR, self.WARNING, text, self.ENDCOLOR)
+        prefix, suffix = self.decorations['WARNING']
+        return prefix + text + suffix
 
     def error_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in error color (Red) & [ERROR] tag.
         """
-        return "%s[ERROR] %s%s%s%s" % (self.HEADER, self.ENDCOLOR, self.ERROR, text, self.ENDCOLOR)
+        prefix, suffix = self.decorations['ERROR']
+        return prefix + text + suffix
 
     def exception_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in error color (Red) & [EXCEPTION] tag.
         """
-        return "%s[EXCEPTION] %s%s%s%s" % (self.HEADER, self.ENDCOLOR, self.ERROR, text, self.ENDCOLOR)
+        prefix, suffix = self.decorations['EXCEPTION']
+        return prefix + text + suffix
 
     def critical_string(self, text):
         """
         Method to return the accepted string argument to be printed
         in critical color (Bold Red) & [CRITICAL] tag.
         """
-        return "%s[CRITICAL] %s%s%s%s" % (self.HEADER, self.ENDCOLOR, self.CRITICAL, text, self.ENDCOLOR)
+        prefix, suffix = self.decorations['CRITICAL']
+        return prefix + text + suffix
@@ -0,0 +1,171 @@
+"""
+Python module to hand log records to the places they are logged in from a
+background thread. The program using it only pays for putting the record
+on a bounded queue; slow places like the system logger or the console do
+not stall it.
+"""
+
+import collections
+import logging
+import sys
+import threading
+import traceback
+
+from base_logger import call_at_exit, cancel_at_exit
+
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'drop-low-severity')
+
+
+class DispatchWorker(object):
+    """
+    Class to run the emit methods of the places a record is logged in on a
+    background thread.
+    Init arguments:
+        queue_size: maximum number of records waiting to be logged
+        overflow: what to do when the queue is full:
+            'block': wait for the worker to make room
+            'drop-oldest': drop the oldest waiting record
+            'drop-low-severity': drop the new record if it is below
+                WARNING, else drop the oldest waiting record below WARNING.
+                Blocks if all waiting records are WARNING or above
+    All waiting records are logged when the program exits.
+    """
+    def __init__(self, queue_size=10000, overflow='block'):
+        """
+        Constructor to initialize DispatchWorker object and start its thread
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of %s' %
+                ', '.join(OVERFLOW_POLICIES))
+        if queue_size < 1:
+            raise ValueError('queue_size must be at least 1')
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.unfinished = 0
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run,
+            name='multilogger-dispatch')
+        self.thread.daemon = True
+        self.thread.start()
+        call_at_exit(self, 'close')
+
+    def put(self, places, record):
+        """
+        Method to queue a record for the given emit methods. Applies the
+        overflow policy when the queue is full
+        """
+        condition = self.condition
+        condition.acquire()
+        try:
+            if self.closed:
+                # Nothing left to drain the queue, log on the caller thread
+                condition.release()
+                try:
+                    self.emit(places, record)
+                finally:
+                    condition.acquire()
+                return
+            while len(self.queue) >= self.queue_size:
+                if self.overflow == 'drop-oldest':
+                    self.queue.popleft()
+                    self.unfinished -= 1
+                    self.dropped += 1
+                elif self.overflow == 'drop-low-severity':
+                    if not self.drop_low_severity(record):
+                        return
+                else:
+                    condition.wait()
+            self.queue.append((places, record))
+            self.unfinished += 1
+            condition.notify_all()
+        finally:
+            condition.release()
+
+    def drop_low_severity(self, record):
+        """
+        Method to make room for 'record' under the 'drop-low-severity'
+        policy. Return: False if the record itself was dropped, True if it
+        should still be queued (room was made or the caller has to wait)
+        """
+        if record.levelno < logging.WARNING:
+            self.dropped += 1
+            return False
+        for index, (places, queued) in enumerate(self.queue):
+            if queued.levelno < logging.WARNING:
+                del self.queue[index]
+                self.unfinished -= 1
+                self.dropped += 1
+                return True
+        self.condition.wait()
+        return True
+
+    def run(self):
+        """
+        Method run by the worker thread: logs the queued records in order
+        """
+        condition = self.condition
+        while True:
+            condition.acquire()
+            try:
+                while not self.queue and not self.closed:
+                    condition.wait()
+                if not self.queue:
+                    return
+                batch = list(self.queue)
+                self.queue.clear()
+                # Room was made, wake up callers blocked on a full queue
+                condition.notify_all()
+            finally:
+                condition.release()
+            for places, record in batch:
+                self.emit(places, record)
+            condition.acquire()
+            try:
+                self.unfinished -= len(batch)
+                condition.notify_all()
+            finally:
+                condition.release()
+
+    def emit(self, places, record):
+        """
+        Method to log a record in the given places. A failing place is
+        reported on stderr and does not stop the worker
+        """
+        for emit in places:
+            try:
+                emit(record)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def flush(self):
+        """
+        Method to wait until every record queued so far has been logged
+        """
+        if self.thread is threading.current_thread():
+            return
+        condition = self.condition
+        condition.acquire()
+        try:
+            while self.unfinished > 0 and self.thread.is_alive():
+                condition.wait()
+        finally:
+            condition.release()
+
+    def close(self):
+        """
+        Method to log all waiting records and stop the worker thread.
+        Records logged after close() are logged on the caller thread
+        """
+        cancel_at_exit(self)
+        condition = self.condition
+        condition.acquire()
+        try:
+            self.closed = True
+            condition.notify_all()
+        finally:
+            condition.release()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
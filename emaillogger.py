@@ -2,10 +2,36 @@
 Python module to store logs in string format while the program using it
 performs its execution. This log can be appended in email body or attached
 as a file for dubug purpose.
+Records are kept as compact columns of time, level, template & args; their
+text is only formed when the logs are read, which most programs never do.
+get_email_log() can select records by level, time and text; only the
+selected records are formed.
+Large logs can be spilled to an append-only file which survives a crash;
+recover_email_log() reads it back on the next start. They can also be kept
+gzip compressed in memory, and streamed as a compressed attachment.
 """
 
+import array
+import bisect
+import codecs
+import heapq
 import logging
-from base_logger import BaseLoggerClass
+import mmap
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+from email.mime.application import MIMEApplication
+from operator import itemgetter
+from base_logger import (BaseLoggerClass, LogRecord, form_log_text,
+    text_args)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 LOGLEVELS = {
     'DEBUG': logging.DEBUG,
@@ -18,6 +44,118 @@ LOGLEVELS = {
     'FATAL': logging.FATAL,
 }
 
+# Once a size cap is hit the buffer is compacted down to this fraction of
+# the cap, so that eviction runs once per many appends and not on each one
+EVICTION_WATERMARK = 0.75
+ELIDED_MARKER = '\n[ELIDED] %d records elided'
+DEFAULT_LOG_HEADER = "\n################EMAIL LOGS################\n"
+# Number of distinct error_message templates interned per EmailLogger.
+# Templates built per call, e.g. with %, are not worth keeping beyond it
+MAX_TEMPLATES = 4096
+# Level codes of the records kept in the email logs, in level order
+LEVEL_CODES = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR + 1,
+    'CRITICAL': logging.CRITICAL,
+}
+# Compressed attachment formats: MIME subtype & file name extension
+COMPRESSIONS = {
+    'gzip': ('gzip', '.gz'),
+    'zstd': ('zstd', '.zst'),
+}
+
+
+def format_time(created):
+    """
+    Method to return a record time as HH:MM:SS local time
+    """
+    return time.strftime('%H:%M:%S', time.localtime(created))
+
+
+def get_compressor(compression='gzip', level=6):
+    """
+    Method to return a streaming compressor object with compress() and
+    flush() methods for the given compression. 'zstd' needs the zstandard
+    package
+    """
+    if compression == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstd compression needs the zstandard package')
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError('compression must be one of %s' %
+        ', '.join(sorted(COMPRESSIONS)))
+
+
+def encode_text(text):
+    """
+    Method to return text as UTF-8 bytes
+    """
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return text
+
+
+def decode_text(data):
+    """
+    Method to return UTF-8 bytes as a native string
+    """
+    if not isinstance(data, str):
+        data = data.decode('utf-8')
+    return data
+
+
+def read_log_file(path):
+    """
+    Method to return the contents of a log file, read through mmap
+    """
+    log_file = open(path, 'rb')
+    try:
+        if os.fstat(log_file.fileno()).st_size == 0:
+            return ''
+        mapped = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            text = mapped[:]
+        finally:
+            mapped.close()
+    finally:
+        log_file.close()
+    return decode_text(text)
+
+
+def recover_email_log(spill_path, header=DEFAULT_LOG_HEADER):
+    """
+    Method to read the email logs left in 'spill_path' by a program that
+    did not finish, e.g. after a crash. Return: header + logs, or None if
+    there is no such file. Call it before creating the EmailLogger using
+    the same spill_path, as spilling starts the file afresh
+    """
+    if not os.path.exists(spill_path):
+        return None
+    return ''.join([header or '', read_log_file(spill_path)])
+
+
+class DigestEntry(object):
+    """
+    Repeats of one error_message template at one level in digest mode
+    """
+    __slots__ = ('levelname', 'levelno', 'error_message', 'count', 'first',
+        'last', 'samples')
+
+    def __init__(self, levelname, levelno, error_message, created, args):
+        self.levelname = levelname
+        self.levelno = levelno
+        self.error_message = error_message
+        self.count = 1
+        self.first = created
+        self.last = created
+        self.samples = [args]
+
+
 class EmailLogger(BaseLoggerClass):
     """
     Class to store logs in string format while the program using it performs
@@ -25,16 +163,70 @@ class EmailLogger(BaseLoggerClass):
     file for dubug purpose.
     Class extends: BaseLoggerClass
     """
-    def __init__(self, loglevel='INFO'):
+    def __init__(self, loglevel='INFO', max_bytes=None, max_records=None,
+            spill_threshold=None, spill_dir=None, spill_path=None,
+            compress=False, compress_level=6, digest=False,
+            digest_samples=3):
         """
         Constructor to initialize EmailLogger object.
+        max_bytes/max_records cap the size of the stored logs. When a cap is
+        hit, DEBUG and then INFO records are dropped oldest first and
+        replaced by a one line marker. WARNING and above are always kept.
+        spill_threshold: once the stored logs are larger than this many
+            bytes they are moved to an append-only file and all further
+            logs are appended to it, so memory use stays flat. The file is
+            a temporary file in spill_dir, or spill_path if given; the
+            latter is kept on a crash, see recover_email_log(), and removed
+            by close(). Every record is written to the file as it is
+            logged. Can not be used with max_bytes/max_records
+        compress: keep the logs gzip compressed in memory as they are
+            appended, at compress_level. Only compressed bytes are held
+        digest: keep one entry per error_message template and level instead
+            of every record. Repeats only count up and keep their first and
+            last time and the args of the first digest_samples records. The
+            log shows 'Nx <template>' summaries for repeated templates
+        Only one of the caps, spill_threshold, compress & digest can be used
         """
         if type(loglevel) == type(logging.INFO):
             self.loglevel = loglevel
         else:
             self.loglevel = LOGLEVELS[loglevel]
-        self.loglevel = loglevel
-        self.log_body = ''
+        modes = [name for name, enabled in (
+            ('max_bytes/max_records', max_bytes is not None or
+                max_records is not None),
+            ('spill_threshold', spill_threshold is not None),
+            ('compress', compress),
+            ('digest', digest)) if enabled]
+        if len(modes) > 1:
+            raise ValueError('%s can not be used together' % ', '.join(modes))
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self.spill_path = spill_path
+        self.spill_file = None
+        self.compress = compress
+        self.compress_level = compress_level
+        self.digest = digest
+        self.digest_samples = digest_samples
+        self.level_strings = {
+            'DEBUG': self.debug_string,
+            'INFO': self.info_string,
+            'WARNING': self.warning_string,
+            'ERROR': self.error_string,
+            'EXCEPTION': self.exception_string,
+            'CRITICAL': self.critical_string,
+        }
+        # Text before and after the message of every level code, to form
+        # the lines of stored records without a method call each
+        self.decorations = {}
+        for levelname, level_string in self.level_strings.items():
+            prefix, suffix = level_string('\000').split('\000')
+            self.decorations[LEVEL_CODES[levelname]] = ('\n' + prefix, suffix)
+        self.decoration_sizes = dict((code, len(prefix) + len(suffix))
+            for code, (prefix, suffix) in self.decorations.items())
+        self.templates = {}
+        self.reset_email_log()
         self.set_log_header()
 
     def set_log_header(self, header=None):
@@ -43,58 +235,701 @@ class EmailLogger(BaseLoggerClass):
         appended in email
         """
         if header == None:
-            self.log_header = "\n################EMAIL LOGS################\n"
+            self.log_header = DEFAULT_LOG_HEADER
         else:
             self.log_header = header
+        self._email_log = None
 
-    def get_email_log(self):
+    def get_email_log(self, min_level=None, since=None, until=None,
+            contains=None, limit=None):
         """
         Return: log_header + log_body.
-        These logs can be appended in email
+        These logs can be appended in email. The text is built once from the
+        log buffer and cached until the next record is appended.
+        With any of the arguments only the matching records are included,
+        see query()
         """
         if self.log_header == None:
             self.log_header = ''
-        if self.log_body == None:
-            self.log_body = ''
-        return ''.join([self.log_header, self.log_body])
+        if (min_level is not None or since is not None or until is not None
+                or contains is not None or limit is not None):
+            rendered = self._rendered or ()
+            chunks = [self.log_header]
+            for index in self.query(min_level, since, until, contains, limit):
+                if index < len(rendered):
+                    chunks.append(rendered[index])
+                else:
+                    chunks.append(self.render(index))
+            return ''.join(chunks)
+        if self.spill_file is not None or self.compress:
+            # Not cached: the logs are kept on disk or compressed to keep
+            # memory flat
+            return ''.join([self.log_header, self.log_body])
+        if self._email_log is None:
+            chunks = [self.log_header]
+            if self.digest:
+                chunks.extend(self.iter_digest())
+            else:
+                chunks.extend(self.rendered_chunks())
+            self._email_log = ''.join(chunks)
+        return self._email_log
+
+    def query(self, min_level=None, since=None, until=None, contains=None,
+            limit=None):
+        """
+        Return: list of the positions of the stored records matching all of
+            min_level: level (number or name) the records have at least.
+                    Lines without a level, like elided markers, are left out
+            since, until: range of record times, as from time.time()
+            contains: text the message of the records contains
+            limit: keep only the newest 'limit' matching records
+        The time range is found by bisecting log_times and the levels from
+        level_index(); only the records in both are looked at, and only for
+        'contains' is their message formed, newest first until 'limit' is
+        reached. Times are in logging order, so a record logged by another
+        thread at the same moment may fall on either side of a bound.
+        Needs the records in memory: not available with spill_threshold
+        (once spilled), compress or digest
+        """
+        if self.spill_file is not None or self.compress or self.digest:
+            raise ValueError('Filtered email logs need the records in '
+                'memory, not spilled, compressed or in a digest')
+        times = self.log_times
+        start = 0
+        end = len(times)
+        if since is not None:
+            start = bisect.bisect_left(times, since)
+        if until is not None:
+            end = bisect.bisect_right(times, until)
+        if min_level is None:
+            positions = range(start, end)
+        else:
+            if type(min_level) != type(logging.INFO):
+                min_level = LOGLEVELS[min_level]
+            runs = [positions[bisect.bisect_left(positions, start):
+                bisect.bisect_left(positions, end)] for code, positions in
+                self.level_index().items() if code >= min_level]
+            if len(runs) == 1:
+                positions = runs[0]
+            else:
+                positions = list(heapq.merge(*runs))
+        if contains is None:
+            if limit is not None:
+                positions = positions[max(0, len(positions) - limit):]
+            return list(positions)
+        matches = []
+        if limit is not None and limit <= 0:
+            return matches
+        templates = self.log_templates
+        args = self.log_args
+        for index in reversed(positions):
+            template = templates[index]
+            if template is None:
+                message = args[index]
+            else:
+                message = form_log_text(template, *args[index])
+            if contains in message:
+                matches.append(index)
+                if limit is not None and len(matches) >= limit:
+                    break
+        matches.reverse()
+        return matches
+
+    def level_index(self):
+        """
+        Return: dictionary of level code to the ascending positions of the
+        stored records of that level. Kept between calls and extended with
+        the records stored since the last one, so log calls do not pay for
+        it
+        """
+        index = self._level_index
+        if index is None:
+            index = self._level_index = {}
+            self._indexed = 0
+        levels = self.log_levels
+        for position in range(self._indexed, len(levels)):
+            code = levels[position]
+            if code:
+                if code not in index:
+                    index[code] = array.array('L')
+                index[code].append(position)
+        self._indexed = len(levels)
+        return index
+
+    def render(self, index):
+        """
+        Method to return the log line of the stored record at 'index'
+        """
+        template = self.log_templates[index]
+        if template is None:
+            return self.log_args[index]
+        prefix, suffix = self.decorations[self.log_levels[index]]
+        return prefix + form_log_text(template, *self.log_args[index]) + suffix
+
+    def rendered_chunks(self):
+        """
+        Return: list of the log lines of all stored records. Lines are
+        formed once and kept until the records are moved by eviction or
+        merging, so reading the logs again only forms the new lines
+        """
+        rendered = self._rendered
+        if rendered is None:
+            rendered = self._rendered = []
+        start = len(rendered)
+        if start < len(self.log_args):
+            decorations = self.decorations
+            append = rendered.append
+            for code, template, args in zip(self.log_levels[start:],
+                    self.log_templates[start:], self.log_args[start:]):
+                if template is None:
+                    append(args)
+                else:
+                    prefix, suffix = decorations[code]
+                    append(prefix + form_log_text(template, *args) + suffix)
+        return rendered
+
+    def iter_email_log(self, chunk_size=65536):
+        """
+        Return: generator yielding log_header + log_body in pieces of about
+        chunk_size characters, without building the whole log in memory.
+        Spilled logs are read through mmap
+        """
+        if self.log_header:
+            yield self.log_header
+        if self.spill_file is not None:
+            spill_file = open(self.spill_file_path, 'rb')
+            try:
+                if os.fstat(spill_file.fileno()).st_size == 0:
+                    return
+                mapped = mmap.mmap(spill_file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+                try:
+                    start = 0
+                    length = len(mapped)
+                    while start < length:
+                        end = min(start + chunk_size, length)
+                        # Never split a UTF-8 sequence between pieces
+                        while (end < length and
+                                ord(mapped[end:end + 1]) & 0xC0 == 0x80):
+                            end += 1
+                        piece = mapped[start:end]
+                        if not isinstance(piece, str):
+                            piece = piece.decode('utf-8')
+                        yield piece
+                        start = end
+                finally:
+                    mapped.close()
+            finally:
+                spill_file.close()
+            return
+        if self.compress:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if str is bytes:
+                decode = lambda data, final=False: data
+            else:
+                decode = codecs.getincrementaldecoder('utf-8')().decode
+            for compressed in self.iter_compressed_log_body():
+                data = decompressor.decompress(compressed)
+                while data:
+                    piece = decode(data[:chunk_size])
+                    data = data[chunk_size:]
+                    if piece:
+                        yield piece
+            piece = decode(decompressor.flush(), True)
+            if piece:
+                yield piece
+            return
+        piece = []
+        size = 0
+        if self.digest:
+            chunks = self.iter_digest()
+        else:
+            chunks = (self.render(index) for index in
+                range(len(self.log_args)))
+        for chunk in chunks:
+            piece.append(chunk)
+            size += len(chunk)
+            if size >= chunk_size:
+                yield ''.join(piece)
+                piece = []
+                size = 0
+        if piece:
+            yield ''.join(piece)
+
+    def iter_compressed_log_body(self):
+        """
+        Return: generator yielding the gzip stream of log_body in
+        compress mode. The stream is finished on a copy of the compressor,
+        so logging can go on afterwards
+        """
+        for compressed in self.compressed_chunks:
+            yield compressed
+        yield self.compressor.copy().flush()
+
+    def iter_compressed_email_log(self, compression='gzip', chunk_size=65536,
+            level=6):
+        """
+        Return: generator yielding log_header + log_body compressed as
+        'gzip' or 'zstd' bytes, built piece by piece from iter_email_log().
+        In compress mode the stored gzip stream is used as is, after a gzip
+        member holding the header
+        """
+        if self.compress and compression == 'gzip':
+            if self.log_header:
+                compressor = get_compressor('gzip', level)
+                yield (compressor.compress(encode_text(self.log_header)) +
+                    compressor.flush())
+            for compressed in self.iter_compressed_log_body():
+                yield compressed
+            return
+        compressor = get_compressor(compression, level)
+        for text in self.iter_email_log(chunk_size):
+            compressed = compressor.compress(encode_text(text))
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def get_email_log_attachment(self, filename='email_log.txt',
+            compression='gzip', level=6):
+        """
+        Return: MIMEApplication holding the compressed email log, ready to
+        be attached to an email. Only the compressed bytes are built in
+        memory. The compression's extension is added to filename
+        """
+        subtype, extension = COMPRESSIONS[compression]
+        payload = b''.join(self.iter_compressed_email_log(compression,
+            level=level))
+        attachment = MIMEApplication(payload, subtype)
+        attachment.add_header('Content-Disposition', 'attachment',
+            filename=filename + extension)
+        return attachment
 
     def reset_email_log(self):
         """
-        Method to reset email logs (self.log_body)
+        Method to reset email logs (self.log_body). A spill file is removed
+        """
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+            os.remove(self.spill_file_path)
+        self.clear_records()
+        self._evict_bytes = self.max_bytes
+        self._evict_records = self.max_records
+        self.digest_entries = []
+        self.digest_index = {}
+        if self.compress:
+            self.compressor = get_compressor('gzip', self.compress_level)
+            self.compressed_chunks = []
+            self.compressed_size = 0
+
+    @property
+    def log_body(self):
+        """
+        The accumulated logs as a single string. Built from the log buffer
+        on first access and cached until the next record is appended
+        """
+        if self.spill_file is not None:
+            return read_log_file(self.spill_file_path)
+        if self.compress:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            return decode_text(b''.join(decompressor.decompress(compressed)
+                for compressed in self.iter_compressed_log_body()))
+        if self._log_body is None:
+            if self.digest:
+                self._log_body = ''.join(self.iter_digest())
+            else:
+                self._log_body = ''.join(self.rendered_chunks())
+        return self._log_body
+
+    @log_body.setter
+    def log_body(self, text):
+        """
+        Replaces the accumulated logs with the given text
+        """
+        self.reset_email_log()
+        if text and self.compress:
+            self.write_compressed(text)
+            self.log_size = len(text)
+        elif text:
+            self.store(0.0, 0, None, text)
+            self.log_size = len(text)
+
+    def append_log(self, text, level=None, created=None):
+        """
+        Method to append a log line to the log buffer. Every line costs one
+        list append; the full text is only joined in get_email_log().
+        Lines without a level are never evicted. created is the time of the
+        record, now by default
+        """
+        chunk = '\n' + text
+        if self.spill_file is not None:
+            self.write_spill([chunk])
+            return
+        if self.compress:
+            self.write_compressed(chunk)
+            self.log_size += len(chunk)
+            return
+        if created is None:
+            created = time.time()
+        self.store(created, level or 0, None, chunk)
+        self.log_size += len(chunk)
+        self._log_body = None
+        self._email_log = None
+        self.check_limits()
+
+    def add_record(self, record):
+        """
+        Method to keep a LogRecord in the log buffer without forming its
+        text. The size the text will have is added up from the lengths of
+        the template & args
+        """
+        code = LEVEL_CODES[record.levelname]
+        template = record.template
+        templates = self.templates
+        if template in templates:
+            template = templates[template]
+        elif len(templates) < MAX_TEMPLATES:
+            templates[template] = template
+        args = text_args(record.args)
+        self.log_times.append(record.created)
+        self.log_levels.append(code)
+        self.log_templates.append(template)
+        self.log_args.append(args)
+        self.log_size += (self.decoration_sizes[code] + len(template) +
+            sum(map(len, args)) + 2 * len(args))
+        self._log_body = None
+        self._email_log = None
+        self.check_limits()
+
+    def store(self, created, code, template, args):
+        """
+        Method to add a record to the columns of the log buffer. A record
+        without template holds its formed log line in place of the args
         """
-        self.log_body = ''
+        self.log_times.append(created)
+        self.log_levels.append(code)
+        self.log_templates.append(template)
+        self.log_args.append(args)
+
+    def clear_records(self):
+        """
+        Method to empty the log buffer. Records are kept as columns: time,
+        level code (0 for formed text), interned template & args
+        """
+        self.log_times = array.array('d')
+        self.log_levels = array.array('B')
+        self.log_templates = []
+        self.log_args = []
+        self.log_elided = {}
+        self.log_size = 0
+        self._rendered = None
+        self._level_index = None
+        self._indexed = 0
+        self._log_body = None
+        self._email_log = None
+
+    def record_size(self, index):
+        """
+        Method to return the length of the log line of the stored record at
+        'index'
+        """
+        template = self.log_templates[index]
+        args = self.log_args[index]
+        if template is None:
+            return len(args)
+        return (self.decoration_sizes[self.log_levels[index]] +
+            len(template) + sum(map(len, args)) + 2 * len(args))
+
+    def merge_records(self, records):
+        """
+        Method to add LogRecords logged elsewhere, e.g. by other processes,
+        so that the log stays in time order. 'records' must be sorted by
+        their 'created' time. Only the logs newer than the first record are
+        moved around
+        """
+        if not records:
+            return
+        times = self.log_times
+        start = bisect.bisect_right(times, records[0].created)
+        if start == len(times) or self.digest:
+            for record in records:
+                self.emit(record)
+            return
+        columns = (times, self.log_levels, self.log_templates, self.log_args)
+        moved = [(times[index], self.log_levels[index],
+            self.log_templates[index], self.log_args[index],
+            self.log_elided.pop(index, 0)) for index in
+            range(start, len(times))]
+        for record in records:
+            code = LEVEL_CODES[record.levelname]
+            template = record.template
+            args = text_args(record.args)
+            moved.append((record.created, code, template, args, 0))
+            self.log_size += (self.decoration_sizes[code] +
+                len(template) + sum(map(len, args)) + 2 * len(args))
+        for column in columns:
+            del column[start:]
+        # stable sort: on equal times the logs already stored come first
+        moved.sort(key=itemgetter(0))
+        for created, code, template, args, elided in moved:
+            if elided:
+                self.log_elided[len(times)] = elided
+            self.store(created, code, template, args)
+        if self._rendered is not None:
+            del self._rendered[start:]
+        if self._level_index is not None:
+            for positions in self._level_index.values():
+                del positions[bisect.bisect_left(positions, start):]
+            self._indexed = min(self._indexed, start)
+        self._log_body = None
+        self._email_log = None
+        self.check_limits()
+
+    def check_limits(self):
+        """
+        Method to evict or spill logs if the log buffer is over its caps
+        """
+        if (self.spill_threshold is not None and
+                self.log_size > self.spill_threshold):
+            self.spill_logs()
+        elif ((self._evict_bytes is not None and
+                self.log_size > self._evict_bytes) or
+            (self._evict_records is not None and
+                len(self.log_args) - len(self.log_elided) >
+                self._evict_records)):
+            self.evict_logs()
+
+    def spill_logs(self):
+        """
+        Method to move the log buffer to the spill file. All further logs
+        are appended to the file
+        """
+        if self.spill_path is not None:
+            spill_fd = os.open(self.spill_path,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o600)
+            self.spill_file_path = self.spill_path
+        else:
+            spill_fd, self.spill_file_path = tempfile.mkstemp(
+                prefix='multilogger-', suffix='.log', dir=self.spill_dir)
+        # Unbuffered: what was logged before a crash is in the file
+        self.spill_file = os.fdopen(spill_fd, 'ab', 0)
+        self.write_spill(self.rendered_chunks())
+        self.clear_records()
+
+    def write_spill(self, chunks):
+        """
+        Method to append log chunks to the spill file, in one write
+        """
+        self.spill_file.write(b''.join([encode_text(chunk)
+            for chunk in chunks]))
+
+    def write_compressed(self, text):
+        """
+        Method to add text to the compressed log stream in compress mode
+        """
+        compressed = self.compressor.compress(encode_text(text))
+        if compressed:
+            self.compressed_chunks.append(compressed)
+            self.compressed_size += len(compressed)
+
+    def close(self):
+        """
+        Method to close and remove the spill file. Only a program that did
+        not get to close() leaves one at spill_path for recover_email_log()
+        """
+        if self.spill_file is not None:
+            self.reset_email_log()
+
+    def evict_logs(self):
+        """
+        Method to shrink the log buffer below EVICTION_WATERMARK of the
+        configured caps. Records below WARNING are dropped lowest level and
+        oldest first; every run of dropped records is replaced by a single
+        ELIDED_MARKER line, whose size is counted. A run which turns out
+        shorter than its marker is kept unless the records cap needs it
+        """
+        excess_bytes = excess_records = 0
+        if self.max_bytes is not None:
+            excess_bytes = self.log_size - int(self.max_bytes * EVICTION_WATERMARK)
+        if self.max_records is not None:
+            excess_records = (len(self.log_args) - len(self.log_elided) -
+                int(self.max_records * EVICTION_WATERMARK))
+        elided = self.log_elided
+        marker_size = len(ELIDED_MARKER % len(self.log_args))
+        evicted = {}
+        level_index = self.level_index()
+        for evict_level in sorted(level_index):
+            if evict_level >= logging.WARNING or (excess_bytes <= 0 and
+                    excess_records <= 0):
+                break
+            for index in level_index[evict_level]:
+                if excess_bytes <= 0 and excess_records <= 0:
+                    break
+                size = evicted[index] = self.record_size(index)
+                # A record next to no run starts one and costs a marker; one
+                # between two runs joins them and saves one
+                runs = ((index - 1 in evicted or index - 1 in elided) +
+                    (index + 1 in evicted or index + 1 in elided))
+                excess_bytes -= size + (runs - 1) * marker_size
+                excess_records -= 1
+        if evicted:
+            times = self.log_times
+            levels = self.log_levels
+            templates = self.log_templates
+            args = self.log_args
+            spare_records = len(times)
+            if self.max_records is not None:
+                spare_records = -excess_records
+            self.clear_records()
+            run = []
+            for index in range(len(times) + 1):
+                if index in evicted or index in elided:
+                    run.append(index)
+                    continue
+                if run:
+                    count = sum(elided.get(position, 1) for position in run)
+                    marker = ELIDED_MARKER % count
+                    if (len(run) <= spare_records and
+                            sum(evicted.get(position, marker_size)
+                                for position in run) <= len(marker)):
+                        spare_records -= len(run)
+                        for position in run:
+                            self.store(times[position], levels[position],
+                                templates[position], args[position])
+                    else:
+                        self.log_elided[len(self.log_args)] = count
+                        self.store(times[run[0]], 0, None, marker)
+                    run = []
+                if index < len(times):
+                    self.store(times[index], levels[index], templates[index],
+                        args[index])
+            self.log_size = sum(self.record_size(index)
+                for index in range(len(self.log_args)))
+        # Only WARNING and above may be left over the cap. Let the buffer
+        # grow by half before trying again, so that a stream of high level
+        # records rescans the buffer a logarithmic number of times and not
+        # once per fixed step.
+        if self.max_bytes is not None:
+            self._evict_bytes = self.max_bytes
+            if self.log_size > int(self.max_bytes * EVICTION_WATERMARK):
+                self._evict_bytes = max(self.max_bytes,
+                    self.log_size + self.log_size // 2)
+        if self.max_records is not None:
+            records = len(self.log_args) - len(self.log_elided)
+            self._evict_records = self.max_records
+            if records > int(self.max_records * EVICTION_WATERMARK):
+                self._evict_records = max(self.max_records,
+                    records + records // 2)
+
+    def buffer_stats(self):
+        """
+        Return: dictionary with the size of the email logs: records and
+        bytes held in memory, records elided by eviction, and the bytes
+        written to the spill file or the compressed stream in those modes
+        """
+        stats = {
+            'records': len(self.log_args) - len(self.log_elided),
+            'bytes': self.log_size,
+            'elided': sum(self.log_elided.values()),
+        }
+        if self.digest:
+            stats['digest_entries'] = len(self.digest_entries)
+        if self.spill_file is not None:
+            stats['spill_bytes'] = self.spill_file.tell()
+        if self.compress:
+            stats['compressed_bytes'] = self.compressed_size
+        return stats
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller
+        """
+        if self.digest:
+            self.add_digest(record)
+        elif record.kwargs and record.exc_text:
+            # Kept as formed text: the traceback is part of the line
+            self.append_log('%s\n%s' % (self.level_strings[record.levelname](
+                record.message), record.exc_text.rstrip()),
+                LEVEL_CODES[record.levelname], record.created)
+        elif self.spill_file is not None or self.compress:
+            self.append_log(self.level_strings[record.levelname](
+                record.message), record.levelno, record.created)
+        else:
+            self.add_record(record)
+
+    def add_digest(self, record):
+        """
+        Method to count a LogRecord in its digest entry. The message is not
+        formed; the args are kept for the first digest_samples repeats
+        """
+        template = record.template
+        key = (record.levelname, template)
+        entry = self.digest_index.get(key)
+        if entry is None:
+            entry = DigestEntry(record.levelname, record.levelno,
+                template, record.created, text_args(record.args))
+            self.digest_index[key] = entry
+            self.digest_entries.append(entry)
+        else:
+            entry.count += 1
+            entry.last = record.created
+            if len(entry.samples) < self.digest_samples:
+                entry.samples.append(text_args(record.args))
+        self._log_body = None
+        self._email_log = None
+
+    def iter_digest(self):
+        """
+        Return: generator yielding the log lines of the digest entries, in
+        the order their templates were first logged. A template logged once
+        gives its usual line; repeats give one summary line. Text set
+        through log_body comes first
+        """
+        for index in range(len(self.log_args)):
+            yield self.render(index)
+        for entry in self.digest_entries:
+            if entry.count == 1:
+                text = self.form_log_text(entry.error_message,
+                    *entry.samples[0])
+            else:
+                text = '%dx %s (first %s, last %s)' % (entry.count,
+                    entry.error_message, format_time(entry.first),
+                    format_time(entry.last))
+                samples = [self.form_log_text(entry.error_message, *args)
+                    for args in entry.samples if args]
+                if samples:
+                    text = '%s e.g. %s' % (text, ' | '.join(samples))
+            yield '\n' + self.level_strings[entry.levelname](text)
 
     def debug(self, error_message, *args, **kwargs):
         """
         Logs a message with level DEBUG on this logger
         """
         if logging.DEBUG >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args, **kwargs)
-            self.log_body = '\n'.join([self.log_body, self.debug_string(final_message)])
+            self.emit(LogRecord(logging.DEBUG, 'DEBUG', error_message, args))
 
     def info(self, error_message, *args, **kwargs):
         """
         Logs a message with level INFO on this logger
         """
         if logging.INFO >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args, **kwargs)
-            self.log_body = '\n'.join([self.log_body, self.info_string(final_message)])
+            self.emit(LogRecord(logging.INFO, 'INFO', error_message, args))
 
     def warning(self, error_message, *args, **kwargs):
         """
         Logs a message with level WARNING on this logger
         """
         if logging.WARNING >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args, **kwargs)
-            self.log_body = '\n'.join([self.log_body, self.warning_string(final_message)])
+            self.emit(LogRecord(logging.WARNING, 'WARNING', error_message,
+                args))
 
     def error(self, error_message, *args, **kwargs):
         """
         Logs a message with level ERROR on this logger
         """
         if logging.ERROR >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args, **kwargs)
-            self.log_body = '\n'.join([self.log_body, self.error_string(final_message)])
+            self.emit(LogRecord(logging.ERROR, 'ERROR', error_message, args))
 
     def exception(self, error_message, *args):
         """
@@ -103,16 +938,15 @@ class EmailLogger(BaseLoggerClass):
         from an exception
         """
         if logging.ERROR >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args)
-            self.log_body = '\n'.join([self.log_body, self.exception_string(final_message)])
+            self.emit(LogRecord(logging.ERROR, 'EXCEPTION', error_message,
+                args, {'exc_info': sys.exc_info()}))
 
     def critical(self, error_message, *args, **kwargs):
         """
         Logs a message with level CRITICAL on this logger
         """
         if logging.CRITICAL >= self.loglevel:
-            final_message = self.form_log_text(error_message, *args, **kwargs)
-            self.log_body = '\n'.join([self.log_body, self.critical_string(final_message)])
+            self.emit(LogRecord(logging.CRITICAL, 'CRITICAL', error_message, args))
 
     def debug_string(self, text):
         """
@@ -0,0 +1,306 @@
+"""
+Python module to mail the email logs of MultiLoggers. Mails are sent from
+background threads over pooled SMTP connections, so the program using it
+does not wait on the mail server and many failing jobs do not open a
+connection each. Logs can be coalesced into one digest mail per interval.
+
+Usage:
+    sender = EmailSender('jobs@example.com', ['ops@example.com'],
+        host='smtp.example.com', min_level='ERROR', digest_interval=60)
+    ...
+    logger.send_email_log(sender, 'nightly import')
+    ...
+    sender.close()
+"""
+
+import collections
+import logging
+import smtplib
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from email.mime.text import MIMEText
+from base_logger import call_at_exit, cancel_at_exit
+
+LOGLEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+    'FATAL': logging.FATAL,
+}
+
+DIGEST_SECTION = '\n==== %s (%s) ====\n%s\n'
+
+
+class EmailSender(object):
+    """
+    Class to send email logs over SMTP from 'pool_size' worker threads.
+    Every worker keeps its connection open between mails; a connection
+    idle for more than 'idle_timeout' seconds or dropped by the server is
+    opened again.
+    Init arguments:
+        sender: From address
+        recipients: list of To addresses
+        host, port: SMTP server. Default: localhost:25
+        subject: subject of the mails, and prefix of digest subjects
+        min_level: only logs of loggers whose highest_level_reported is
+                this level or above are sent. None sends every log
+        digest_interval: seconds to collect logs for before sending them
+                all in one digest mail. None sends a mail per log
+        pool_size: number of worker threads & SMTP connections
+        idle_timeout: seconds a connection may stay unused before it is
+                closed instead of reused
+        timeout: socket timeout of the SMTP connections
+        username, password: SMTP login, if the server needs one
+        starttls: switch the connections to TLS before login
+    Mails still waiting are sent when the program exits.
+    """
+    def __init__(self, sender, recipients, host='localhost', port=25,
+            subject='Logs', min_level='ERROR', digest_interval=None,
+            pool_size=2, idle_timeout=60.0, timeout=10.0, username=None,
+            password=None, starttls=False):
+        """
+        Constructor to initialize EmailSender object and start its threads
+        """
+        if min_level is not None and type(min_level) != type(logging.INFO):
+            min_level = LOGLEVELS[min_level]
+        if pool_size < 1:
+            raise ValueError('pool_size must be at least 1')
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.host = host
+        self.port = port
+        self.subject = subject
+        self.min_level = min_level
+        self.digest_interval = digest_interval
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.queue = collections.deque()
+        self.digest = []
+        self.digest_at = None
+        self.condition = threading.Condition()
+        self.unfinished = 0
+        self.closed = False
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self.workers = []
+        for index in range(pool_size):
+            worker = threading.Thread(target=self.run,
+                name='multilogger-mail-%d' % index)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        call_at_exit(self, 'close')
+
+    def send_log(self, logger, subject=None):
+        """
+        Method to queue the email log of a MultiLogger for sending, if its
+        highest_level_reported reaches min_level. Return: True if queued
+        """
+        level = logger.highest_level_reported
+        if self.min_level is not None and (level is None or
+                level < self.min_level):
+            return False
+        self.send(logger.get_email_log(), subject, level)
+        return True
+
+    def send(self, text, subject=None, level=None):
+        """
+        Method to queue a text for sending, in a mail of its own or in the
+        next digest
+        """
+        if subject is None:
+            subject = self.subject
+        condition = self.condition
+        condition.acquire()
+        try:
+            if self.digest_interval:
+                if not self.digest:
+                    self.digest_at = time.time() + self.digest_interval
+                self.digest.append((subject, text, level))
+            else:
+                self.queue.append((subject, text, 1))
+            self.unfinished += 1
+            condition.notify()
+        finally:
+            condition.release()
+
+    def build_digest(self):
+        """
+        Method to turn the collected logs into one digest mail. Called with
+        the condition held. Return: (subject, text, number of logs)
+        """
+        digest = self.digest
+        self.digest = []
+        self.digest_at = None
+        levels = [level for subject, text, level in digest
+            if level is not None]
+        subject = '%s: %d logs' % (self.subject, len(digest))
+        if levels:
+            subject = '%s, highest %s' % (subject,
+                logging.getLevelName(max(levels)))
+        text = ''.join(DIGEST_SECTION % (log_subject,
+            level is None and '-' or logging.getLevelName(level), log_text)
+            for log_subject, log_text, level in digest)
+        return subject, text, len(digest)
+
+    def next_mail(self):
+        """
+        Method for the workers to wait for the next mail to send. Called
+        with the condition held. Return: None once closed and drained
+        """
+        while True:
+            if self.digest and (self.closed or time.time() >= self.digest_at):
+                return self.build_digest()
+            if self.queue:
+                return self.queue.popleft()
+            if self.closed:
+                return None
+            timeout = None
+            if self.digest:
+                timeout = max(0.0, self.digest_at - time.time())
+            self.condition.wait(timeout)
+
+    def run(self):
+        """
+        Method run by the worker threads: sends mails over a connection of
+        their own, kept open between mails
+        """
+        smtp = None
+        last_used = 0.0
+        condition = self.condition
+        while True:
+            condition.acquire()
+            try:
+                mail = self.next_mail()
+            finally:
+                condition.release()
+            if mail is None:
+                break
+            subject, text, count = mail
+            if smtp is not None and time.time() - last_used > self.idle_timeout:
+                self.disconnect(smtp)
+                smtp = None
+            smtp = self.deliver(smtp, subject, text)
+            if smtp is not None:
+                last_used = time.time()
+            condition.acquire()
+            try:
+                if smtp is not None:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self.unfinished -= count
+                condition.notify_all()
+            finally:
+                condition.release()
+        if smtp is not None:
+            self.disconnect(smtp)
+
+    def deliver(self, smtp, subject, text):
+        """
+        Method to send one mail, over 'smtp' if given, else over a new
+        connection. A failed mail is tried once more over a new connection,
+        e.g. when the server closed the pooled one. Return: the connection
+        to keep for the next mail, None if the mail could not be sent
+        """
+        for attempt in (1, 2):
+            if smtp is None:
+                try:
+                    smtp = self.connect()
+                except Exception:
+                    if attempt == 2:
+                        traceback.print_exc(file=sys.stderr)
+                    continue
+            try:
+                self.send_mail(smtp, subject, text)
+                return smtp
+            except Exception:
+                if attempt == 2:
+                    traceback.print_exc(file=sys.stderr)
+                self.disconnect(smtp)
+                smtp = None
+        return None
+
+    def send_mail(self, smtp, subject, text):
+        """
+        Method to send one mail over the SMTP connection 'smtp'
+        """
+        message = MIMEText(text, 'plain', 'utf-8')
+        message['Subject'] = subject
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        smtp.sendmail(self.sender, self.recipients, message.as_string())
+
+    def connect(self):
+        """
+        Method to open and log in an SMTP connection
+        """
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        self.condition.acquire()
+        try:
+            self.connections += 1
+        finally:
+            self.condition.release()
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self.disconnect(smtp)
+            raise
+        return smtp
+
+    def disconnect(self, smtp):
+        """
+        Method to close an SMTP connection, ignoring a server that is gone
+        """
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, socket.error):
+            smtp.close()
+
+    def flush(self):
+        """
+        Method to send the collected digest now and wait until every queued
+        mail has been sent or has failed
+        """
+        condition = self.condition
+        condition.acquire()
+        try:
+            if self.digest:
+                self.digest_at = 0.0
+                condition.notify_all()
+            while self.unfinished > 0 and self.workers[0].is_alive():
+                condition.wait()
+        finally:
+            condition.release()
+
+    def close(self):
+        """
+        Method to send all waiting mails, including the digest, and stop
+        the worker threads
+        """
+        cancel_at_exit(self)
+        condition = self.condition
+        condition.acquire()
+        try:
+            self.closed = True
+            condition.notify_all()
+        finally:
+            condition.release()
+        for worker in self.workers:
+            if worker is not threading.current_thread():
+                worker.join()
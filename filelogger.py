@@ -0,0 +1,277 @@
+"""
+Python module to write logs to a local file at high rates. Log calls only
+add the encoded line to a buffer; the buffer is written with a single
+O_APPEND write per batch (group commit), optionally followed by a periodic
+fsync. Size based rotation renames the file and swaps the file descriptor
+on the flush thread, so log calls never wait for it.
+Class extends: BaseLoggerClass
+"""
+
+import errno
+import logging
+import os
+import sys
+import threading
+import time
+
+from base_logger import (BaseLoggerClass, LogRecord, PeriodicFlusher,
+    call_at_exit, cancel_at_exit)
+
+LOGLEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+    'FATAL': logging.FATAL,
+}
+
+
+class FileLogger(BaseLoggerClass):
+    """
+    Class to append logs to a file in batches. A batch is written when it
+    holds 'batch_bytes', when a record of 'flush_level' or above is logged
+    and every 'flush_interval' seconds. Lines look like
+    '2024-01-31 12:00:00.123 [ERROR] message'.
+    Init arguments:
+        loglevel: Log Level for logs. Default: 'INFO'
+        path: the log file. Created if missing, appended to if not
+        batch_bytes: bytes buffered before they are written together
+        flush_interval: seconds between time based writes. None disables
+        flush_level: records of this level or above are written at once
+        fsync_interval: seconds between fsyncs of the file, done by the
+                time based flush. None never calls fsync
+        max_bytes: rotate the file once it is larger than this. None never
+                rotates
+        backup_count: rotated files kept as path.1 ... path.N
+    Class extends: BaseLoggerClass
+    """
+    def __init__(self, loglevel='INFO', path=None, batch_bytes=65536,
+            flush_interval=0.2, flush_level='ERROR', fsync_interval=None,
+            max_bytes=None, backup_count=5):
+        """
+        Constructor to initialize FileLogger object.
+        """
+        if path is None:
+            raise ValueError('FileLogger needs a path')
+        if type(loglevel) == type(logging.INFO):
+            self.loglevel = loglevel
+        else:
+            self.loglevel = LOGLEVELS[loglevel]
+        if type(flush_level) != type(logging.INFO):
+            flush_level = LOGLEVELS[flush_level]
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.flush_level = flush_level
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.pending = []
+        self.pending_bytes = 0
+        self.stamp = (None, None)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.fd = None
+        self.open()
+        self.synced_at = time.time()
+        self.unsynced = False
+        if flush_interval:
+            self.flusher = PeriodicFlusher(self.flush, flush_interval)
+        else:
+            self.flusher = None
+        call_at_exit(self, 'flush')
+
+    def open(self):
+        """
+        Method to open the log file for appending and note its size
+        """
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+            0o644)
+        self.size = os.fstat(self.fd).st_size
+
+    def encode(self, record):
+        """
+        Method to return the line written for a LogRecord, as bytes
+        """
+        created = record.created
+        # Records of the same second reuse the formatted time
+        second, stamp = self.stamp
+        if int(created) != second:
+            second = int(created)
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+            self.stamp = (second, stamp)
+        text = '%s.%03d [%s] %s\n' % (stamp, int(created % 1 * 1000),
+            record.levelname, record.message)
+        if record.kwargs and record.exc_text:
+            text += record.exc_text
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+        return text
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller
+        """
+        line = self.encode(record)
+        self.lock.acquire()
+        try:
+            self.pending.append(line)
+            self.pending_bytes += len(line)
+            full = self.pending_bytes >= self.batch_bytes
+        finally:
+            self.lock.release()
+        if full or record.levelno >= self.flush_level:
+            self.flush(False)
+
+    def flush(self, wait=True):
+        """
+        Method to write all buffered lines in one write. A flush finding
+        another in progress with wait=False returns at once; its lines go
+        out with the next write, so concurrent log calls share writes.
+        Flushes with wait=True, like the time based one, also rotate the
+        file and fsync it when due
+        """
+        if not self.flush_lock.acquire(wait):
+            return
+        try:
+            self.lock.acquire()
+            try:
+                pending = self.pending
+                self.pending = []
+                self.pending_bytes = 0
+            finally:
+                self.lock.release()
+            if pending and self.fd is not None:
+                self.write(b''.join(pending))
+            if not wait or self.fd is None:
+                return
+            if self.max_bytes is not None and self.size > self.max_bytes:
+                self.rotate()
+            if (self.fsync_interval is not None and self.unsynced and
+                    time.time() - self.synced_at >= self.fsync_interval):
+                os.fsync(self.fd)
+                self.synced_at = time.time()
+                self.unsynced = False
+        finally:
+            self.flush_lock.release()
+
+    def write(self, data):
+        """
+        Method to write data to the log file, retrying short writes
+        """
+        while data:
+            try:
+                written = os.write(self.fd, data)
+            except OSError:
+                if sys.exc_info()[1].errno == errno.EINTR:
+                    continue
+                raise
+            data = data[written:]
+            self.size += written
+        self.unsynced = True
+
+    def rotate(self):
+        """
+        Method to rename the log file to path.1, shifting older backups,
+        and continue in a new file. Called with the flush lock held; log
+        calls keep buffering meanwhile
+        """
+        for index in range(self.backup_count - 1, 0, -1):
+            source = '%s.%d' % (self.path, index)
+            if os.path.exists(source):
+                os.rename(source, '%s.%d' % (self.path, index + 1))
+        old_fd = self.fd
+        if self.backup_count > 0:
+            os.rename(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+        self.open()
+        if self.fsync_interval is not None:
+            os.fsync(old_fd)
+        os.close(old_fd)
+        self.unsynced = False
+
+    def reopen(self):
+        """
+        Method to continue in a new file at path, e.g. after logrotate
+        moved the file away
+        """
+        self.flush_lock.acquire()
+        try:
+            old_fd = self.fd
+            self.open()
+            os.close(old_fd)
+        finally:
+            self.flush_lock.release()
+
+    def close(self):
+        """
+        Method to write the buffered lines, stop the time based flush and
+        close the file
+        """
+        cancel_at_exit(self)
+        if self.flusher is not None:
+            self.flusher.stop()
+        self.flush()
+        self.flush_lock.acquire()
+        try:
+            if self.fd is not None:
+                if self.fsync_interval is not None:
+                    os.fsync(self.fd)
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.flush_lock.release()
+
+    def debug(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level DEBUG on this logger
+        """
+        if logging.DEBUG >= self.loglevel:
+            self.emit(LogRecord(logging.DEBUG, 'DEBUG', error_message, args,
+                kwargs))
+
+    def info(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level INFO on this logger
+        """
+        if logging.INFO >= self.loglevel:
+            self.emit(LogRecord(logging.INFO, 'INFO', error_message, args,
+                kwargs))
+
+    def warning(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level WARNING on this logger
+        """
+        if logging.WARNING >= self.loglevel:
+            self.emit(LogRecord(logging.WARNING, 'WARNING', error_message,
+                args, kwargs))
+
+    def error(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level ERROR on this logger
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'ERROR', error_message, args,
+                kwargs))
+
+    def exception(self, error_message, *args):
+        """
+        Logs a message with level ERROR on this logger. Exception info is
+        added to the logging message. This method should only be called
+        from an exception
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'EXCEPTION', error_message,
+                args, {'exc_info': sys.exc_info()}))
+
+    def critical(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level CRITICAL on this logger
+        """
+        if logging.CRITICAL >= self.loglevel:
+            self.emit(LogRecord(logging.CRITICAL, 'CRITICAL', error_message,
+                args, kwargs))
@@ -0,0 +1,242 @@
+"""
+Python module to collect the logs of multiprocessing workers in the parent
+process. Every worker gets its own EmailLogger, so the parent's
+get_email_log() and highest_level_reported miss what the workers logged.
+An AggregatorClient in the worker ships its records in batches over a
+multiprocessing queue; the LogAggregator in the parent merges them into
+the parent's email log in time order and into its highest_level_reported.
+
+Usage:
+    logger = get_logger(...)
+    aggregator = LogAggregator(logger)
+
+    def init_worker(client):
+        global logger
+        logger = get_logger(places={'logger': True, 'email': False,
+            'console': False})
+        logger.set_aggregator_client(client)
+
+    pool = multiprocessing.Pool(4, init_worker, (aggregator.client(),))
+    ...
+    pool.close()
+    pool.join()
+    logger.get_email_log()
+"""
+
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+
+from multiprocessing.util import Finalize
+from operator import attrgetter
+from base_logger import BaseLoggerClass, LogRecord, PeriodicFlusher
+
+LOGLEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+    'FATAL': logging.FATAL,
+}
+
+
+class AggregatorClient(BaseLoggerClass):
+    """
+    Class used in a worker process to ship its records to the LogAggregator
+    of the parent. Records are sent as (created, levelno, levelname,
+    message) tuples, 'batch_size' records per queue put, so workers take
+    the queue lock once per batch and not once per record. A batch is also
+    sent every 'flush_interval' seconds and when the worker exits.
+    Create it with LogAggregator.client() and add it to the worker's
+    MultiLogger with set_aggregator_client()
+    Class extends: BaseLoggerClass
+    """
+    def __init__(self, queue, loglevel='INFO', batch_size=256,
+            flush_interval=0.5):
+        """
+        Constructor to initialize AggregatorClient object.
+        """
+        if type(loglevel) == type(logging.INFO):
+            self.loglevel = loglevel
+        else:
+            self.loglevel = LOGLEVELS[loglevel]
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pid = None
+
+    def __getstate__(self):
+        """
+        Only the queue and the settings are sent to the worker process; the
+        buffer and its flush thread are created there
+        """
+        return {'queue': self.queue, 'loglevel': self.loglevel,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval, 'pid': None}
+
+    def start(self):
+        """
+        Method to set up the batch buffer in the current process. Called on
+        the first record logged in every process, so it also works when the
+        client is inherited by fork
+        """
+        self.pid = os.getpid()
+        self.batch = []
+        self.lock = threading.Lock()
+        if self.flush_interval:
+            self.flusher = PeriodicFlusher(self.flush, self.flush_interval)
+        else:
+            self.flusher = None
+        # atexit does not run in multiprocessing workers, finalizers do.
+        # Run before the queue's own finalizers, which stop its feeder
+        Finalize(self, self.close, exitpriority=100)
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller
+        """
+        if self.pid != os.getpid():
+            self.start()
+        message = record.message
+        if record.kwargs and record.exc_text:
+            # Tracebacks can not be sent to the parent, their text can
+            message = '%s\n%s' % (message, record.exc_text.rstrip())
+        self.lock.acquire()
+        try:
+            self.batch.append((record.created, record.levelno,
+                record.levelname, message))
+            full = len(self.batch) >= self.batch_size
+        finally:
+            self.lock.release()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Method to send the buffered records to the parent process
+        """
+        if self.pid != os.getpid():
+            return
+        self.lock.acquire()
+        try:
+            batch = self.batch
+            self.batch = []
+        finally:
+            self.lock.release()
+        if batch:
+            self.queue.put(batch)
+
+    def close(self):
+        """
+        Method to send the buffered records and stop the time based flush
+        """
+        if self.pid != os.getpid():
+            return
+        if self.flusher is not None:
+            self.flusher.stop()
+        self.flush()
+
+
+class LogAggregator(object):
+    """
+    Class used in the parent process to receive the records of the
+    AggregatorClients of its workers. A thread reads the batches from the
+    queue as they arrive; they are merged into the logger's email log, in
+    time order, when its get_email_log() is called or on collect().
+    highest_level_reported of the logger is updated as batches arrive.
+    Init arguments:
+        logger: the parent's MultiLogger
+    """
+    def __init__(self, logger):
+        """
+        Constructor to initialize LogAggregator object and start its thread
+        """
+        self.logger = logger
+        self.queue = multiprocessing.Queue()
+        self.received = collections.deque()
+        self.condition = threading.Condition()
+        self.syncs = 0
+        self.synced = 0
+        self.thread = threading.Thread(target=self.run,
+            name='multilogger-aggregator')
+        self.thread.daemon = True
+        self.thread.start()
+        logger.aggregator = self
+
+    def client(self, loglevel=None, batch_size=256, flush_interval=0.5):
+        """
+        Return: an AggregatorClient to pass to the worker processes.
+        loglevel defaults to the level of the parent's logger
+        """
+        if loglevel is None:
+            loglevel = self.logger.loglevel
+        return AggregatorClient(self.queue, loglevel, batch_size,
+            flush_interval)
+
+    def run(self):
+        """
+        Method run by the receiving thread
+        """
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if isinstance(batch, int):
+                # Put by collect(): every batch queued before it is received
+                self.condition.acquire()
+                try:
+                    self.synced = batch
+                    self.condition.notify_all()
+                finally:
+                    self.condition.release()
+                continue
+            self.received.append(batch)
+            highest = max(levelno for created, levelno, levelname, message
+                in batch)
+            if ((self.logger.highest_level_reported == None) or
+                (self.logger.highest_level_reported < highest)):
+                self.logger.highest_level_reported = highest
+
+    def collect(self):
+        """
+        Method to merge into the logger's email log every batch in the
+        queue by now, e.g. all those of workers that were joined. The
+        receiving thread is made to read up to a marker put on the queue
+        first, as only one reader can take from it at a time. Called by
+        MultiLogger.get_email_log()
+        """
+        if self.thread.is_alive():
+            self.condition.acquire()
+            try:
+                self.syncs += 1
+                sync = self.syncs
+                self.queue.put(sync)
+                while self.synced < sync and self.thread.is_alive():
+                    self.condition.wait(0.1)
+            finally:
+                self.condition.release()
+        records = []
+        while self.received:
+            for created, levelno, levelname, message in self.received.popleft():
+                record = LogRecord(levelno, levelname, message, (), None,
+                    created)
+                records.append(record)
+        email_logger = self.logger.email_logger
+        if records and email_logger is not None:
+            records.sort(key=attrgetter('created'))
+            email_logger.merge_records(records)
+
+    def close(self):
+        """
+        Method to stop the receiving thread after the batches already in
+        the queue, and merge them
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.collect()
@@ -0,0 +1,250 @@
+"""
+Reference collector for the 'network' place of MultiLogger (see
+networklogger). Accepts TCP connections from any number of nodes, decodes
+their batch frames and hands the records to a handler; by default they are
+written as lines to stdout or a file.
+
+Usage:
+    python logcollector.py --port 5140 --output collected.log
+
+or from Python, e.g. to test a node on one machine:
+    collector = LogCollector(('127.0.0.1', 0), handler)
+    collector.start()
+    ... NetworkLogger(address=collector.address) ...
+    collector.stop()
+"""
+
+import argparse
+import socket
+import sys
+import threading
+import time
+
+from networklogger import (ACK, ACK_MODULO, FLAG_HELLO, FRAME_HEADER,
+    decode_batch)
+
+# Frames larger than this are taken as a broken or foreign client
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def read_exactly(sock, size):
+    """
+    Return: the next 'size' bytes read from sock, or None if the connection
+    is closed before they are all read
+    """
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 262144))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class LineWriter(object):
+    """
+    Class to write collected records as lines like
+    'node1 2024-01-31 12:00:00.123 [ERROR] message' to a stream. Used as
+    the default LogCollector handler
+    """
+    def __init__(self, stream=None):
+        """
+        Constructor to initialize LineWriter object.
+        """
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def __call__(self, source, records):
+        """
+        Method to write the records of one batch from 'source'
+        """
+        lines = ['%s %s.%03d [%s] %s\n' % (source,
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)),
+            int(created % 1 * 1000), levelname, message)
+            for created, levelname, message in records]
+        text = ''.join(lines)
+        if not isinstance(text, str):
+            # unicode on Python 2
+            text = text.encode('utf-8')
+        self.lock.acquire()
+        try:
+            self.stream.write(text)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        """
+        Method to flush the stream
+        """
+        self.lock.acquire()
+        try:
+            self.stream.flush()
+        finally:
+            self.lock.release()
+
+
+class LogCollector(object):
+    """
+    Class to receive records from NetworkLoggers, with a thread per
+    connection. The handler is called as handler(source, records) for every
+    batch, records being (created, levelname, message) tuples; it is called
+    from several threads at once. A batch is acknowledged to the node once
+    the handler returns, so a slow handler slows the nodes down.
+    Init arguments:
+        address: (host, port) to listen on. Port 0 picks a free port; the
+                one used is in the 'address' property
+        handler: called with each batch. Default: a LineWriter on stdout
+    """
+    def __init__(self, address=('0.0.0.0', 5140), handler=None):
+        """
+        Constructor to initialize LogCollector object.
+        """
+        self.handler = handler or LineWriter()
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(tuple(address))
+        self.listener.listen(128)
+        self.address = self.listener.getsockname()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.threads = []
+        self.stopped = False
+        self.records = 0
+        self.frames = 0
+        self.bytes = 0
+        self.accept_thread = None
+
+    def start(self):
+        """
+        Method to accept connections on a background thread
+        """
+        self.accept_thread = threading.Thread(target=self.serve_forever,
+            name='logcollector-accept')
+        self.accept_thread.daemon = True
+        self.accept_thread.start()
+
+    def serve_forever(self):
+        """
+        Method to accept connections until stop() is called
+        """
+        while not self.stopped:
+            try:
+                sock, peer = self.listener.accept()
+            except socket.error:
+                if self.stopped:
+                    return
+                continue
+            thread = threading.Thread(target=self.receive, args=(sock,),
+                name='logcollector-%s:%s' % peer[:2])
+            thread.daemon = True
+            self.lock.acquire()
+            try:
+                self.connections.append(sock)
+                self.threads.append(thread)
+            finally:
+                self.lock.release()
+            thread.start()
+
+    def receive(self, sock):
+        """
+        Method run per connection: reads frames until the node disconnects
+        """
+        source = '%s:%s' % sock.getpeername()[:2]
+        batches = 0
+        try:
+            while True:
+                header = read_exactly(sock, FRAME_HEADER.size)
+                if header is None:
+                    return
+                size, flags = FRAME_HEADER.unpack(header)
+                if size > MAX_FRAME_BYTES:
+                    return
+                payload = read_exactly(sock, size)
+                if payload is None:
+                    return
+                if flags & FLAG_HELLO:
+                    source = payload.decode('utf-8')
+                    continue
+                records = decode_batch(payload, flags)
+                self.lock.acquire()
+                try:
+                    self.frames += 1
+                    self.records += len(records)
+                    self.bytes += FRAME_HEADER.size + size
+                finally:
+                    self.lock.release()
+                self.handler(source, records)
+                batches += 1
+                sock.sendall(ACK.pack(batches % ACK_MODULO))
+        except socket.error:
+            return
+        finally:
+            sock.close()
+            self.lock.acquire()
+            try:
+                if sock in self.connections:
+                    self.connections.remove(sock)
+                thread = threading.current_thread()
+                if thread in self.threads:
+                    self.threads.remove(thread)
+            finally:
+                self.lock.release()
+
+    def stop(self):
+        """
+        Method to stop accepting, close the open connections and wait for
+        their threads
+        """
+        self.stopped = True
+        try:
+            # Wakes up the accept() of serve_forever
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.listener.close()
+        self.lock.acquire()
+        try:
+            connections = list(self.connections)
+            threads = list(self.threads)
+        finally:
+            self.lock.release()
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        for thread in threads:
+            thread.join()
+        if self.accept_thread is not None:
+            self.accept_thread.join(1.0)
+
+
+def main():
+    """
+    Method to run the collector from the command line
+    """
+    parser = argparse.ArgumentParser(
+        description='Receive records from MultiLogger network places')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5140)
+    parser.add_argument('--output', help='file to append the records to. '
+        'Default: stdout')
+    arguments = parser.parse_args()
+    stream = None
+    if arguments.output:
+        stream = open(arguments.output, 'a')
+    writer = LineWriter(stream)
+    collector = LogCollector((arguments.host, arguments.port), writer)
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    collector.stop()
+    writer.flush()
+    sys.stderr.write('%d records in %d frames, %d bytes\n' % (
+        collector.records, collector.frames, collector.bytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Python module to count what MultiLogger does: records per level and, for
+every place, the records emitted, dropped and failed and the time spent in
+its emit method. The counters are ThreadCounters: every thread adds to an
+integer of its own, so the log calls of many threads can update them
+without a lock. In profiling mode the records, their size and the time
+spent in the places are also counted per call site, see CallSiteProfiler.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from timeit import default_timer
+
+# Upper bounds in microseconds of the latency histogram buckets. The last
+# bucket holds everything slower
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+    10000, 50000, 100000)
+# Call sites counted per template. Beyond it, e.g. for templates built per
+# call, new templates are counted per line only
+MAX_CALL_SITES = 10000
+CALL_SITE_ORDERS = ('records', 'bytes', 'seconds')
+
+
+class ThreadCounter(object):
+    """
+    Counter incremented from many threads without a lock: each thread adds
+    to a one item list of its own, found through a threading.local, and
+    value() sums them. The counts of threads that ended are folded into
+    'ended' by value(), so short lived threads do not pile up
+    """
+    def __init__(self):
+        """
+        Constructor to initialize ThreadCounter object.
+        """
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.ended = 0
+
+    def increment(self):
+        """
+        Method to add one to the count of the calling thread
+        """
+        try:
+            self.local.count[0] += 1
+        except AttributeError:
+            # First count of this thread
+            count = self.local.count = [1]
+            self.lock.acquire()
+            try:
+                self.threads.append((threading.current_thread(), count))
+            finally:
+                self.lock.release()
+
+    def value(self):
+        """
+        Return: the sum of the counts of all threads
+        """
+        self.lock.acquire()
+        try:
+            running = []
+            for thread, count in self.threads:
+                if thread.is_alive():
+                    running.append((thread, count))
+                else:
+                    self.ended += count[0]
+            self.threads = running
+            return self.ended + sum(count[0] for thread, count in running)
+        finally:
+            self.lock.release()
+
+
+class PlaceStats(object):
+    """
+    Class holding the counters of one place. Its instrument() wraps the emit
+    method of the place; the counters survive rebuilding the dispatch table
+    """
+    def __init__(self):
+        """
+        Constructor to initialize PlaceStats object.
+        """
+        self.emitted = ThreadCounter()
+        self.errors = ThreadCounter()
+        self.buckets = [ThreadCounter() for bound in LATENCY_BUCKETS]
+        self.buckets.append(ThreadCounter())
+        # Sum of floats has no atomic update; a lost addition under threads
+        # only makes the total slightly low
+        self.seconds = 0.0
+
+    def instrument(self, emit):
+        """
+        Return: emit method of a place wrapped to count its calls, errors
+        and latency. Exceptions of the place are counted and raised again
+        """
+        emitted = self.emitted.increment
+        errors = self.errors.increment
+        buckets = [bucket.increment for bucket in self.buckets]
+        bounds = [bound / 1e6 for bound in LATENCY_BUCKETS]
+        timer = default_timer
+        find = bisect.bisect_left
+
+        def instrumented_emit(record):
+            start = timer()
+            try:
+                emit(record)
+            except Exception:
+                errors()
+                raise
+            elapsed = timer() - start
+            emitted()
+            buckets[find(bounds, elapsed)]()
+            self.seconds += elapsed
+        return instrumented_emit
+
+    def snapshot(self):
+        """
+        Return: dictionary of the counters of the place
+        """
+        histogram = {}
+        for bound, bucket in zip(LATENCY_BUCKETS + (None,), self.buckets):
+            count = bucket.value()
+            if count:
+                histogram[bound and '<=%dus' % bound or
+                    '>%dus' % LATENCY_BUCKETS[-1]] = count
+        emitted = self.emitted.value()
+        return {
+            'emitted': emitted,
+            'errors': self.errors.value(),
+            'dropped': 0,
+            'seconds': self.seconds,
+            'mean_us': emitted and self.seconds / emitted * 1e6 or 0.0,
+            'latency_histogram': histogram,
+        }
+
+
+class LogStats(object):
+    """
+    Class holding the counters of a MultiLogger: a PlaceStats per place and
+    a record count per level. MultiLogger puts count_record() in the
+    dispatch table next to the emit methods, so a logger created with
+    stats=False has no counting code on its dispatch path at all
+    """
+    def __init__(self):
+        """
+        Constructor to initialize LogStats object.
+        """
+        self.places = {}
+        self.levels = {}
+
+    def place(self, name):
+        """
+        Return: the PlaceStats of a place, created on first use
+        """
+        if name not in self.places:
+            self.places[name] = PlaceStats()
+        return self.places[name]
+
+    def level_counter(self, level):
+        """
+        Return: method counting a record of the given level, to be used as
+        an emit method in the dispatch table
+        """
+        if level not in self.levels:
+            self.levels[level] = ThreadCounter()
+        count = self.levels[level].increment
+
+        def count_record(record):
+            count()
+        return count_record
+
+    def snapshot(self):
+        """
+        Return: dictionary with the record count per level name and the
+        counters per place
+        """
+        return {
+            'levels': dict((logging.getLevelName(level), count.value())
+                for level, count in self.levels.items()),
+            'places': dict((name, place.snapshot())
+                for name, place in self.places.items()),
+        }
+
+
+class CallSite(object):
+    """
+    Counters of one call site: a line logging one error_message template
+    """
+    __slots__ = ('filename', 'lineno', 'function', 'template', 'records',
+        'bytes', 'seconds')
+
+    def __init__(self, filename, lineno, function, template):
+        self.filename = filename
+        self.lineno = lineno
+        self.function = function
+        self.template = template
+        self.records = ThreadCounter()
+        # Sums of sizes and floats have no atomic update; a lost addition
+        # under threads only makes the total slightly low
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def run(self, places, record):
+        """
+        Method to call the emit methods of the places for a record of this
+        site, timing them. The size of the record is counted afterwards,
+        from the message if a place formed it
+        """
+        start = default_timer()
+        for emit in places:
+            emit(record)
+        self.seconds += default_timer() - start
+        self.bytes += record.size
+
+    def snapshot(self):
+        """
+        Return: dictionary of the counters of the site
+        """
+        records = self.records.value()
+        return {
+            'site': '%s:%d' % (self.filename, self.lineno),
+            'function': self.function,
+            'template': self.template,
+            'records': records,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'mean_us': records and self.seconds / records * 1e6 or 0.0,
+        }
+
+
+class CallSiteProfiler(object):
+    """
+    Class attributing records to the line of code that logged them. The
+    calling frame is found by walking up past the frames of the logger
+    modules in 'skip_files'; sites are cached by code object, line and
+    template, so a site costs a dictionary lookup after its first record.
+    Init arguments:
+        skip_files: co_filename of the modules whose frames are not call
+                sites, i.e. the logger's own
+    """
+    def __init__(self, skip_files):
+        """
+        Constructor to initialize CallSiteProfiler object.
+        """
+        self.skip_files = frozenset(skip_files)
+        self.sites = {}
+        self.started = time.time()
+
+    def site(self, frame, record):
+        """
+        Return: the CallSite of a record logged from 'frame' or one of the
+        frames it was called from
+        """
+        skip_files = self.skip_files
+        while frame is not None and frame.f_code.co_filename in skip_files:
+            frame = frame.f_back
+        if frame is None:
+            key = (None, 0, record.error_message)
+        else:
+            key = (frame.f_code, frame.f_lineno, record.error_message)
+        site = self.sites.get(key)
+        if site is None:
+            if len(self.sites) >= MAX_CALL_SITES:
+                key = key[:2] + (None,)
+                site = self.sites.get(key)
+            if site is None:
+                if frame is None:
+                    site = CallSite('<unknown>', 0, '<unknown>', key[2])
+                else:
+                    site = CallSite(frame.f_code.co_filename, frame.f_lineno,
+                        frame.f_code.co_name, key[2])
+                # setdefault: a site created by two threads at once is
+                # counted once
+                site = self.sites.setdefault(key, site)
+        return site
+
+    def top_call_sites(self, n=10, by='seconds'):
+        """
+        Return: list of the counters of the n call sites with the most
+        'seconds', 'records' or 'bytes', highest first. n None returns all
+        """
+        if by not in CALL_SITE_ORDERS:
+            raise ValueError('by must be one of %s' %
+                ', '.join(CALL_SITE_ORDERS))
+        sites = [site.snapshot() for site in list(self.sites.values())]
+        sites.sort(key=lambda site: site[by], reverse=True)
+        if n is not None:
+            sites = sites[:n]
+        return sites
+
+    def dump(self, path, n=None, by='seconds'):
+        """
+        Method to write the top_call_sites() report as a text table to path
+        """
+        sites = self.top_call_sites(n, by)
+        lines = ['# Call sites by %s, profiled for %.1fs' % (by,
+            time.time() - self.started),
+            '%10s %12s %10s %10s  %s' % ('records', 'bytes', 'seconds',
+                'mean_us', 'site / function / template')]
+        for site in sites:
+            lines.append('%10d %12d %10.4f %10.2f  %s %s() %r' % (
+                site['records'], site['bytes'], site['seconds'],
+                site['mean_us'], site['site'], site['function'],
+                site['template']))
+        report = open(path, 'w')
+        try:
+            report.write('\n'.join(lines) + '\n')
+        finally:
+            report.close()
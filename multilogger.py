@@ -3,15 +3,26 @@ Python module to facilitate logging at three places simultaneously:
 1. System Logger (rsyslog)
 2. Logger mails (Attaching debug logs)
 3. System console
+4. Log file (optional 'file' place)
+5. Log collector over TCP (optional 'network' place)
 +++ Logging in other areas if required (future additions)
 """
 
+import functools
 import logging
+import sys
+import threading
 
-from logging.handlers import SysLogHandler
-from base_logger import BaseLoggerClass
+from base_logger import (BaseLoggerClass, LogContext, LogRecord,
+    traceback_cache)
 from consolelogger import ConsoleLogger
+from dispatchworker import DispatchWorker
 from emaillogger import EmailLogger
+from filelogger import FileLogger
+from logstats import CallSiteProfiler, LogStats
+from networklogger import NetworkLogger
+from ratelimit import RateLimiter, SuppressionReporter
+from sysloglogger import SysLogLogger
 
 
 LOGLEVELS = {
@@ -25,14 +36,76 @@ LOGLEVELS = {
     'FATAL': logging.FATAL,
 }
 
+LEVELS = (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR,
+    logging.CRITICAL)
+
+# MultiLoggers shared by get_logger(), keyed by their configuration
+logger_registry = {}
+registry_lock = threading.Lock()
+
+
+def place_options(place):
+    """
+    Method to return the options given for a place in 'places'. A place can
+    be enabled with True or with a dictionary of keyword arguments for its
+    set_<place>_logger method, e.g. {'email': {'max_bytes': 1048576}}
+    """
+    if isinstance(place, dict):
+        return place
+    return {}
+
+
+def place_enabled(place):
+    """
+    Method to tell whether a place in 'places' is enabled: by a true value
+    or by a dictionary of options, empty or not
+    """
+    return isinstance(place, dict) or bool(place)
+
+
+def config_key(value):
+    """
+    Method to return a hashable form of a get_logger argument: dictionaries
+    become sorted tuples of their items, lists become tuples
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, config_key(item))
+            for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(config_key(item) for item in value)
+    return value
+
 
 def get_logger(places={'logger': True, 'email': True, 'console': False},
-            loglevel='INFO', facility=None, enable_color=True):
+            loglevel='INFO', facility=None, enable_color=True,
+            background=False, queue_size=10000, overflow='block',
+            stats=True, shared=True):
     """
     Method to create a MultiLogger object using the arguments and
-    return the same
+    return the same.
+    With shared=True, calls with the same arguments return the same
+    MultiLogger, so code creating a logger per task or request does not
+    open a syslog socket, a flush thread... per call. The email logs and
+    highest_level_reported are then shared too; pass shared=False for a
+    logger of its own. Every call should be matched by a close(); the
+    places are closed when the last user closes it
     """
-    logger = MultiLogger(places, loglevel, facility, enable_color)
+    if not shared:
+        return MultiLogger(places, loglevel, facility, enable_color,
+            background, queue_size, overflow, stats)
+    key = config_key((places, LOGLEVELS.get(loglevel, loglevel), facility,
+        enable_color, background, queue_size, overflow, stats))
+    registry_lock.acquire()
+    try:
+        logger = logger_registry.get(key)
+        if logger is None:
+            logger = MultiLogger(places, loglevel, facility, enable_color,
+                background, queue_size, overflow, stats)
+            logger.registry_key = key
+            logger_registry[key] = logger
+        logger.references += 1
+    finally:
+        registry_lock.release()
     return logger
 
 
@@ -42,16 +115,32 @@ class MultiLogger(BaseLoggerClass):
     1. System Logger (rsyslog)
     2. Multi mails (Attaching debug logs)
     3. System console
+    4. Log file
+    5. Log collector (see logcollector)
     +++ Logging in other areas if required (future additions)
     Init arguments:
         places: dictionary with string keys & boolean values to
-                enable/disable logging in different places
+                enable/disable logging in different places. A dictionary
+                value enables the place and is passed as keyword arguments
+                to its set_<place>_logger method. The optional 'file'
+                place needs a path, e.g. {'file': {'path': 'job.log'}},
+                the 'network' place the collector address, e.g.
+                {'network': {'address': ('logs.example.com', 5140)}}
         facility: used by system logger
         loglevel: Log Level for logs. Default: 'INFO'
         enable_color: used by console logger. Enables color output
+        background: log in the places from a background thread. Log calls
+                only queue the record, see DispatchWorker
+        queue_size: maximum number of queued records in background mode
+        overflow: policy when the queue is full in background mode:
+                'block', 'drop-oldest' or 'drop-low-severity'
+        stats: count records and time the places for stats(). With False
+                the counting is left out of the dispatch path entirely
     """
     def __init__(self, places={'logger': True, 'email': True, 'console': False},
-            loglevel='INFO', facility=None, enable_color=True):
+            loglevel='INFO', facility=None, enable_color=True,
+            background=False, queue_size=10000, overflow='block',
+            stats=True):
         """
         Constructor to initialize MultiLogger object.
         """
@@ -59,103 +148,496 @@ class MultiLogger(BaseLoggerClass):
             self.loglevel = loglevel
         else:
             self.loglevel = LOGLEVELS[loglevel]
-        self.log_in_logger = bool(places['logger'])
-        self.log_in_email = bool(places['email'])
-        self.log_in_console = bool(places['console'])
+        self.log_in_logger = place_enabled(places['logger'])
+        self.log_in_email = place_enabled(places['email'])
+        self.log_in_console = place_enabled(places['console'])
+        self.log_in_file = place_enabled(places.get('file'))
+        self.log_in_network = place_enabled(places.get('network'))
+        self.system_logger = None
+        self.email_logger = None
+        self.console_logger = None
+        self.file_logger = None
+        self.network_logger = None
+        self.aggregator_client = None
+        self.aggregator = None
+        self.registry_key = None
+        self.references = 0
+        self.rate_limits = {}
+        self.profiler = None
+        self.suppression_reporter = SuppressionReporter()
+        if stats:
+            self.log_stats = LogStats()
+        else:
+            self.log_stats = None
         if self.log_in_logger == True:
-            self.set_system_logger(self.loglevel, facility)
+            self.set_system_logger(self.loglevel, facility,
+                **place_options(places['logger']))
         else:
             self.system_logger = None
         if self.log_in_email == True:
-            self.set_email_logger(self.loglevel)
+            self.set_email_logger(self.loglevel,
+                **place_options(places['email']))
         else:
             self.email_logger = None
         if self.log_in_console == True:
-            self.set_console_logger(self.loglevel, enable_color)
+            self.set_console_logger(self.loglevel, enable_color,
+                **place_options(places['console']))
         else:
             self.console_logger = None
+        if self.log_in_file == True:
+            self.set_file_logger(self.loglevel,
+                **place_options(places['file']))
+        if self.log_in_network == True:
+            self.set_network_logger(self.loglevel,
+                **place_options(places['network']))
         self.highest_level_reported = None
+        if background:
+            self.dispatch_worker = DispatchWorker(queue_size, overflow)
+        else:
+            self.dispatch_worker = None
+        self.build_dispatch_table()
+
+    def build_dispatch_table(self):
+        """
+        Method to build 'dispatch_table': for every log level, a tuple of
+        the emit methods of the places that accept the level. Disabled
+        levels map to an empty tuple. Called on any level or place change;
+        call it again after changing the log_in_* properties by hand
+        """
+        places = []
+        if isinstance(self.system_logger, BaseLoggerClass):
+            places.append(('logger', self.system_logger.loglevel,
+                self.system_logger.emit))
+        elif self.log_in_logger and self.system_logger is not None:
+            places.append(('logger', self.loglevel, self.emit_system_logger))
+        if self.log_in_email and self.email_logger is not None:
+            places.append(('email', self.email_logger.loglevel,
+                self.email_logger.emit))
+        if self.log_in_console and self.console_logger is not None:
+            places.append(('console', self.console_logger.loglevel,
+                self.console_logger.emit))
+        if self.log_in_file and self.file_logger is not None:
+            places.append(('file', self.file_logger.loglevel,
+                self.file_logger.emit))
+        if self.log_in_network and self.network_logger is not None:
+            places.append(('network', self.network_logger.loglevel,
+                self.network_logger.emit))
+        if self.aggregator_client is not None:
+            places.append(('aggregator', self.aggregator_client.loglevel,
+                self.aggregator_client.emit))
+        log_stats = self.log_stats
+        if log_stats is not None:
+            places = [(place, place_level,
+                log_stats.place(place).instrument(emit))
+                for place, place_level, emit in places]
+        reporter = self.suppression_reporter
+        dispatch_table = {}
+        for level in LEVELS:
+            emits = []
+            if level >= self.loglevel:
+                for place, place_level, emit in places:
+                    if level < place_level:
+                        continue
+                    limiter = self.rate_limits.get((place, level),
+                        self.rate_limits.get((place, None)))
+                    if limiter is not None:
+                        emit = reporter.limit('%s/%s' % (place,
+                            logging.getLevelName(level)), limiter, emit)
+                    emits.append(emit)
+            if emits and log_stats is not None:
+                emits.insert(0, log_stats.level_counter(level))
+            dispatch_table[level] = tuple(emits)
+        reporter.places = tuple(emit for place, place_level, emit in places
+            if logging.WARNING >= max(place_level, self.loglevel))
+        self.dispatch_table = dispatch_table
+
+    def set_rate_limit(self, place, level=None, rate=None, burst=None,
+            sample_every=None, sample_rate=None, per_template=False):
+        """
+        Method to rate limit and/or sample the records sent to a place
+        ('logger', 'email', 'console', 'file', 'network' or 'aggregator'), for
+        one level or, with level None, for every level without a limit of its own. See
+        RateLimiter for the arguments. Without rate, sample_every and
+        sample_rate the limit is removed. Suppressed records are reported
+        in one summary record every suppression_reporter.interval seconds
+        """
+        if level is not None and type(level) != type(logging.INFO):
+            level = LOGLEVELS[level]
+        if rate is None and sample_every is None and sample_rate is None:
+            self.rate_limits.pop((place, level), None)
+        else:
+            self.rate_limits[(place, level)] = RateLimiter(rate, burst,
+                sample_every, sample_rate, per_template)
+        self.build_dispatch_table()
+
+    def set_level(self, loglevel):
+        """
+        Method to change the log level of this logger and of all its places
+        at runtime
+        """
+        if type(loglevel) != type(logging.INFO):
+            loglevel = LOGLEVELS[loglevel]
+        self.loglevel = loglevel
+        if isinstance(self.system_logger, BaseLoggerClass):
+            self.system_logger.loglevel = loglevel
+        elif self.system_logger is not None:
+            self.system_logger.setLevel(loglevel)
+        if self.email_logger is not None:
+            self.email_logger.loglevel = loglevel
+        if self.console_logger is not None:
+            self.console_logger.loglevel = loglevel
+        if self.file_logger is not None:
+            self.file_logger.loglevel = loglevel
+        if self.network_logger is not None:
+            self.network_logger.loglevel = loglevel
+        self.build_dispatch_table()
+
+    def is_enabled_for(self, level):
+        """
+        Return: True if a message of the given level (number or name) would
+        be logged in at least one place. Callers can use it to skip building
+        costly log arguments
+        """
+        return bool(self.dispatch_table.get(LOGLEVELS.get(level, level)))
+
+    def set_profiling(self, enabled=True):
+        """
+        Method to switch profiling mode on or off at runtime. In profiling
+        mode every record is counted, with its size and the time its places
+        took, under the line of code that logged it; see top_call_sites().
+        The counts are kept when profiling is switched off, switching it on
+        again continues them. Off, profiling costs nothing
+        """
+        if enabled:
+            if self.profiler is None:
+                self.profiler = CallSiteProfiler(
+                    [MultiLogger.dispatch.__code__.co_filename])
+            # Shadows the dispatch method for this logger only
+            self.dispatch = self.profiled_dispatch
+        else:
+            self.__dict__.pop('dispatch', None)
+
+    def profiled_dispatch(self, places, record):
+        """
+        dispatch() of profiling mode: counts the record under its call site
+        and has the site time its places, also on the background thread
+        """
+        site = self.profiler.site(sys._getframe(1), record)
+        site.records.increment()
+        MultiLogger.dispatch(self, (functools.partial(site.run, places),),
+            record)
 
-    def set_system_logger(self, loglevel, facility=None):
+    def top_call_sites(self, n=10, by='seconds'):
+        """
+        Return: list of the n call sites with the most 'seconds' spent in
+        the places, 'records' or 'bytes' logged, highest first, as
+        dictionaries with site ('file:line'), function, template, records,
+        bytes, seconds & mean_us. Empty if profiling was never on
+        """
+        if self.profiler is None:
+            return []
+        return self.profiler.top_call_sites(n, by)
+
+    def dump_call_sites(self, path, n=None, by='seconds'):
+        """
+        Method to write the top_call_sites() report to a file as a table
+        """
+        if self.profiler is None:
+            raise ValueError('profiling was never switched on, see '
+                'set_profiling()')
+        self.profiler.dump(path, n, by)
+
+    def bind(self, **fields):
+        """
+        Return: BoundLogger logging in the places of this logger with the
+        given fields, e.g. bind(request_id=42).info('served') logs
+        '[request_id=42] served'. The prefix is rendered once for the bound
+        logger, not per record
+        """
+        return BoundLogger(self, LogContext(fields))
+
+    def set_system_logger(self, loglevel, facility=None, **kwargs):
         """
         Method to create a System Logger object using the arguments and
-        set the same as property 'system_logger'
+        set the same as property 'system_logger'. With a facility this is a
+        SysLogLogger sending to rsyslog in batches; kwargs are passed on to
+        it (address, batch_size, flush_interval...). Without a facility the
+        root logger of the logging module is used
         """
-        logger = logging.getLogger()
-        logger.setLevel(loglevel)
+        if isinstance(self.system_logger, BaseLoggerClass):
+            self.system_logger.close()
         if facility:
-            syslog = SysLogHandler(address='/dev/log', facility=facility)
-            formatter = logging.Formatter('%(name)s: %(levelname)s %(message)r')
-            syslog.setFormatter(formatter)
-            logger.addHandler(syslog)
-        self.system_logger = logger
+            self.system_logger = SysLogLogger(loglevel, facility, **kwargs)
+        else:
+            logger = logging.getLogger()
+            logger.setLevel(loglevel)
+            self.system_logger = logger
+        self.build_dispatch_table()
 
-    def set_email_logger(self, loglevel):
+    def set_email_logger(self, loglevel, max_bytes=None, max_records=None,
+            **kwargs):
         """
         Method to create a EmailLogger object using the arguments and
-        set the same as property 'email_logger'
+        set the same as property 'email_logger'. max_bytes/max_records cap
+        the memory used by the email logs; kwargs are passed on to
+        EmailLogger (spill_threshold, spill_dir, spill_path...)
         """
-        self.email_logger = EmailLogger(loglevel)
+        if self.email_logger is not None:
+            self.email_logger.close()
+        self.email_logger = EmailLogger(loglevel, max_bytes, max_records,
+            **kwargs)
+        self.build_dispatch_table()
 
-    def set_console_logger(self, loglevel, enable_color):
+    def set_console_logger(self, loglevel, enable_color, **kwargs):
         """
         Method to create a ConsoleLogger object using the arguments and
-        set the same as property 'console_logger'
+        set the same as property 'console_logger'. kwargs are passed on to
+        ConsoleLogger (buffered, buffer_size, flush_interval...)
+        """
+        if self.console_logger is not None:
+            self.console_logger.close()
+        self.console_logger = ConsoleLogger(loglevel, enable_color, **kwargs)
+        self.build_dispatch_table()
+
+    def set_file_logger(self, loglevel, path=None, **kwargs):
+        """
+        Method to create a FileLogger object using the arguments and
+        set the same as property 'file_logger'. kwargs are passed on to
+        FileLogger (batch_bytes, fsync_interval, max_bytes...)
+        """
+        if self.file_logger is not None:
+            self.file_logger.close()
+        self.file_logger = FileLogger(loglevel, path, **kwargs)
+        self.log_in_file = True
+        self.build_dispatch_table()
+
+    def set_network_logger(self, loglevel, **kwargs):
+        """
+        Method to create a NetworkLogger object using the arguments and
+        set the same as property 'network_logger'. kwargs are passed on to
+        NetworkLogger (address, source, compress_level...)
+        """
+        if self.network_logger is not None:
+            self.network_logger.close()
+        self.network_logger = NetworkLogger(loglevel, **kwargs)
+        self.log_in_network = True
+        self.build_dispatch_table()
+
+    def set_aggregator_client(self, client):
+        """
+        Method to ship the records of this logger to the parent process
+        through an AggregatorClient (see logaggregator). Used in
+        multiprocessing workers
         """
-        self.console_logger = ConsoleLogger(loglevel)
+        self.aggregator_client = client
+        self.build_dispatch_table()
 
-    def get_email_log(self):
+    def flush(self):
         """
-        Return: The logs which can be appended in email
+        Method to wait until every record logged so far has reached its
+        places and buffered places have written it out
+        """
+        if self.dispatch_worker is not None:
+            self.dispatch_worker.flush()
+        if self.suppression_reporter.counts:
+            self.suppression_reporter.report()
+        for logger in self.loggers():
+            logger.flush()
+
+    def close(self):
+        """
+        Method to log all queued records, stop the background thread and
+        close the places. Records logged after close() are logged on the
+        calling thread. A logger shared by get_logger() is only closed by
+        its last user; it is then removed from the registry, so the next
+        get_logger() call creates a new one
+        """
+        if self.registry_key is not None:
+            registry_lock.acquire()
+            try:
+                self.references -= 1
+                if self.references > 0:
+                    return
+                if logger_registry.get(self.registry_key) is self:
+                    del logger_registry[self.registry_key]
+                self.registry_key = None
+            finally:
+                registry_lock.release()
+        if self.dispatch_worker is not None:
+            self.dispatch_worker.close()
+        for logger in self.loggers():
+            logger.close()
+
+    def stats(self):
         """
+        Return: dictionary of counters, or None if the logger was created
+        with stats=False:
+            levels: records dispatched per level name
+            places: per place the records emitted, dropped (rate limits,
+                full buffers, evicted email logs) and failed with an
+                exception, the seconds spent in its emit method and a
+                histogram of the emit latency
+            email_buffer: size of the email logs, see
+                EmailLogger.buffer_stats()
+            queue: records waiting and dropped in background mode
+            tracebacks: hits, misses and size of the formatted traceback
+                cache shared by all loggers
+        """
+        if self.log_stats is None:
+            return None
+        stats = self.log_stats.snapshot()
+        places = stats['places']
+        for (place, level), limiter in self.rate_limits.items():
+            if place in places:
+                places[place]['dropped'] += limiter.dropped
+        if isinstance(self.system_logger, SysLogLogger) and 'logger' in places:
+            places['logger']['dropped'] += self.system_logger.dropped
+        if self.network_logger is not None and 'network' in places:
+            places['network']['dropped'] += self.network_logger.dropped
+        if self.email_logger is not None:
+            stats['email_buffer'] = self.email_logger.buffer_stats()
+            if 'email' in places:
+                places['email']['dropped'] += stats['email_buffer']['elided']
+        if self.dispatch_worker is not None:
+            stats['queue'] = {'pending': self.dispatch_worker.unfinished,
+                'dropped': self.dispatch_worker.dropped}
+        stats['tracebacks'] = traceback_cache.stats()
+        return stats
+
+    def loggers(self):
+        """
+        Return: list of the loggers of the enabled places that extend
+        BaseLoggerClass
+        """
+        return [logger for logger in (self.system_logger, self.email_logger,
+            self.console_logger, self.file_logger, self.network_logger,
+            self.aggregator_client)
+            if isinstance(logger, BaseLoggerClass)]
+
+    def get_email_log(self, min_level=None, since=None, until=None,
+            contains=None, limit=None):
+        """
+        Return: The logs which can be appended in email. In background mode
+        all records logged before the call are included, and the records of
+        multiprocessing workers received by a LogAggregator are merged in.
+        The arguments select records, e.g. get_email_log('ERROR',
+        since=time.time() - 300) for the errors of the last five minutes;
+        see EmailLogger.query()
+        """
+        self.sync_email_log()
         if self.log_in_email == True:
-            return self.email_logger.get_email_log()
+            return self.email_logger.get_email_log(min_level, since, until,
+                contains, limit)
         return ''
 
+    def iter_compressed_email_log(self, compression='gzip', chunk_size=65536,
+            level=6):
+        """
+        Return: generator yielding the email logs as 'gzip' or 'zstd'
+        compressed bytes, built piece by piece
+        """
+        self.sync_email_log()
+        if self.log_in_email == True:
+            return self.email_logger.iter_compressed_email_log(compression,
+                chunk_size, level)
+        return iter(())
+
+    def get_email_log_attachment(self, filename='email_log.txt',
+            compression='gzip', level=6):
+        """
+        Return: MIMEApplication holding the compressed email logs, ready to
+        be attached to an email, or None if email logging is disabled
+        """
+        self.sync_email_log()
+        if self.log_in_email == True:
+            return self.email_logger.get_email_log_attachment(filename,
+                compression, level)
+        return None
+
+    def send_email_log(self, sender, subject=None):
+        """
+        Method to mail the email logs through an EmailSender (see
+        emailsender), if highest_level_reported reaches its min_level. The
+        mail is sent from the sender's threads. Return: True if queued
+        """
+        if self.log_in_email != True:
+            return False
+        return sender.send_log(self, subject)
+
+    def sync_email_log(self):
+        """
+        Method to bring the email logs up to date: waits for queued records
+        and merges the records received from multiprocessing workers
+        """
+        self.flush()
+        if self.aggregator is not None:
+            self.aggregator.collect()
+
+    def emit(self, record):
+        """
+        Logs a LogRecord in every place that accepts its level
+        """
+        self.dispatch(self.dispatch_table.get(record.levelno, ()), record)
+
+    def dispatch(self, places, record):
+        """
+        Method to hand a LogRecord to the emit methods of the given places.
+        The record's message is formed at most once and shared by all the
+        places
+        """
+        if self.dispatch_worker is None:
+            for emit in places:
+                emit(record)
+        else:
+            kwargs = record.kwargs
+            if kwargs and kwargs.get('exc_info') == True:
+                # The worker thread has no exception to look at
+                kwargs['exc_info'] = sys.exc_info()
+            self.dispatch_worker.put(places, record)
+        if ((self.highest_level_reported == None) or
+            (self.highest_level_reported < record.levelno)):
+            self.highest_level_reported = record.levelno
+
+    def emit_system_logger(self, record):
+        """
+        Logs a LogRecord on the system logger. error_message & args are
+        handed to the logging module, which %-formats them
+        """
+        if record.context is not None:
+            template = (record.context.prefix.replace('%', '%%') +
+                record.error_message)
+            self.system_logger.log(record.levelno, template, *record.args,
+                extra=record.context.extra, **(record.kwargs or {}))
+        else:
+            self.system_logger.log(record.levelno, record.error_message,
+                *record.args, **(record.kwargs or {}))
+
     def debug(self, error_message, *args, **kwargs):
         """
         Logs a message with level DEBUG on this logger
         """
-        if logging.DEBUG >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.debug(error_message, *args, **kwargs)
-            if self.log_in_email:
-                self.email_logger.debug(error_message, *args, **kwargs)
-            if self.log_in_console:
-                self.console_logger.debug(error_message, *args, **kwargs)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.DEBUG)):
-            self.highest_level_reported = logging.DEBUG
+        places = self.dispatch_table[logging.DEBUG]
+        if places:
+            self.dispatch(places, LogRecord(logging.DEBUG, 'DEBUG',
+                error_message, args, kwargs))
 
     def info(self, error_message, *args, **kwargs):
         """
         Logs a message with level INFO on this logger
         """
-        if logging.INFO >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.info(error_message, *args, **kwargs)
-            if self.log_in_email:
-                self.email_logger.info(error_message, *args, **kwargs)
-            if self.log_in_console:
-                self.console_logger.info(error_message, *args, **kwargs)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.INFO)):
-            self.highest_level_reported = logging.INFO
+        places = self.dispatch_table[logging.INFO]
+        if places:
+            self.dispatch(places, LogRecord(logging.INFO, 'INFO',
+                error_message, args, kwargs))
 
     def warning(self, error_message, *args, **kwargs):
         """
         Logs a message with level WARNING on this logger
         """
-        if logging.WARNING >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.warning(error_message, *args, **kwargs)
-            if self.log_in_email:
-                self.email_logger.warning(error_message, *args, **kwargs)
-            if self.log_in_console:
-                self.console_logger.warning(error_message, *args, **kwargs)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.WARNING)):
-            self.highest_level_reported = logging.WARNING
+        places = self.dispatch_table[logging.WARNING]
+        if places:
+            self.dispatch(places, LogRecord(logging.WARNING, 'WARNING',
+                error_message, args, kwargs))
 
     def warn(self, error_message, *args, **kwargs):
         """
@@ -167,16 +649,10 @@ class MultiLogger(BaseLoggerClass):
         """
         Logs a message with level ERROR on this logger
         """
-        if logging.ERROR >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.error(error_message, *args, **kwargs)
-            if self.log_in_email:
-                self.email_logger.error(error_message, *args, **kwargs)
-            if self.log_in_console:
-                self.console_logger.error(error_message, *args, **kwargs)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.ERROR)):
-            self.highest_level_reported = logging.ERROR
+        places = self.dispatch_table[logging.ERROR]
+        if places:
+            self.dispatch(places, LogRecord(logging.ERROR, 'ERROR',
+                error_message, args, kwargs))
 
     def exception(self, error_message, *args):
         """
@@ -184,29 +660,140 @@ class MultiLogger(BaseLoggerClass):
         added to the logging message. This method should only be called
         from an exception
         """
-        if logging.ERROR >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.exception(error_message, *args)
-            if self.log_in_email:
-                self.email_logger.exception(error_message, *args)
-            if self.log_in_console:
-                self.console_logger.exception(error_message, *args)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.ERROR)):
-            self.highest_level_reported = logging.ERROR
+        places = self.dispatch_table[logging.ERROR]
+        if places:
+            self.dispatch(places, LogRecord(logging.ERROR, 'EXCEPTION',
+                error_message, args, {'exc_info': sys.exc_info()}))
 
     def critical(self, error_message, *args, **kwargs):
         """
         Logs a message with level CRITICAL on this logger
         """
-        if logging.CRITICAL >= self.loglevel:
-            if self.log_in_logger:
-                self.system_logger.critical(error_message, *args, **kwargs)
-            if self.log_in_email:
-                self.email_logger.critical(error_message, *args, **kwargs)
-            if self.log_in_console:
-                self.console_logger.critical(error_message, *args, **kwargs)
-        if ((self.highest_level_reported == None) or
-            (self.highest_level_reported < logging.CRITICAL)):
-            self.highest_level_reported = logging.CRITICAL
+        places = self.dispatch_table[logging.CRITICAL]
+        if places:
+            self.dispatch(places, LogRecord(logging.CRITICAL, 'CRITICAL',
+                error_message, args, kwargs))
 
+
+class BoundLogger(BaseLoggerClass):
+    """
+    Logger returned by MultiLogger.bind(). Logs in the places of its
+    MultiLogger, through the same dispatch table, with the fields of its
+    LogContext: the text places show them as a prefix of the messages, the
+    root logger of the logging module gets them as 'extra' and every place
+    finds them in record.fields. Creating one costs a LogContext; it holds
+    no resources of its own, so close() leaves the MultiLogger open.
+    Init arguments:
+        logger: the MultiLogger
+        context: LogContext with the bound fields
+    Class extends: BaseLoggerClass
+    """
+    def __init__(self, logger, context):
+        """
+        Constructor to initialize BoundLogger object.
+        """
+        self.logger = logger
+        self.context = context
+
+    @property
+    def fields(self):
+        """
+        The bound fields, as a dictionary
+        """
+        return self.context.fields
+
+    def bind(self, **fields):
+        """
+        Return: BoundLogger with the fields of this one and the given ones
+        """
+        return BoundLogger(self.logger, LogContext(fields, self.context))
+
+    def is_enabled_for(self, level):
+        """
+        Return: True if a message of the given level would be logged
+        """
+        return self.logger.is_enabled_for(level)
+
+    def emit(self, record):
+        """
+        Logs a LogRecord in the places of the MultiLogger, with the fields
+        of this logger unless the record has a context already
+        """
+        if record.context is None:
+            record.context = self.context
+        self.logger.emit(record)
+
+    def flush(self):
+        """
+        Flushes the MultiLogger
+        """
+        self.logger.flush()
+
+    def debug(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level DEBUG on this logger
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.DEBUG]
+        if places:
+            logger.dispatch(places, LogRecord(logging.DEBUG, 'DEBUG',
+                error_message, args, kwargs, None, self.context))
+
+    def info(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level INFO on this logger
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.INFO]
+        if places:
+            logger.dispatch(places, LogRecord(logging.INFO, 'INFO',
+                error_message, args, kwargs, None, self.context))
+
+    def warning(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level WARNING on this logger
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.WARNING]
+        if places:
+            logger.dispatch(places, LogRecord(logging.WARNING, 'WARNING',
+                error_message, args, kwargs, None, self.context))
+
+    def warn(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level WARNING on this logger
+        """
+        self.warning(error_message, *args, **kwargs)
+
+    def error(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level ERROR on this logger
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.ERROR]
+        if places:
+            logger.dispatch(places, LogRecord(logging.ERROR, 'ERROR',
+                error_message, args, kwargs, None, self.context))
+
+    def exception(self, error_message, *args):
+        """
+        Logs a message with level ERROR on this logger. Exception info is
+        added to the logging message. This method should only be called
+        from an exception
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.ERROR]
+        if places:
+            logger.dispatch(places, LogRecord(logging.ERROR, 'EXCEPTION',
+                error_message, args, {'exc_info': sys.exc_info()}, None,
+                self.context))
+
+    def critical(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level CRITICAL on this logger
+        """
+        logger = self.logger
+        places = logger.dispatch_table[logging.CRITICAL]
+        if places:
+            logger.dispatch(places, LogRecord(logging.CRITICAL, 'CRITICAL',
+                error_message, args, kwargs, None, self.context))
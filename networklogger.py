@@ -0,0 +1,509 @@
+"""
+Python module to ship logs to a central collector (see logcollector) over
+a persistent TCP connection. Records are sent in batches from a background
+thread as compact length-prefixed frames, optionally zlib compressed. A
+slow or missing collector never blocks the program using it: unsent
+records wait in a bounded buffer while the connection is retried with
+backoff.
+
+Frame: 4 byte payload length, 1 byte flags, payload. The first frame on a
+connection is a FLAG_HELLO frame whose payload is the UTF-8 source name.
+Batch payload: records of 8 byte time (double), 1 byte level code, 4 byte
+message length & UTF-8 message. After handling a batch the collector sends
+back an ACK: the 4 byte number of batches handled on the connection. All
+integers are big endian.
+Class extends: BaseLoggerClass
+"""
+
+import collections
+import logging
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from base_logger import (BaseLoggerClass, LogRecord, call_at_exit,
+    cancel_at_exit)
+
+LOGLEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+    'FATAL': logging.FATAL,
+}
+
+# Level codes sent in the records, and the level names they stand for
+LEVEL_CODES = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR + 1,
+    'CRITICAL': logging.CRITICAL,
+}
+LEVEL_NAMES = dict((code, name) for name, code in LEVEL_CODES.items())
+
+FRAME_HEADER = struct.Struct('>IB')
+RECORD_HEADER = struct.Struct('>dBI')
+FLAG_COMPRESSED = 1
+FLAG_HELLO = 2
+# Sent back by the collector: number of batches handled on the connection
+ACK = struct.Struct('>I')
+ACK_MODULO = 1 << 32
+# Batches sent before the sender waits for an acknowledgement
+ACK_WINDOW = 8
+# Batches smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 512
+
+
+def encode_frame(payload, flags=0):
+    """
+    Method to return a frame holding 'payload' bytes
+    """
+    return FRAME_HEADER.pack(len(payload), flags) + payload
+
+
+def encode_batch(entries, compress_level=None):
+    """
+    Method to return the frame of a batch of (created, code, message bytes)
+    entries, compressed at compress_level if given
+    """
+    pack = RECORD_HEADER.pack
+    payload = b''.join([pack(created, code, len(message)) + message
+        for created, code, message in entries])
+    flags = 0
+    if compress_level is not None and len(payload) >= COMPRESS_MIN_BYTES:
+        payload = zlib.compress(payload, compress_level)
+        flags = FLAG_COMPRESSED
+    return encode_frame(payload, flags)
+
+
+def decode_batch(payload, flags):
+    """
+    Return: list of (created, levelname, message) records of a batch frame
+    """
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    records = []
+    offset = 0
+    unpack = RECORD_HEADER.unpack_from
+    while offset < len(payload):
+        created, code, size = unpack(payload, offset)
+        offset += RECORD_HEADER.size
+        records.append((created, LEVEL_NAMES.get(code, str(code)),
+            payload[offset:offset + size].decode('utf-8')))
+        offset += size
+    return records
+
+
+class NetworkLogger(BaseLoggerClass):
+    """
+    Class to send logs to a collector in batches over TCP. A batch is sent
+    when 'batch_size' records wait, when a record of 'flush_level' or above
+    is logged and every 'flush_interval' seconds.
+    Init arguments:
+        loglevel: Log Level for logs. Default: 'INFO'
+        address: (host, port) of the collector
+        source: name the collector files the records under. Default: the
+                host name
+        batch_size: number of records sent together
+        flush_interval: seconds between time based sends
+        flush_level: records of this level or above are sent at once
+        compress_level: zlib level the batches are compressed at. None
+                sends them uncompressed
+        max_pending_bytes: maximum size of the unacknowledged messages.
+                When the collector does not keep up or is down, the oldest
+                unsent records are dropped beyond it; log calls never wait
+        max_backoff: maximum seconds between two reconnect attempts
+        timeout: seconds a send or an acknowledgement may wait on the
+                collector before the connection is given up
+    Class extends: BaseLoggerClass
+    """
+    def __init__(self, loglevel='INFO', address=('127.0.0.1', 5140),
+            source=None, batch_size=256, flush_interval=0.2,
+            flush_level='ERROR', compress_level=None,
+            max_pending_bytes=16 * 1024 * 1024, max_backoff=30.0,
+            timeout=5.0):
+        """
+        Constructor to initialize NetworkLogger object and start its thread
+        """
+        if type(loglevel) == type(logging.INFO):
+            self.loglevel = loglevel
+        else:
+            self.loglevel = LOGLEVELS[loglevel]
+        if type(flush_level) != type(logging.INFO):
+            flush_level = LOGLEVELS[flush_level]
+        self.address = tuple(address)
+        self.source = source or socket.gethostname()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.compress_level = compress_level
+        self.max_pending_bytes = max_pending_bytes
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.sock = None
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.pending = collections.deque()
+        self.pending_bytes = 0
+        self.sending = 0
+        self.unacked = collections.deque()
+        self.acked = 0
+        self.acked_at = 0.0
+        self.broken = False
+        self.urgent = False
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run,
+            name='multilogger-network')
+        self.thread.daemon = True
+        self.thread.start()
+        # Bounded by the send timeout, so a missing collector does not hang
+        # the exit
+        call_at_exit(self, 'flush')
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller. Only the message is formed here; the frame is built on
+        the sending thread
+        """
+        text = record.message
+        if record.kwargs and record.exc_text:
+            text = '%s\n%s' % (text, record.exc_text.rstrip())
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+        condition = self.condition
+        condition.acquire()
+        try:
+            self.pending.append((record.created,
+                LEVEL_CODES[record.levelname], text))
+            self.pending_bytes += len(text)
+            while (self.pending_bytes > self.max_pending_bytes and
+                    len(self.pending) > 1):
+                created, code, dropped = self.pending.popleft()
+                self.pending_bytes -= len(dropped)
+                self.dropped += 1
+            if (len(self.pending) >= self.batch_size or
+                    record.levelno >= self.flush_level):
+                self.urgent = True
+                condition.notify()
+        finally:
+            condition.release()
+
+    def run(self):
+        """
+        Method run by the sending thread
+        """
+        condition = self.condition
+        while True:
+            condition.acquire()
+            try:
+                batch = self.next_batch()
+            finally:
+                condition.release()
+            if batch is None:
+                return
+            if not self.send(batch):
+                if self.closed:
+                    return
+                self.wait_retry()
+
+    def next_batch(self):
+        """
+        Method for the sending thread to wait for the next batch to send.
+        Called with the condition held. A batch waits while ACK_WINDOW
+        batches are unacknowledged; a collector not acknowledging any for
+        'timeout' seconds is disconnected. Return: None once closed
+        """
+        condition = self.condition
+        deadline = time.time() + self.flush_interval
+        while True:
+            if self.broken:
+                self.disconnect()
+            if self.closed:
+                return None
+            now = time.time()
+            if not self.pending:
+                deadline = now + self.flush_interval
+                condition.wait(self.flush_interval)
+                continue
+            if not self.urgent and now < deadline:
+                condition.wait(deadline - now)
+                continue
+            if len(self.unacked) >= ACK_WINDOW:
+                if now - self.acked_at >= self.timeout:
+                    self.disconnect()
+                    continue
+                condition.wait(self.acked_at + self.timeout - now)
+                continue
+            self.urgent = False
+            batch = []
+            while self.pending and len(batch) < self.batch_size:
+                batch.append(self.pending.popleft())
+            if len(self.pending) >= self.batch_size:
+                self.urgent = True
+            self.sending = len(batch)
+            return batch
+
+    def wait_retry(self):
+        """
+        Method to sleep until the next reconnect attempt, waking up early
+        on close()
+        """
+        condition = self.condition
+        condition.acquire()
+        try:
+            while not self.closed and time.time() < self.retry_at:
+                condition.wait(self.retry_at - time.time())
+        finally:
+            condition.release()
+
+    def connect(self):
+        """
+        Method to open the connection, say hello and start reading the
+        acknowledgements. Return: False if the collector can not be reached
+        now; the next attempt is then delayed with backoff
+        """
+        if time.time() < self.retry_at:
+            return False
+        try:
+            sock = socket.create_connection(self.address, self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            source = self.source
+            if not isinstance(source, bytes):
+                source = source.encode('utf-8')
+            sock.sendall(encode_frame(source, FLAG_HELLO))
+        except socket.error:
+            self.backoff = min(self.max_backoff, self.backoff * 2 or 0.1)
+            self.retry_at = time.time() + self.backoff
+            return False
+        self.condition.acquire()
+        try:
+            self.sock = sock
+            self.acked = 0
+            self.acked_at = time.time()
+        finally:
+            self.condition.release()
+        self.backoff = 0.0
+        reader = threading.Thread(target=self.read_acks, args=(sock,),
+            name='multilogger-network-acks')
+        reader.daemon = True
+        reader.start()
+        return True
+
+    def disconnect(self):
+        """
+        Method to close the connection and put the unacknowledged batches
+        back in front of the pending records, to be sent again after the
+        reconnect. Called with the condition held
+        """
+        sock = self.sock
+        if sock is not None:
+            self.sock = None
+            try:
+                # Wakes up the recv() of read_acks
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            sock.close()
+        self.broken = False
+        while self.unacked:
+            self.pending.extendleft(reversed(self.unacked.pop()))
+
+    def send(self, batch):
+        """
+        Method to send a batch. Return: True if it was written; on failure
+        the batch and the unacknowledged ones are put back and the
+        connection is reopened later. The collector may then receive a
+        batch twice, it never misses one
+        """
+        frame = encode_batch(batch, self.compress_level)
+        connected = self.sock is not None or self.connect()
+        sent = connected
+        condition = self.condition
+        if connected:
+            sock = self.sock
+            # Counted as unacknowledged before it is written: the
+            # collector's ACK can arrive before sendall() returns
+            condition.acquire()
+            try:
+                if not self.unacked:
+                    self.acked_at = time.time()
+                self.unacked.append(batch)
+                self.sending = 0
+            finally:
+                condition.release()
+            try:
+                sock.sendall(frame)
+            except socket.error:
+                sent = False
+                self.backoff = min(self.max_backoff, self.backoff * 2 or 0.1)
+                self.retry_at = time.time() + self.backoff
+        condition.acquire()
+        try:
+            self.sending = 0
+            if not sent:
+                if not connected:
+                    self.pending.extendleft(reversed(batch))
+                # Puts the unacknowledged batches back in front
+                self.disconnect()
+            condition.notify_all()
+        finally:
+            condition.release()
+        return sent
+
+    def read_acks(self, sock):
+        """
+        Method run per connection to read the acknowledgements: the number
+        of batches the collector handled so far, as ACK frames
+        """
+        received = b''
+        while True:
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                continue
+            except socket.error:
+                data = b''
+            if not data:
+                break
+            received += data
+            count = len(received) // ACK.size
+            if count:
+                acked = ACK.unpack_from(received, (count - 1) * ACK.size)[0]
+                received = received[count * ACK.size:]
+                self.ack(sock, acked)
+        self.condition.acquire()
+        try:
+            if self.sock is sock:
+                self.broken = True
+                self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def ack(self, sock, acked):
+        """
+        Method to release the batches the collector acknowledged
+        """
+        condition = self.condition
+        condition.acquire()
+        try:
+            if self.sock is not sock:
+                return
+            count = (acked - self.acked) % ACK_MODULO
+            self.acked = acked
+            self.acked_at = time.time()
+            for index in range(min(count, len(self.unacked))):
+                batch = self.unacked.popleft()
+                self.sent += len(batch)
+                self.pending_bytes -= sum(len(message)
+                    for created, code, message in batch)
+            condition.notify_all()
+        finally:
+            condition.release()
+
+    def flush(self, timeout=None):
+        """
+        Method to wait until the collector acknowledged every record logged
+        so far, for up to 'timeout' seconds (default: the send timeout).
+        Records not acknowledged by then stay buffered
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.time() + timeout
+        condition = self.condition
+        condition.acquire()
+        try:
+            self.urgent = True
+            condition.notify_all()
+            while ((self.pending or self.sending or self.unacked) and
+                    self.thread.is_alive() and time.time() < deadline):
+                condition.wait(max(0.0, deadline - time.time()))
+        finally:
+            condition.release()
+
+    def close(self):
+        """
+        Method to send the buffered records, stop the sending thread and
+        close the connection. Records the collector did not acknowledge
+        within the send timeout are counted as dropped
+        """
+        cancel_at_exit(self)
+        self.flush()
+        condition = self.condition
+        condition.acquire()
+        try:
+            self.closed = True
+            condition.notify_all()
+        finally:
+            condition.release()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        condition.acquire()
+        try:
+            self.disconnect()
+            self.dropped += len(self.pending)
+            self.pending.clear()
+            self.pending_bytes = 0
+        finally:
+            condition.release()
+
+    def debug(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level DEBUG on this logger
+        """
+        if logging.DEBUG >= self.loglevel:
+            self.emit(LogRecord(logging.DEBUG, 'DEBUG', error_message, args,
+                kwargs))
+
+    def info(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level INFO on this logger
+        """
+        if logging.INFO >= self.loglevel:
+            self.emit(LogRecord(logging.INFO, 'INFO', error_message, args,
+                kwargs))
+
+    def warning(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level WARNING on this logger
+        """
+        if logging.WARNING >= self.loglevel:
+            self.emit(LogRecord(logging.WARNING, 'WARNING', error_message,
+                args, kwargs))
+
+    def error(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level ERROR on this logger
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'ERROR', error_message, args,
+                kwargs))
+
+    def exception(self, error_message, *args):
+        """
+        Logs a message with level ERROR on this logger. Exception info is
+        added to the logging message. This method should only be called
+        from an exception
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'EXCEPTION', error_message,
+                args, {'exc_info': sys.exc_info()}))
+
+    def critical(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level CRITICAL on this logger
+        """
+        if logging.CRITICAL >= self.loglevel:
+            self.emit(LogRecord(logging.CRITICAL, 'CRITICAL', error_message,
+                args, kwargs))
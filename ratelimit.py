@@ -0,0 +1,128 @@
+"""
+Python module to rate limit and sample the records MultiLogger sends to a
+place, so that one noisy loop can not flood the system logger or the
+console. Limits are checked on the LogRecord before its message is formed,
+and the suppressed records are counted and reported periodically in a
+single summary record.
+"""
+
+import logging
+import random
+import time
+
+from base_logger import LogRecord
+
+# Token buckets kept per RateLimiter with per_template. Templates built per
+# call, e.g. with %, would add one each; beyond it they share one bucket
+MAX_TEMPLATE_BUCKETS = 1024
+
+
+class RateLimiter(object):
+    """
+    Class to decide which records of a place & level get through.
+    Init arguments:
+        rate: records per second let through by a token bucket
+        burst: size of the token bucket. Default: rate, at least 1
+        sample_every: let 1 record in every sample_every through
+        sample_rate: let each record through with this probability
+        per_template: keep a separate token bucket for every
+                error_message template, for up to MAX_TEMPLATE_BUCKETS
+                templates. Further templates share one bucket
+    Sampling is applied before the token bucket. Counters are not locked;
+    under threads the limits are approximate.
+    """
+    def __init__(self, rate=None, burst=None, sample_every=None,
+            sample_rate=None, per_template=False):
+        """
+        Constructor to initialize RateLimiter object.
+        """
+        self.rate = rate
+        if burst is None and rate is not None:
+            burst = max(rate, 1)
+        self.burst = burst
+        self.sample_every = sample_every
+        self.sample_rate = sample_rate
+        self.per_template = per_template
+        self.seen = 0
+        self.dropped = 0
+        self.buckets = {}
+
+    def allow(self, record, now):
+        """
+        Return: True if the record may be logged. Only looks at the level,
+        template and time of the record, never at its message
+        """
+        if self.sample_every:
+            self.seen += 1
+            if self.seen % self.sample_every:
+                return False
+        if self.sample_rate is not None and random.random() >= self.sample_rate:
+            return False
+        if self.rate is not None:
+            key = self.per_template and record.error_message or None
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= MAX_TEMPLATE_BUCKETS:
+                    key = None
+                    bucket = self.buckets.get(key)
+                if bucket is None:
+                    bucket = self.buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1
+        return True
+
+
+class SuppressionReporter(object):
+    """
+    Class to count the records suppressed by the RateLimiters of a
+    MultiLogger and report them every 'interval' seconds as one WARNING
+    record, e.g. 'Records suppressed by rate limits, console/DEBUG: 1200'.
+    The report is sent by the next limited log call after the interval, to
+    'places' directly, without rate limits
+    """
+    def __init__(self, interval=60.0):
+        """
+        Constructor to initialize SuppressionReporter object.
+        """
+        self.interval = interval
+        self.report_at = time.time() + interval
+        self.counts = {}
+        self.places = ()
+
+    def limit(self, label, limiter, emit):
+        """
+        Return: emit method of a place wrapped in 'limiter'. Suppressed
+        records are counted under 'label'
+        """
+        def limited_emit(record):
+            now = time.time()
+            if limiter.allow(record, now):
+                emit(record)
+            else:
+                limiter.dropped += 1
+                self.counts[label] = self.counts.get(label, 0) + 1
+            if now >= self.report_at:
+                self.report(now)
+        return limited_emit
+
+    def report(self, now=None):
+        """
+        Method to send the summary record of the records suppressed since
+        the last report, if any
+        """
+        if now is None:
+            now = time.time()
+        self.report_at = now + self.interval
+        counts = self.counts
+        if not counts:
+            return
+        self.counts = {}
+        record = LogRecord(logging.WARNING, 'WARNING',
+            'Records suppressed by rate limits',
+            tuple('%s: %d' % item for item in sorted(counts.items())))
+        for emit in self.places:
+            emit(record)
@@ -0,0 +1,474 @@
+"""
+Python module to send logs to the system logger (rsyslog) over its socket.
+Records are encoded with a syslog header prepared once per log level and
+sent in batches. A missing socket or a full receive buffer never raises
+in the program using it: the socket is reconnected lazily with backoff
+and unsent records wait in a bounded buffer.
+After repeated failures a circuit breaker stops log calls from touching
+the socket at all. With a spool file, the records are then appended to it
+and sent in order by the flush thread once the socket is back.
+Class extends: BaseLoggerClass
+"""
+
+import errno
+import logging
+import os
+import shutil
+import socket
+import struct
+import sys
+import threading
+import time
+
+from logging.handlers import SysLogHandler
+from base_logger import (BaseLoggerClass, LogRecord, PeriodicFlusher,
+    call_at_exit, cancel_at_exit)
+
+LOGLEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'EXCEPTION': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+    'FATAL': logging.FATAL,
+}
+
+PRIORITIES = {
+    'DEBUG': SysLogHandler.LOG_DEBUG,
+    'INFO': SysLogHandler.LOG_INFO,
+    'WARNING': SysLogHandler.LOG_WARNING,
+    'ERROR': SysLogHandler.LOG_ERR,
+    'EXCEPTION': SysLogHandler.LOG_ERR,
+    'CRITICAL': SysLogHandler.LOG_CRIT,
+}
+
+# The send buffer of the socket is full: keep the records and retry later
+RETRY_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS)
+# Seconds an explicit flush() may wait on a full socket. Flushes triggered
+# by a log call never wait
+FLUSH_TIMEOUT = 1.0
+# Length prefix of the records in the spool file
+SPOOL_FRAME = struct.Struct('>I')
+# Records read from the spool file per send while replaying it
+REPLAY_BATCH = 256
+
+
+class SysLogLogger(BaseLoggerClass):
+    """
+    Class to send logs to the system logger in batches. A batch is sent
+    when it holds 'batch_size' records, when a record of 'flush_level' or
+    above is logged and every 'flush_interval' seconds.
+    Init arguments:
+        loglevel: Log Level for logs. Default: 'INFO'
+        facility: syslog facility name or number. Default: 'user'
+        address: path of the syslog socket or a (host, port) tuple for UDP
+        ident: name written before the level in every record
+        batch_size: number of records sent together
+        flush_interval: seconds between time based flushes. None disables
+        flush_level: records of this level or above are sent at once
+        max_pending: maximum number of unsent records kept while the socket
+                is down or full. The oldest are dropped beyond it
+        max_backoff: maximum seconds between two reconnect attempts
+        failure_threshold: failed connects or sends in a row after which
+                the circuit opens: log calls stop using the socket and only
+                the flush thread probes it, with backoff
+        spool_path: file the records are appended to while the circuit is
+                open, or when the pending buffer is full. They are sent in
+                order once the socket is back; records left by a previous
+                run are sent first. Without it records wait in memory
+        spool_max_bytes: maximum size of the unsent records in the spool.
+                Records beyond it are dropped
+    Class extends: BaseLoggerClass
+    """
+    def __init__(self, loglevel='INFO', facility='user', address='/dev/log',
+            ident='root', batch_size=64, flush_interval=0.5,
+            flush_level='ERROR', max_pending=10000, max_backoff=30.0,
+            failure_threshold=3, spool_path=None,
+            spool_max_bytes=64 * 1024 * 1024):
+        """
+        Constructor to initialize SysLogLogger object.
+        """
+        if type(loglevel) == type(logging.INFO):
+            self.loglevel = loglevel
+        else:
+            self.loglevel = LOGLEVELS[loglevel]
+        if type(flush_level) != type(logging.INFO):
+            flush_level = LOGLEVELS[flush_level]
+        if type(facility) != type(SysLogHandler.LOG_USER):
+            facility = SysLogHandler.facility_names[facility]
+        self.facility = facility
+        self.address = address
+        self.batch_size = batch_size
+        self.flush_level = flush_level
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self.headers = {}
+        for levelname, priority in PRIORITIES.items():
+            self.headers[levelname] = '<%d>%s: %s ' % (
+                facility << 3 | priority, ident,
+                levelname == 'EXCEPTION' and 'ERROR' or levelname)
+        self.sock = None
+        self.socktype = None
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.pending = []
+        self.dropped = 0
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self.circuit_open = False
+        self.spool_path = spool_path
+        self.spool_max_bytes = spool_max_bytes
+        self.spool_file = None
+        self.spool_offset = 0
+        self.spool_size = 0
+        self.spooled = 0
+        if spool_path is not None:
+            self.spool_file = open(spool_path, 'ab')
+            self.spool_size = os.path.getsize(spool_path)
+            # Records of a previous run go out before any new one
+            self.circuit_open = self.spool_size > 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        if flush_interval:
+            self.flusher = PeriodicFlusher(self.flush, flush_interval)
+        else:
+            self.flusher = None
+        call_at_exit(self, 'flush')
+
+    def encode(self, record):
+        """
+        Method to return the syslog datagram for a LogRecord
+        """
+        text = repr(record.message)
+        if record.kwargs and record.exc_text:
+            text = '%s\n%s' % (text, record.exc_text.rstrip())
+        frame = self.headers[record.levelname] + text + '\000'
+        if not isinstance(frame, bytes):
+            frame = frame.encode('utf-8')
+        return frame
+
+    def emit(self, record):
+        """
+        Logs a LogRecord shared by MultiLogger. The level check is done by
+        the caller
+        """
+        frame = self.encode(record)
+        self.lock.acquire()
+        try:
+            self.pending.append(frame)
+            full = len(self.pending) >= self.batch_size
+        finally:
+            self.lock.release()
+        if full or record.levelno >= self.flush_level:
+            self.flush(False)
+
+    def connect(self):
+        """
+        Method to open the syslog socket. Return: False if it can not be
+        opened now; the next attempt is then delayed with backoff
+        """
+        if time.time() < self.retry_at:
+            return False
+        if isinstance(self.address, tuple):
+            families = [(socket.AF_INET, socket.SOCK_DGRAM)]
+        else:
+            families = [(socket.AF_UNIX, socket.SOCK_DGRAM),
+                (socket.AF_UNIX, socket.SOCK_STREAM)]
+        for family, socktype in families:
+            sock = socket.socket(family, socktype)
+            try:
+                sock.connect(self.address)
+            except socket.error:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            self.sock = sock
+            self.socktype = socktype
+            return True
+        self.add_failure()
+        return False
+
+    def add_failure(self):
+        """
+        Method to count a failed connect or send, opening the circuit after
+        failure_threshold of them in a row. The next connect is delayed
+        with backoff, which is only reset once a send goes through
+        """
+        self.failures += 1
+        self.backoff = min(self.max_backoff, self.backoff * 2 or 0.1)
+        self.retry_at = time.time() + self.backoff
+        if self.failures >= self.failure_threshold:
+            self.circuit_open = True
+
+    def disconnect(self):
+        """
+        Method to close the syslog socket. It is reopened on the next flush
+        """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def flush(self, wait=True):
+        """
+        Method to send all buffered records. Records that can not be sent
+        stay buffered, up to 'max_pending', or go to the spool file. With
+        wait=False nothing is done if another thread is already sending;
+        the records are then sent by the next flush. While the circuit is
+        open only flushes with wait=True, like those of the flush thread,
+        probe the socket and replay the spool; others spool or keep the
+        records without touching the socket
+        """
+        if not self.flush_lock.acquire(wait):
+            return
+        try:
+            self.lock.acquire()
+            try:
+                pending = self.pending
+                self.pending = []
+            finally:
+                self.lock.release()
+            if self.circuit_open:
+                if not (wait and time.time() >= self.retry_at and
+                        self.replay_spool()):
+                    self.keep(pending)
+                    return
+            if not pending:
+                return
+            if self.sock is not None or self.connect():
+                pending = self.send(pending, wait)
+            if pending:
+                self.keep(pending)
+        finally:
+            self.flush_lock.release()
+
+    def keep(self, frames):
+        """
+        Method to hold on to frames that were not sent: in the spool file
+        while the circuit is open, else back in the pending buffer. When
+        the buffer overflows the oldest frames are spooled, opening the
+        circuit to keep the order, or dropped without a spool file
+        """
+        if self.circuit_open and self.spool_file is not None:
+            self.spool(frames)
+            return
+        self.lock.acquire()
+        try:
+            frames.extend(self.pending)
+            overflow = len(frames) - self.max_pending
+            if overflow > 0:
+                if self.spool_file is not None:
+                    self.circuit_open = True
+                    self.pending = []
+                else:
+                    del frames[:overflow]
+                    self.dropped += overflow
+                    self.pending = frames
+            else:
+                self.pending = frames
+        finally:
+            self.lock.release()
+        if overflow > 0 and self.spool_file is not None:
+            self.spool(frames)
+
+    def spool(self, frames):
+        """
+        Method to append frames to the spool file. Frames that would take
+        the unsent part of the spool over spool_max_bytes are dropped
+        """
+        chunks = []
+        for frame in frames:
+            size = SPOOL_FRAME.size + len(frame)
+            if self.spool_size + size > self.spool_max_bytes:
+                self.dropped += 1
+                continue
+            chunks.append(SPOOL_FRAME.pack(len(frame)))
+            chunks.append(frame)
+            self.spool_size += size
+            self.spooled += 1
+        if chunks:
+            self.spool_file.write(b''.join(chunks))
+            self.spool_file.flush()
+
+    def replay_spool(self):
+        """
+        Method to probe the socket and send the spooled records in order.
+        Return: True if everything was sent; the circuit is then closed and
+        the spool file emptied. The failure count is only reset by a send
+        that goes through, so if the next one fails the circuit opens again
+        with a longer backoff
+        """
+        if self.sock is None and not self.connect():
+            return False
+        if self.spool_size:
+            spool = open(self.spool_path, 'rb')
+            try:
+                spool.seek(self.spool_offset)
+                while True:
+                    frames = []
+                    while len(frames) < REPLAY_BATCH:
+                        header = spool.read(SPOOL_FRAME.size)
+                        if len(header) < SPOOL_FRAME.size:
+                            break
+                        frames.append(spool.read(
+                            SPOOL_FRAME.unpack(header)[0]))
+                    if not frames:
+                        break
+                    unsent = self.send(frames, True)
+                    sent_bytes = (sum(map(len, frames)) -
+                        sum(map(len, unsent)))
+                    for frame in frames:
+                        if sent_bytes < len(frame):
+                            break
+                        sent_bytes -= len(frame)
+                        self.spool_offset += SPOOL_FRAME.size + len(frame)
+                        self.spool_size -= SPOOL_FRAME.size + len(frame)
+                    if unsent:
+                        return False
+            finally:
+                spool.close()
+            self.spool_file.truncate(0)
+            self.spool_offset = 0
+            self.spool_size = 0
+        self.circuit_open = False
+        return True
+
+    def send(self, frames, wait=False):
+        """
+        Method to write frames to the socket. Datagram sockets get one
+        datagram per record; stream sockets get the whole batch in one
+        write. With wait=True a full socket is waited on for up to
+        FLUSH_TIMEOUT seconds. A record too large for a datagram is dropped
+        and counted in 'dropped'. Return: the frames that were not sent
+        """
+        sent = 0
+        if wait:
+            self.sock.settimeout(FLUSH_TIMEOUT)
+        try:
+            try:
+                if self.socktype == socket.SOCK_DGRAM:
+                    send = self.sock.send
+                    for frame in frames:
+                        try:
+                            send(frame)
+                        except socket.error:
+                            if sys.exc_info()[1].errno != errno.EMSGSIZE:
+                                raise
+                            # Larger than a datagram can be: no retry or
+                            # reconnect would send it
+                            self.dropped += 1
+                        sent += 1
+                else:
+                    data = b''.join(frames)
+                    written = self.sock.send(data)
+                    if written < len(data):
+                        return [data[written:]]
+                    sent = len(frames)
+                self.failures = 0
+                self.backoff = 0.0
+            except socket.timeout:
+                pass
+            except socket.error:
+                error = sys.exc_info()[1]
+                if error.errno not in RETRY_ERRORS:
+                    self.disconnect()
+                    self.add_failure()
+        finally:
+            if wait and self.sock is not None:
+                self.sock.setblocking(False)
+        return frames[sent:]
+
+    def close(self):
+        """
+        Method to send the buffered records, stop the time based flush and
+        close the socket
+        """
+        cancel_at_exit(self)
+        if self.flusher is not None:
+            self.flusher.stop()
+        self.flush()
+        self.disconnect()
+        if self.spool_file is not None:
+            # Records not sent stay in the spool for the next run
+            if self.pending:
+                self.spool(self.pending)
+                self.pending = []
+            self.spool_file.close()
+            self.spool_file = None
+            if self.spool_size == 0:
+                os.remove(self.spool_path)
+            elif self.spool_offset:
+                self.compact_spool()
+
+    def compact_spool(self):
+        """
+        Method to remove the records already replayed from the head of the
+        closed spool file, so that the next run does not send them again.
+        The file is replaced in one rename
+        """
+        compacted_path = self.spool_path + '.tmp'
+        spool = open(self.spool_path, 'rb')
+        try:
+            spool.seek(self.spool_offset)
+            compacted = open(compacted_path, 'wb')
+            try:
+                shutil.copyfileobj(spool, compacted)
+                compacted.flush()
+                os.fsync(compacted.fileno())
+            finally:
+                compacted.close()
+        finally:
+            spool.close()
+        os.rename(compacted_path, self.spool_path)
+        self.spool_offset = 0
+
+    def debug(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level DEBUG on this logger
+        """
+        if logging.DEBUG >= self.loglevel:
+            self.emit(LogRecord(logging.DEBUG, 'DEBUG', error_message, args,
+                kwargs))
+
+    def info(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level INFO on this logger
+        """
+        if logging.INFO >= self.loglevel:
+            self.emit(LogRecord(logging.INFO, 'INFO', error_message, args,
+                kwargs))
+
+    def warning(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level WARNING on this logger
+        """
+        if logging.WARNING >= self.loglevel:
+            self.emit(LogRecord(logging.WARNING, 'WARNING', error_message,
+                args, kwargs))
+
+    def error(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level ERROR on this logger
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'ERROR', error_message, args,
+                kwargs))
+
+    def exception(self, error_message, *args):
+        """
+        Logs a message with level ERROR on this logger. Exception info is
+        added to the logging message. This method should only be called
+        from an exception
+        """
+        if logging.ERROR >= self.loglevel:
+            self.emit(LogRecord(logging.ERROR, 'EXCEPTION', error_message,
+                args, {'exc_info': sys.exc_info()}))
+
+    def critical(self, error_message, *args, **kwargs):
+        """
+        Logs a message with level CRITICAL on this logger
+        """
+        if logging.CRITICAL >= self.loglevel:
+            self.emit(LogRecord(logging.CRITICAL, 'CRITICAL', error_message,
+                args, kwargs))
@@ -0,0 +1,95 @@
+"""
+Tests of AsyncMultiLogger: log calls do not block the event loop and the
+futures of flush(), aclose() & aget_email_log() can be awaited.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from asynclogger import AsyncMultiLogger, asyncio
+
+
+class SlowStream(object):
+    """
+    Console stream taking a while for every write
+    """
+    def __init__(self, delay):
+        self.delay = delay
+        self.writes = []
+
+    def write(self, text):
+        time.sleep(self.delay)
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+
+@unittest.skipIf(asyncio is None, 'needs asyncio')
+class AsyncMultiLoggerTest(unittest.TestCase):
+    """
+    A logger with a slow console, used from an event loop
+    """
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.stream = SlowStream(0.02)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def make_logger(self, **kwargs):
+        return AsyncMultiLogger(places={'logger': False, 'email': True,
+            'console': {'stream': self.stream}}, enable_color=False,
+            loop=self.loop, **kwargs)
+
+    def test_default_overflow(self):
+        logger = self.make_logger()
+        self.assertEqual(logger.dispatch_worker.overflow,
+            'drop-low-severity')
+        self.loop.run_until_complete(logger.aclose())
+
+    def test_level_calls_do_not_block(self):
+        logger = self.make_logger(queue_size=5)
+        start = time.time()
+        for index in range(100):
+            logger.info('record %d' % index)
+        self.assertTrue(time.time() - start < 0.5)
+        logger.error('kept')
+        self.loop.run_until_complete(logger.flush())
+        self.assertTrue(logger.dispatch_worker.dropped > 0)
+        self.assertIn('[ERROR] kept\n', self.stream.writes)
+        self.loop.run_until_complete(logger.aclose())
+
+    def test_flush(self):
+        logger = self.make_logger()
+        for index in range(10):
+            logger.info('record %d' % index)
+        self.loop.run_until_complete(logger.flush())
+        self.assertEqual(len(self.stream.writes), 10)
+        self.loop.run_until_complete(logger.aclose())
+
+    def test_aget_email_log(self):
+        logger = self.make_logger()
+        logger.info('first')
+        logger.warning('second')
+        text = self.loop.run_until_complete(logger.aget_email_log(
+            min_level='WARNING'))
+        self.assertNotIn('first', text)
+        self.assertIn('second', text)
+        self.loop.run_until_complete(logger.aclose())
+
+    def test_aclose(self):
+        logger = self.make_logger()
+        logger.info('last')
+        self.loop.run_until_complete(logger.aclose())
+        self.assertEqual(self.stream.writes, ['[INFO] last\n'])
+        self.assertFalse(logger.dispatch_worker.thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
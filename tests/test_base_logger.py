@@ -0,0 +1,150 @@
+"""
+Tests of LogRecord, whose message is formed once when first used, and
+of the traceback cache.
+"""
+
+import logging
+import os
+import sys
+import traceback
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import base_logger
+from base_logger import LogRecord, TracebackCache, form_log_text
+from multilogger import MultiLogger
+
+
+class Stream(object):
+    """
+    Console stream keeping every write
+    """
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+
+def fail(value):
+    """
+    Method raising ValueError(value) from one place
+    """
+    raise ValueError(value)
+
+
+def failure(value):
+    """
+    Return: exc_info of a ValueError raised by fail()
+    """
+    try:
+        fail(value)
+    except ValueError:
+        return sys.exc_info()
+
+
+def chained_failure():
+    """
+    Return: exc_info of a KeyError raised while handling a ValueError
+    """
+    try:
+        try:
+            fail('first')
+        except ValueError:
+            {}['second']
+    except KeyError:
+        return sys.exc_info()
+
+
+class LogRecordTest(unittest.TestCase):
+    """
+    The message & exc_text of a record
+    """
+    def setUp(self):
+        self.formed = []
+        self.form_log_text = base_logger.form_log_text
+
+        def counted_form_log_text(error_message, *args):
+            self.formed.append(error_message)
+            return self.form_log_text(error_message, *args)
+        base_logger.form_log_text = counted_form_log_text
+
+    def tearDown(self):
+        base_logger.form_log_text = self.form_log_text
+
+    def test_message_is_formed_once(self):
+        record = LogRecord(logging.INFO, 'INFO', 'a', ('b', 'c'))
+        self.assertEqual(self.formed, [])
+        self.assertEqual(record.message, 'a, b, c')
+        self.assertEqual(record.message, 'a, b, c')
+        self.assertEqual(self.formed, ['a'])
+
+    def test_non_string_args(self):
+        record = LogRecord(logging.INFO, 'INFO', 'x=%d', (5, None, [1, 2]))
+        self.assertEqual(record.message, 'x=%d, 5, None, [1, 2]')
+        self.assertEqual(form_log_text(3), '3')
+
+    def test_exc_text_is_formatted_once(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = LogRecord(logging.ERROR, 'ERROR', 'failed', (),
+                {'exc_info': True})
+            exc_text = record.exc_text
+        self.assertIn('ValueError: boom', exc_text)
+        self.assertTrue(record.exc_text is exc_text)
+        self.assertEqual(LogRecord(logging.ERROR, 'ERROR', 'failed', (),
+            {}).exc_text, '')
+
+
+class TracebackCacheTest(unittest.TestCase):
+    """
+    Stacks formatted once per failure site
+    """
+    def test_text_matches_traceback_module(self):
+        cache = TracebackCache()
+        for exc_info in (failure('a'), chained_failure()):
+            self.assertEqual(cache.format(exc_info),
+                ''.join(traceback.format_exception(*exc_info)))
+        self.assertEqual(cache.format((None, None, None)), '')
+
+    def test_repeats_hit_the_cache(self):
+        cache = TracebackCache()
+        first = cache.format(failure('a'))
+        second = cache.format(failure('b'))
+        self.assertEqual((cache.misses, cache.hits), (1, 1))
+        self.assertTrue(first.endswith('ValueError: a\n'))
+        self.assertTrue(second.endswith('ValueError: b\n'))
+        self.assertEqual(first[:-2], second[:-2])
+
+    def test_size_is_bounded(self):
+        cache = TracebackCache(size=2)
+        cache.format(failure('a'))
+        cache.format(chained_failure())
+        try:
+            fail('other place')
+        except ValueError:
+            cache.format(sys.exc_info())
+        self.assertEqual(len(cache.stacks), 2)
+        cache.format(failure('a'))
+        self.assertEqual(cache.hits, 0)
+
+    def test_places_share_the_traceback(self):
+        stream = Stream()
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': {'stream': stream}}, enable_color=False)
+        misses = base_logger.traceback_cache.misses
+        try:
+            fail('shared')
+        except ValueError:
+            logger.exception('failed')
+        self.assertEqual(base_logger.traceback_cache.misses - misses, 1)
+        for text in (logger.get_email_log(), ''.join(stream.writes)):
+            self.assertIn('[EXCEPTION] failed', text)
+            self.assertIn('ValueError: shared', text)
+            self.assertIn('in fail', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests of ConsoleLogger: the lines it writes, one by one or buffered.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from consolelogger import ConsoleLogger
+
+
+class Stream(object):
+    """
+    Output stream keeping every write
+    """
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self.writes)
+
+
+class ConsoleLoggerTest(unittest.TestCase):
+    """
+    Writes to the stream
+    """
+    def setUp(self):
+        self.stream = Stream()
+
+    def test_unbuffered_writes_every_line(self):
+        logger = ConsoleLogger('INFO', True, stream=self.stream)
+        logger.info('a')
+        logger.warning('b')
+        # No colors on a stream that is not a terminal
+        self.assertEqual(self.stream.writes, ['[INFO] a\n',
+            '[WARNING] b\n'])
+
+    def test_buffered_lines_are_written_together(self):
+        logger = ConsoleLogger('INFO', False, buffered=True, buffer_size=70,
+            flush_interval=None, stream=self.stream)
+        for index in range(4):
+            logger.info('line %d' % index)
+        self.assertEqual(self.stream.writes, [])
+        logger.info('line 4')
+        self.assertEqual(self.stream.writes, [''.join('[INFO] line %d\n' %
+            index for index in range(5))])
+        logger.close()
+
+    def test_flush_level_writes_at_once(self):
+        logger = ConsoleLogger('INFO', False, buffered=True,
+            flush_interval=None, stream=self.stream)
+        logger.info('a')
+        logger.error('b')
+        self.assertEqual(self.stream.writes, ['[INFO] a\n[ERROR] b\n'])
+        logger.close()
+
+    def test_flush_interval(self):
+        logger = ConsoleLogger('INFO', False, buffered=True,
+            flush_interval=0.05, stream=self.stream)
+        logger.info('a')
+        deadline = time.time() + 2.0
+        while not self.stream.writes and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.stream.getvalue(), '[INFO] a\n')
+        logger.close()
+
+    def test_close_writes_the_rest(self):
+        logger = ConsoleLogger('INFO', False, buffered=True,
+            flush_interval=None, stream=self.stream)
+        logger.info('a')
+        logger.close()
+        self.assertEqual(self.stream.getvalue(), '[INFO] a\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
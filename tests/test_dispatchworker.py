@@ -0,0 +1,121 @@
+"""
+Tests of DispatchWorker: the overflow policies of its queue.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from base_logger import LogRecord
+from dispatchworker import DispatchWorker
+from multilogger import MultiLogger
+
+
+def make_record(levelname, error_message):
+    """
+    Return: LogRecord of the given level
+    """
+    return LogRecord(getattr(logging, levelname), levelname, error_message)
+
+
+class DispatchWorkerTest(unittest.TestCase):
+    """
+    A worker stuck in a slow place with a full queue
+    """
+    def setUp(self):
+        self.gate = threading.Event()
+        self.emitted = []
+        self.places = (self.emit,)
+
+    def emit(self, record):
+        self.gate.wait()
+        self.emitted.append(record.error_message)
+
+    def start_worker(self, overflow):
+        """
+        Return: DispatchWorker with a queue of 3, busy with a first record
+        """
+        worker = DispatchWorker(queue_size=3, overflow=overflow)
+        worker.put(self.places, make_record('INFO', 'first'))
+        deadline = time.time() + 2.0
+        while worker.queue and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(len(worker.queue), 0)
+        return worker
+
+    def finish(self, worker):
+        self.gate.set()
+        worker.flush()
+        worker.close()
+
+    def test_drop_oldest(self):
+        worker = self.start_worker('drop-oldest')
+        for name in ('a', 'b', 'c', 'd'):
+            worker.put(self.places, make_record('INFO', name))
+        self.finish(worker)
+        self.assertEqual(self.emitted, ['first', 'b', 'c', 'd'])
+        self.assertEqual(worker.dropped, 1)
+
+    def test_drop_low_severity(self):
+        worker = self.start_worker('drop-low-severity')
+        worker.put(self.places, make_record('INFO', 'a'))
+        worker.put(self.places, make_record('WARNING', 'b'))
+        worker.put(self.places, make_record('INFO', 'c'))
+        # The new record is below WARNING: it is the one dropped
+        worker.put(self.places, make_record('DEBUG', 'd'))
+        # The oldest record below WARNING makes room
+        worker.put(self.places, make_record('ERROR', 'e'))
+        self.finish(worker)
+        self.assertEqual(self.emitted, ['first', 'b', 'c', 'e'])
+        self.assertEqual(worker.dropped, 2)
+
+    def test_block(self):
+        worker = self.start_worker('block')
+        for name in ('a', 'b', 'c'):
+            worker.put(self.places, make_record('INFO', name))
+        caller = threading.Thread(target=worker.put,
+            args=(self.places, make_record('INFO', 'd')))
+        caller.start()
+        caller.join(0.1)
+        self.assertTrue(caller.is_alive())
+        self.gate.set()
+        caller.join()
+        self.finish(worker)
+        self.assertEqual(self.emitted, ['first', 'a', 'b', 'c', 'd'])
+        self.assertEqual(worker.dropped, 0)
+
+    def test_put_after_close_logs_on_caller(self):
+        self.gate.set()
+        worker = DispatchWorker()
+        worker.close()
+        worker.put(self.places, make_record('INFO', 'late'))
+        self.assertEqual(self.emitted, ['late'])
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, DispatchWorker, 10, 'drop-newest')
+
+
+class BackgroundTest(unittest.TestCase):
+    """
+    MultiLogger with background=True
+    """
+    def test_records_are_logged_in_order(self):
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False}, background=True)
+        for index in range(100):
+            logger.info('record %d' % index)
+        logger.flush()
+        text = logger.get_email_log()
+        self.assertEqual(text.count('record'), 100)
+        self.assertTrue(text.index('record 9\n') < text.index('record 99'))
+        logger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,381 @@
+"""
+Tests of EmailLogger: the record columns, filtered queries and their
+level index across merges, eviction and resets, the size caps, the spill
+file, the compressed attachment and the digest mode.
+"""
+
+import gzip
+import io
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import emaillogger
+from base_logger import LogRecord, form_log_text
+from emaillogger import (EmailLogger, LOGLEVELS, format_time,
+    recover_email_log)
+
+LEVELNAMES = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'EXCEPTION', 'CRITICAL')
+
+
+def gunzip(data):
+    """
+    Return: text of gzip data, all members of it
+    """
+    gzip_file = gzip.GzipFile(fileobj=io.BytesIO(data))
+    try:
+        return gzip_file.read().decode('utf-8')
+    finally:
+        gzip_file.close()
+
+
+def make_record(levelname, error_message, created, *args):
+    """
+    Return: LogRecord of the given level logged at 'created'
+    """
+    return LogRecord(LOGLEVELS[levelname], levelname, error_message, args,
+        None, created)
+
+
+def scan(logger, min_level=None, since=None, until=None, contains=None,
+        limit=None):
+    """
+    Return: positions of the stored records matching the filters, found by
+    looking at every record. What query() has to agree with
+    """
+    if min_level is not None and type(min_level) != type(logging.INFO):
+        min_level = LOGLEVELS[min_level]
+    positions = []
+    for index in range(len(logger.log_args)):
+        code = logger.log_levels[index]
+        created = logger.log_times[index]
+        if min_level is not None and (code == 0 or code < min_level):
+            continue
+        if since is not None and created < since:
+            continue
+        if until is not None and created > until:
+            continue
+        if contains is not None:
+            template = logger.log_templates[index]
+            args = logger.log_args[index]
+            if template is None:
+                message = args
+            else:
+                message = form_log_text(template, *args)
+            if contains not in message:
+                continue
+        positions.append(index)
+    if limit is not None:
+        positions = positions[max(0, len(positions) - limit):]
+    return positions
+
+
+class ColumnarTest(unittest.TestCase):
+    """
+    Records kept as columns and formed when the log is read
+    """
+    def test_text_is_formed_when_read(self):
+        logger = EmailLogger('DEBUG')
+        logger.info('record', 'a')
+        logger.info('record', 'b')
+        self.assertEqual(list(logger.log_templates), ['record', 'record'])
+        self.assertEqual(logger.log_args, [('a',), ('b',)])
+        self.assertTrue(logger._rendered is None)
+        body = logger.get_email_log()[len(logger.log_header):]
+        self.assertEqual(body, '\n[INFO] record, a\n[INFO] record, b')
+        self.assertEqual(logger.log_size, len(body))
+
+    def test_templates_are_shared(self):
+        logger = EmailLogger('DEBUG')
+        for index in range(3):
+            logger.info(''.join(['rec', 'ord']), str(index))
+        templates = logger.log_templates
+        self.assertTrue(templates[0] is templates[1] is templates[2])
+
+    def test_args_that_are_not_strings(self):
+        logger = EmailLogger('DEBUG')
+        items = [1, 2]
+        logger.info('x', items)
+        logger.info('y', 5, None)
+        items.append(3)
+        logger.info('z')
+        body = logger.get_email_log()[len(logger.log_header):]
+        self.assertEqual(body, '\n[INFO] x, [1, 2]\n[INFO] y, 5, None'
+            '\n[INFO] z')
+        self.assertEqual(logger.log_size, len(body))
+
+
+class QueryTest(unittest.TestCase):
+    """
+    query() and the filtered get_email_log() against a full scan
+    """
+    FILTERS = [
+        {},
+        {'min_level': 'WARNING'},
+        {'min_level': 'ERROR'},
+        {'min_level': logging.ERROR + 1},
+        {'since': 1020.0, 'until': 1060.5},
+        {'min_level': 'INFO', 'since': 1010.0},
+        {'contains': 'odd'},
+        {'min_level': 'ERROR', 'contains': 'even', 'limit': 3},
+        {'limit': 5},
+        {'limit': 0},
+    ]
+
+    def setUp(self):
+        self.logger = EmailLogger('DEBUG')
+        for index in range(120):
+            self.log(index)
+
+    def log(self, index, created=None):
+        if created is None:
+            created = 1000.0 + index
+        self.logger.emit(make_record(LEVELNAMES[index % len(LEVELNAMES)],
+            'record %s', created, '%d %s' % (index,
+            index % 2 and 'odd' or 'even')))
+
+    def assertMatchesScan(self):
+        for filters in self.FILTERS:
+            expected = scan(self.logger, **filters)
+            self.assertEqual(self.logger.query(**filters), expected,
+                filters)
+            self.assertEqual(self.logger.get_email_log(**filters),
+                self.logger.log_header + ''.join(self.logger.render(index)
+                    for index in expected), filters)
+
+    def test_query_matches_scan(self):
+        self.assertMatchesScan()
+
+    def test_text_lines_are_kept(self):
+        self.logger.append_log('[ERROR] raw line', logging.ERROR, 1120.5)
+        self.logger.append_log('no level')
+        self.assertMatchesScan()
+        self.assertIn('raw line', self.logger.get_email_log(
+            min_level='ERROR', contains='raw'))
+        self.assertNotIn('no level', self.logger.get_email_log(
+            min_level='DEBUG'))
+
+    def test_index_follows_merge_records(self):
+        self.logger.query(min_level='ERROR')
+        records = [make_record('CRITICAL', 'merged %s', 1050.5 + index,
+            str(index)) for index in range(5)]
+        self.logger.merge_records(records)
+        self.assertMatchesScan()
+        self.assertEqual(self.logger.get_email_log(min_level='CRITICAL',
+            contains='merged').count('merged'), 5)
+
+    def test_index_follows_eviction(self):
+        self.logger = EmailLogger('DEBUG', max_records=60)
+        for index in range(50):
+            self.log(index)
+        self.logger.query(min_level='INFO')
+        for index in range(50, 200):
+            self.log(index)
+            if index % 20 == 0:
+                self.assertMatchesScan()
+        self.assertTrue(self.logger.buffer_stats()['elided'])
+        self.assertMatchesScan()
+
+    def test_index_follows_reset(self):
+        self.logger.query(min_level='WARNING')
+        self.logger.reset_email_log()
+        self.assertEqual(self.logger.query(min_level='WARNING'), [])
+        for index in range(10):
+            self.log(index, 2000.0 + index)
+        self.assertMatchesScan()
+
+    def test_index_follows_clear_records(self):
+        self.logger.query(min_level='WARNING')
+        self.logger.clear_records()
+        self.log(3)
+        self.assertEqual(self.logger.query(min_level='WARNING'), [0])
+
+    def test_query_needs_records_in_memory(self):
+        for options in ({'compress': True}, {'digest': True}):
+            logger = EmailLogger('DEBUG', **options)
+            self.assertRaises(ValueError, logger.query, 'ERROR')
+
+
+class EvictionTest(unittest.TestCase):
+    """
+    The max_bytes & max_records caps
+    """
+    def test_low_levels_stay_under_byte_cap(self):
+        logger = EmailLogger('DEBUG', max_bytes=200)
+        for index in range(5000):
+            logger.debug('debug %d' % index)
+            logger.info('info %d' % index)
+            self.assertTrue(logger.log_size <= 200, logger.log_size)
+        body = logger.get_email_log()[len(logger.log_header):]
+        self.assertEqual(len(body), logger.log_size)
+        self.assertIn('records elided', body)
+        self.assertIn('info 4999', body)
+
+    def test_records_cap(self):
+        logger = EmailLogger('DEBUG', max_records=100)
+        for index in range(3000):
+            logger.debug('debug %d' % index)
+            self.assertTrue(logger.buffer_stats()['records'] <= 100)
+        stats = logger.buffer_stats()
+        self.assertEqual(stats['records'] + stats['elided'], 3000)
+
+    def test_warnings_are_kept(self):
+        logger = EmailLogger('DEBUG', max_bytes=2000)
+        for index in range(500):
+            logger.debug('debug %d' % index)
+            logger.warning('warning %d' % index)
+        body = logger.get_email_log()
+        for index in range(500):
+            self.assertIn('warning %d\n' % index, body + '\n')
+
+    def test_markers_do_not_grow_the_buffer(self):
+        capped = EmailLogger('DEBUG', max_bytes=1000)
+        uncapped = EmailLogger('DEBUG')
+        for logger in (capped, uncapped):
+            for index in range(2000):
+                logger.debug('x')
+                logger.warning('w%d' % index)
+        self.assertTrue(capped.log_size <= uncapped.log_size)
+
+    def test_high_levels_over_cap_rescan_rarely(self):
+        logger = EmailLogger('DEBUG', max_bytes=10000)
+        evictions = []
+        evict_logs = logger.evict_logs
+
+        def counted_evict_logs():
+            evictions.append(logger.log_size)
+            evict_logs()
+        logger.evict_logs = counted_evict_logs
+        for index in range(20000):
+            logger.debug('x')
+            logger.warning('w%d' % index)
+        # The threshold grows by half of the buffer after each eviction
+        self.assertTrue(len(evictions) < 40, len(evictions))
+
+
+
+class SpillTest(unittest.TestCase):
+    """
+    spill_threshold with a spill_path
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.directory, 'spill.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_close_removes_spill_file(self):
+        logger = EmailLogger('DEBUG', spill_threshold=100,
+            spill_path=self.spill_path)
+        for index in range(50):
+            logger.info('line %d' % index)
+        self.assertEqual(logger.get_email_log().count('line'), 50)
+        self.assertTrue(os.path.exists(self.spill_path))
+        logger.close()
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(recover_email_log(self.spill_path), None)
+
+    def test_crash_leaves_every_record(self):
+        script = '\n'.join([
+            'import os, sys',
+            'sys.path.insert(0, %r)' % ROOT,
+            'from emaillogger import EmailLogger',
+            'logger = EmailLogger("DEBUG", spill_threshold=100, '
+                'spill_path=%r)' % self.spill_path,
+            'for index in range(50):',
+            '    logger.info("line %d" % index)',
+            'os._exit(1)',
+        ])
+        subprocess.call([sys.executable, '-c', script])
+        recovered = recover_email_log(self.spill_path)
+        self.assertEqual(recovered.count('line'), 50)
+        self.assertIn('line 49', recovered)
+
+
+class CompressionTest(unittest.TestCase):
+    """
+    The email log as compressed bytes
+    """
+    def fill(self, logger):
+        for index in range(2000):
+            logger.info('line %d' % index)
+        logger.warning('last')
+
+    def test_gzip_matches_email_log(self):
+        logger = EmailLogger('DEBUG')
+        self.fill(logger)
+        chunks = list(logger.iter_compressed_email_log(chunk_size=1024))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(gunzip(b''.join(chunks)), logger.get_email_log())
+
+    def test_compress_mode_uses_stored_stream(self):
+        logger = EmailLogger('DEBUG', compress=True)
+        self.fill(logger)
+        text = logger.get_email_log()
+        self.assertEqual(text.count('line'), 2000)
+        self.assertEqual(gunzip(b''.join(
+            logger.iter_compressed_email_log())), text)
+        # Logging goes on after the stream was read
+        logger.info('later')
+        self.assertIn('later', gunzip(b''.join(
+            logger.iter_compressed_email_log())))
+
+    def test_attachment(self):
+        logger = EmailLogger('DEBUG')
+        self.fill(logger)
+        attachment = logger.get_email_log_attachment('job')
+        self.assertEqual(attachment.get_content_type(), 'application/gzip')
+        self.assertEqual(attachment.get_filename(), 'job.gz')
+        self.assertEqual(gunzip(attachment.get_payload(decode=True)),
+            logger.get_email_log())
+
+    def test_unknown_compressions(self):
+        logger = EmailLogger('DEBUG')
+        self.assertRaises(ValueError, list,
+            logger.iter_compressed_email_log('bzip2'))
+        if emaillogger.zstandard is None:
+            self.assertRaises(ValueError, list,
+                logger.iter_compressed_email_log('zstd'))
+
+
+class DigestTest(unittest.TestCase):
+    """
+    One line per error_message template & level
+    """
+    def test_repeats_are_summarised(self):
+        logger = EmailLogger('DEBUG', digest=True, digest_samples=2)
+        logger.emit(LogRecord(logging.INFO, 'INFO', 'started', (), None,
+            1000.0))
+        for index in range(100):
+            logger.emit(LogRecord(logging.WARNING, 'WARNING', 'retrying',
+                (str(index),), None, 1000.0 + index))
+        logger.emit(LogRecord(logging.ERROR, 'ERROR', 'retrying', ('x',),
+            None, 1200.0))
+        lines = logger.get_email_log()[len(logger.log_header):].split('\n')
+        self.assertEqual(lines[1:], [
+            '[INFO] started',
+            '[WARNING] 100x retrying (first %s, last %s) e.g. retrying, 0 '
+                '| retrying, 1' % (format_time(1000.0), format_time(1099.0)),
+            '[ERROR] retrying, x'])
+        self.assertEqual(logger.buffer_stats()['digest_entries'], 3)
+
+    def test_reset_clears_entries(self):
+        logger = EmailLogger('DEBUG', digest=True)
+        logger.info('a')
+        logger.reset_email_log()
+        logger.info('b')
+        self.assertNotIn('a', logger.get_email_log()[
+            len(logger.log_header):])
+        self.assertIn('[INFO] b', logger.get_email_log())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+Tests of EmailSender against a local SMTP server stand-in: pooled
+connections, digests, counters and the retry of failed mails.
+"""
+
+import email
+import os
+import smtplib
+import socket
+import sys
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from emailsender import EmailSender
+from multilogger import MultiLogger
+from standins import SMTPServer
+
+
+def mail_text(data):
+    """
+    Return: text of a mail as received by the SMTP server stand-in
+    """
+    message = email.message_from_string(data.decode('ascii'))
+    return message['Subject'], message.get_payload(decode=True).decode(
+        'utf-8')
+
+
+class Stderr(object):
+    """
+    Stand-in for sys.stderr keeping what is written
+    """
+    def __init__(self):
+        self.text = []
+
+    def write(self, text):
+        self.text.append(text)
+
+    def flush(self):
+        pass
+
+
+class FlakyEmailSender(EmailSender):
+    """
+    EmailSender whose first 'failures' mails fail as if the server had
+    closed the connection
+    """
+    failures = 1
+
+    def send_mail(self, smtp, subject, text):
+        if self.failures > 0:
+            self.failures -= 1
+            raise smtplib.SMTPServerDisconnected('connection closed')
+        EmailSender.send_mail(self, smtp, subject, text)
+
+
+class EmailSenderTest(unittest.TestCase):
+    """
+    Mails sent from the worker threads
+    """
+    def setUp(self):
+        self.server = SMTPServer().start()
+        self.host, self.port = self.server.address
+        self.stderr = sys.stderr
+        sys.stderr = Stderr()
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        self.server.stop()
+
+    def make_sender(self, cls=EmailSender, **kwargs):
+        return cls('jobs@example.com', ['ops@example.com'], host=self.host,
+            port=self.port, min_level=None, **kwargs)
+
+    def test_counters_from_many_threads(self):
+        sender = self.make_sender(pool_size=4)
+
+        def send():
+            for index in range(25):
+                sender.send('log %d' % index)
+        threads = [threading.Thread(target=send) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sender.flush()
+        sender.close()
+        self.assertEqual(sender.sent, 200)
+        self.assertEqual(sender.failed, 0)
+        self.assertEqual(len(self.server.messages), 200)
+        # Connections are kept open between mails
+        self.assertTrue(sender.connections <= 4, sender.connections)
+        self.assertEqual(sender.connections, self.server.connections)
+
+    def test_digest(self):
+        sender = self.make_sender(digest_interval=60)
+        for index in range(5):
+            sender.send('log %d' % index, 'job %d' % index)
+        sender.flush()
+        sender.close()
+        self.assertEqual(sender.sent, 1)
+        self.assertEqual(len(self.server.messages), 1)
+        subject, text = mail_text(self.server.messages[0])
+        self.assertEqual(subject, 'Logs: 5 logs')
+        self.assertEqual(text.count('log '), 5)
+        self.assertIn('==== job 4 (-) ====', text)
+
+    def test_min_level(self):
+        sender = EmailSender('jobs@example.com', ['ops@example.com'],
+            host=self.host, port=self.port, min_level='ERROR')
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+        logger.info('fine')
+        self.assertFalse(logger.send_email_log(sender))
+        logger.error('failed')
+        self.assertTrue(logger.send_email_log(sender))
+        sender.close()
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_failed_mail_is_retried_on_a_new_connection(self):
+        sender = self.make_sender(FlakyEmailSender, pool_size=1)
+        sender.send('log')
+        sender.flush()
+        sender.close()
+        self.assertEqual((sender.sent, sender.failed), (1, 0))
+        self.assertEqual(sender.connections, 2)
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_mail_failing_twice_is_counted(self):
+        sender = self.make_sender(FlakyEmailSender, pool_size=1)
+        sender.failures = 2
+        sender.send('lost')
+        sender.send('log')
+        sender.flush()
+        sender.close()
+        self.assertEqual((sender.sent, sender.failed), (1, 1))
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertIn('connection closed', ''.join(sys.stderr.text))
+
+    def test_server_down(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        sender = EmailSender('jobs@example.com', ['ops@example.com'],
+            host='127.0.0.1', port=port, min_level=None, timeout=1.0)
+        sender.send('log')
+        sender.flush()
+        sender.close()
+        self.assertEqual((sender.sent, sender.failed), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests of the exit handling: buffered places write out what was logged when
+a program exits without close(), and closed loggers are not kept alive for
+it.
+"""
+
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import base_logger
+from logcollector import LogCollector
+from multilogger import MultiLogger
+from sysloglogger import SysLogLogger
+
+
+def run_script(*lines):
+    """
+    Return: stdout of a Python process running the lines, with the logger
+    modules importable. The process is expected to exit normally
+    """
+    script = '\n'.join(('import sys', 'sys.path.insert(0, %r)' % ROOT) +
+        lines)
+    process = subprocess.Popen([sys.executable, '-c', script],
+        stdout=subprocess.PIPE)
+    output = process.communicate()[0]
+    if process.returncode:
+        raise AssertionError('script exited with %d' % process.returncode)
+    return output.decode('utf-8')
+
+
+class FlushAtExitTest(unittest.TestCase):
+    """
+    Records below flush_level logged just before a normal exit
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_logger(self):
+        path = os.path.join(self.directory, 'app.log')
+        run_script(
+            'from filelogger import FileLogger',
+            'logger = FileLogger("INFO", path=%r, flush_interval=60)' % path,
+            'for index in range(10):',
+            '    logger.info("line %d" % index)')
+        log_file = open(path)
+        try:
+            lines = log_file.readlines()
+        finally:
+            log_file.close()
+        self.assertEqual(len(lines), 10)
+        self.assertIn('line 9', lines[-1])
+
+    def test_network_logger(self):
+        received = []
+        collector = LogCollector(('127.0.0.1', 0),
+            lambda source, records: received.extend(records))
+        collector.start()
+        try:
+            run_script(
+                'from networklogger import NetworkLogger',
+                'logger = NetworkLogger("INFO", address=("127.0.0.1", %d), '
+                    'flush_interval=60)' % collector.address[1],
+                'for index in range(10):',
+                '    logger.info("record %d" % index)')
+        finally:
+            collector.stop()
+        self.assertEqual([message for created, levelname, message in
+            received], ['record %d' % index for index in range(10)])
+
+    def test_buffered_console_logger(self):
+        output = run_script(
+            'from consolelogger import ConsoleLogger',
+            'logger = ConsoleLogger("INFO", False, buffered=True, '
+                'flush_interval=None)',
+            'for index in range(10):',
+            '    logger.info("line %d" % index)')
+        self.assertEqual(output.count('line'), 10)
+
+
+class ExitHooksTest(unittest.TestCase):
+    """
+    The exit hooks of loggers that were closed
+    """
+    def test_closed_loggers_are_released(self):
+        hooks = len(base_logger.exit_hooks)
+        system_loggers = self.system_loggers()
+        for index in range(20):
+            logger = MultiLogger(places={'logger': True, 'email': True,
+                'console': False}, background=True)
+            logger.set_console_logger('INFO', False, buffered=True,
+                flush_interval=0.5, stream=open(os.devnull, 'w'))
+            logger.info('x')
+            logger.close()
+            logger.console_logger.stream.close()
+        del logger
+        self.assertEqual(self.system_loggers(), system_loggers)
+        self.assertEqual(len(base_logger.exit_hooks), hooks)
+
+    def system_loggers(self):
+        gc.collect()
+        return len([obj for obj in gc.get_objects()
+            if isinstance(obj, SysLogLogger)])
+
+
+if __name__ == '__main__':
+    unittest.main()
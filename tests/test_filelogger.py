@@ -0,0 +1,110 @@
+"""
+Tests of FileLogger: batched writes, rotation and reopening.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from filelogger import FileLogger
+
+
+def read_lines(path):
+    """
+    Return: lines of a file, without their line ends
+    """
+    log_file = open(path)
+    try:
+        return log_file.read().splitlines()
+    finally:
+        log_file.close()
+
+
+class FileLoggerTest(unittest.TestCase):
+    """
+    Lines written to a file in a temporary directory
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'app.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lines_are_buffered(self):
+        logger = FileLogger('INFO', path=self.path, flush_interval=None)
+        logger.info('a')
+        logger.debug('hidden')
+        self.assertEqual(os.path.getsize(self.path), 0)
+        logger.error('b')
+        lines = read_lines(self.path)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(' [INFO] a'), lines[0])
+        self.assertTrue(lines[1].endswith(' [ERROR] b'), lines[1])
+        logger.close()
+
+    def test_batch_bytes(self):
+        logger = FileLogger('INFO', path=self.path, batch_bytes=1000,
+            flush_interval=None)
+        for index in range(100):
+            logger.info('line %d' % index)
+        written = len(read_lines(self.path))
+        self.assertTrue(0 < written < 100, written)
+        logger.close()
+        self.assertEqual(len(read_lines(self.path)), 100)
+
+    def test_threads_lose_no_lines(self):
+        logger = FileLogger('INFO', path=self.path, batch_bytes=512,
+            flush_interval=0.01)
+
+        def log(name):
+            for index in range(500):
+                logger.info('%s %d' % (name, index))
+        threads = [threading.Thread(target=log, args=('t%d' % number,))
+            for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.close()
+        lines = read_lines(self.path)
+        self.assertEqual(len(lines), 4000)
+        self.assertEqual(len(set(line.split('] ')[1] for line in lines)),
+            4000)
+
+    def test_rotation(self):
+        logger = FileLogger('INFO', path=self.path, batch_bytes=1,
+            flush_interval=None, max_bytes=1000, backup_count=2)
+        for index in range(300):
+            logger.info('line %d' % index)
+            logger.flush()
+        logger.close()
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        files = [self.path + '.2', self.path + '.1', self.path]
+        lines = []
+        for path in files:
+            self.assertTrue(os.path.getsize(path) <= 1100)
+            lines.extend(read_lines(path))
+        self.assertTrue(lines[-1].endswith('line 299'))
+        numbers = [int(line.rsplit(' ', 1)[1]) for line in lines]
+        self.assertEqual(numbers, list(range(numbers[0], 300)))
+
+    def test_reopen(self):
+        logger = FileLogger('INFO', path=self.path, flush_interval=None)
+        logger.error('before')
+        os.rename(self.path, self.path + '.old')
+        logger.reopen()
+        logger.error('after')
+        logger.close()
+        self.assertEqual(len(read_lines(self.path + '.old')), 1)
+        self.assertTrue(read_lines(self.path)[0].endswith('after'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests of LogAggregator: the parent's email log holds the records of joined
+workers.
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from logaggregator import LogAggregator
+from multilogger import get_logger
+
+
+class SlowDeque(collections.deque):
+    """
+    deque taking a while for every append, like a busy receiving thread
+    """
+    def append(self, item):
+        time.sleep(0.02)
+        collections.deque.append(self, item)
+
+
+def init_worker(client):
+    global logger
+    logger = get_logger(places={'logger': False, 'email': False,
+        'console': False})
+    logger.set_aggregator_client(client)
+
+
+def work(index):
+    for number in range(4):
+        logger.info('worker record %d-%d' % (index, number))
+    logger.flush()
+    return index
+
+
+class LogAggregatorTest(unittest.TestCase):
+    """
+    The documented usage: get_email_log() after pool.join()
+    """
+    def test_joined_workers_are_collected(self):
+        parent = get_logger(places={'logger': False, 'email': True,
+            'console': False}, shared=False)
+        aggregator = LogAggregator(parent)
+        aggregator.received = SlowDeque()
+        pool = multiprocessing.Pool(4, init_worker, (aggregator.client(),))
+        try:
+            pool.map(work, range(100))
+        finally:
+            pool.close()
+            pool.join()
+        try:
+            self.assertEqual(parent.get_email_log().count('worker record'),
+                400)
+        finally:
+            aggregator.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
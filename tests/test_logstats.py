@@ -0,0 +1,152 @@
+"""
+Tests of the counters of logstats, of MultiLogger.stats() and of the call
+site profiler.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import base_logger
+from logstats import ThreadCounter
+from multilogger import MultiLogger
+
+
+def run_threads(target, count=8):
+    """
+    Method to run 'target' on 'count' threads and wait for them
+    """
+    threads = [threading.Thread(target=target) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class ThreadCounterTest(unittest.TestCase):
+    """
+    Counts from many threads, including threads that ended
+    """
+    def test_counts_of_all_threads(self):
+        counter = ThreadCounter()
+
+        def count():
+            for index in range(10000):
+                counter.increment()
+        run_threads(count, 20)
+        counter.increment()
+        self.assertEqual(counter.value(), 200001)
+        # Only the running main thread is left after folding
+        self.assertEqual(len(counter.threads), 1)
+        self.assertEqual(counter.value(), 200001)
+
+
+class StatsTest(unittest.TestCase):
+    """
+    MultiLogger.stats() under threads
+    """
+    def test_levels_and_places(self):
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+
+        def log():
+            for index in range(1000):
+                logger.info('x')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            run_threads(log)
+            stats = logger.stats()
+        self.assertEqual(stats['levels']['INFO'], 8000)
+        self.assertEqual(stats['places']['email']['emitted'], 8000)
+        self.assertEqual(stats['places']['email']['errors'], 0)
+
+
+class ProfilerTest(unittest.TestCase):
+    """
+    MultiLogger.set_profiling()
+    """
+    def setUp(self):
+        self.logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+        self.logger.set_profiling()
+
+    def log_often(self):
+        for index in range(30):
+            self.logger.info('often', str(index))
+
+    def log_rarely(self):
+        self.logger.warning('rarely')
+
+    def test_records_per_call_site(self):
+        self.log_often()
+        self.log_rarely()
+        sites = self.logger.top_call_sites(by='records')
+        self.assertEqual([(site['function'], site['template'],
+            site['records']) for site in sites],
+            [('log_often', 'often', 30), ('log_rarely', 'rarely', 1)])
+        self.assertTrue(sites[0]['site'].startswith(__file__.rstrip('c')))
+        self.assertEqual(sites[1]['bytes'], len('rarely'))
+        self.assertEqual(sites[0]['bytes'], sum(len('often, %d' % index)
+            for index in range(30)))
+
+    def test_messages_are_not_formed(self):
+        formed = []
+        form_log_text = base_logger.form_log_text
+
+        def counted_form_log_text(error_message, *args):
+            formed.append(error_message)
+            return form_log_text(error_message, *args)
+        base_logger.form_log_text = counted_form_log_text
+        try:
+            self.logger.info('x', 'y')
+        finally:
+            base_logger.form_log_text = form_log_text
+        # The email place keeps template & args, nothing formed the message
+        self.assertEqual(formed, [])
+        self.assertEqual(self.logger.top_call_sites()[0]['bytes'], 4)
+
+    def test_switched_off(self):
+        self.log_rarely()
+        self.logger.set_profiling(False)
+        self.log_rarely()
+        self.assertEqual(self.logger.top_call_sites()[0]['records'], 1)
+        self.assertEqual(self.logger.get_email_log().count('rarely'), 2)
+
+    def test_background_mode(self):
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False}, background=True)
+        logger.set_profiling()
+        for index in range(10):
+            logger.info('queued')
+        logger.flush()
+        site = logger.top_call_sites()[0]
+        self.assertEqual((site['records'], site['bytes']), (10, 60))
+        self.assertTrue(site['seconds'] > 0)
+        logger.close()
+
+    def test_dump(self):
+        self.log_often()
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'sites.txt')
+            self.logger.dump_call_sites(path, by='records')
+            report = open(path)
+            try:
+                lines = report.read().splitlines()
+            finally:
+                report.close()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(lines), 3)
+        self.assertIn("log_often() 'often'", lines[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
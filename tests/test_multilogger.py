@@ -0,0 +1,221 @@
+"""
+Tests of MultiLogger: the places it logs in, the records it hands them,
+its dispatch table, the loggers shared by get_logger() and the bound
+loggers of bind().
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import multilogger
+from multilogger import MultiLogger, get_logger
+
+
+class PlacesTest(unittest.TestCase):
+    """
+    The 'places' argument
+    """
+    def test_dictionary_enables_a_place(self):
+        logger = MultiLogger(places={'logger': False, 'email': {},
+            'console': False, 'file': None})
+        self.assertTrue(logger.log_in_email)
+        self.assertTrue(logger.email_logger is not None)
+        self.assertFalse(logger.log_in_file)
+        logger.info('x')
+        self.assertIn('x', logger.get_email_log())
+
+    def test_options_are_passed(self):
+        logger = MultiLogger(places={'logger': False,
+            'email': {'max_records': 10}, 'console': False})
+        self.assertEqual(logger.email_logger.max_records, 10)
+        logger.close()
+
+
+class ListHandler(logging.Handler):
+    """
+    logging handler keeping the messages it is given
+    """
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+        self.records = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.records.append(record)
+
+
+class Unformattable(object):
+    """
+    Log argument failing the test when it is formatted
+    """
+    def __str__(self):
+        raise AssertionError('formatted')
+
+    __repr__ = __str__
+
+
+class RecordTest(unittest.TestCase):
+    """
+    One LogRecord per call, shared by the places
+    """
+    def setUp(self):
+        self.handler = ListHandler()
+        logging.getLogger().addHandler(self.handler)
+
+    def tearDown(self):
+        logging.getLogger().removeHandler(self.handler)
+
+    def test_system_logger_formats_args(self):
+        logger = MultiLogger(places={'logger': True, 'email': False,
+            'console': False})
+        logger.info('x=%d', 5)
+        logger.bind(job='100%').info('y=%s', 'z')
+        self.assertEqual(self.handler.messages, ['x=5', '[job=100%] y=z'])
+
+    def test_no_record_below_the_level(self):
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+        logger.debug('hidden %s', Unformattable())
+        self.assertEqual(logger.email_logger.buffer_stats()['records'], 0)
+
+
+class DispatchTableTest(unittest.TestCase):
+    """
+    The places of every level, after level changes
+    """
+    def setUp(self):
+        self.logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+
+    def test_levels_below_loglevel_are_empty(self):
+        self.assertEqual(self.logger.dispatch_table[logging.DEBUG], ())
+        self.assertTrue(self.logger.dispatch_table[logging.INFO])
+        self.assertFalse(self.logger.is_enabled_for('DEBUG'))
+        self.assertTrue(self.logger.is_enabled_for('INFO'))
+        self.assertTrue(self.logger.is_enabled_for(logging.CRITICAL))
+
+    def test_set_level(self):
+        self.logger.set_level('DEBUG')
+        self.logger.debug('first')
+        self.assertTrue(self.logger.is_enabled_for(logging.DEBUG))
+        self.logger.set_level(logging.ERROR)
+        self.assertEqual(self.logger.email_logger.loglevel, logging.ERROR)
+        self.logger.warning('second')
+        self.logger.error('third')
+        text = self.logger.get_email_log()
+        self.assertIn('first', text)
+        self.assertNotIn('second', text)
+        self.assertIn('third', text)
+
+    def test_place_switched_off(self):
+        self.logger.log_in_email = False
+        self.logger.build_dispatch_table()
+        self.assertFalse(self.logger.is_enabled_for('CRITICAL'))
+        self.logger.critical('dropped')
+        self.assertNotIn('dropped', self.logger.get_email_log())
+
+    def test_table_without_stats(self):
+        logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False}, stats=False)
+        self.assertEqual(logger.dispatch_table[logging.INFO],
+            (logger.email_logger.emit,))
+
+
+class RegistryTest(unittest.TestCase):
+    """
+    get_logger() with shared=True
+    """
+    PLACES = {'logger': False, 'email': True, 'console': False}
+
+    def test_same_arguments_share_a_logger(self):
+        first = get_logger(dict(self.PLACES), 'INFO')
+        second = get_logger(dict(self.PLACES), logging.INFO)
+        self.assertTrue(first is second)
+        self.assertFalse(get_logger(self.PLACES, 'DEBUG') is first)
+        self.assertFalse(get_logger(self.PLACES, shared=False) is first)
+        first.info('shared')
+        self.assertIn('shared', second.get_email_log())
+        get_logger(self.PLACES, 'DEBUG').close()
+        first.close()
+        second.close()
+
+    def test_last_close_removes_the_logger(self):
+        first = get_logger(self.PLACES)
+        second = get_logger(self.PLACES)
+        first.close()
+        self.assertTrue(get_logger(self.PLACES) is second)
+        second.close()
+        second.close()
+        self.assertFalse(first.registry_key in multilogger.logger_registry)
+        third = get_logger(self.PLACES)
+        self.assertFalse(third is first)
+        third.close()
+
+
+class BindTest(unittest.TestCase):
+    """
+    Loggers with bound fields
+    """
+    def setUp(self):
+        self.logger = MultiLogger(places={'logger': False, 'email': True,
+            'console': False})
+
+    def body(self):
+        return self.logger.get_email_log()[len(
+            self.logger.email_logger.log_header):]
+
+    def test_prefix(self):
+        bound = self.logger.bind(request_id=42, job='import')
+        bound.info('served', 'fast')
+        bound.debug('hidden')
+        self.logger.info('unbound')
+        self.assertEqual(self.body(), '\n[INFO] [job=import request_id=42] '
+            'served, fast\n[INFO] unbound')
+        self.assertEqual(bound.fields, {'request_id': 42, 'job': 'import'})
+
+    def test_nested_bind(self):
+        bound = self.logger.bind(a=1, b=2).bind(b=3, c=4)
+        self.assertEqual(bound.context.prefix, '[a=1 b=3 c=4] ')
+        bound.warning('x')
+        self.assertIn('[WARNING] [a=1 b=3 c=4] x', self.body())
+
+    def test_prefixed_templates_are_cached(self):
+        context = self.logger.bind(a=1).context
+        first = context.prefixed(''.join(['tem', 'plate']))
+        self.assertTrue(context.prefixed('template') is first)
+
+    def test_follows_the_logger(self):
+        bound = self.logger.bind(a=1)
+        self.assertFalse(bound.is_enabled_for('DEBUG'))
+        self.logger.set_level('DEBUG')
+        self.assertTrue(bound.is_enabled_for('DEBUG'))
+        bound.debug('shown')
+        bound.close()
+        self.logger.info('still open')
+        self.assertIn('[DEBUG] [a=1] shown', self.body())
+        self.assertIn('still open', self.body())
+
+    def test_fields_reach_the_logging_module(self):
+        handler = ListHandler()
+        logging.getLogger().addHandler(handler)
+        try:
+            logger = MultiLogger(places={'logger': True, 'email': False,
+                'console': False})
+            logger.bind(request_id=42, name='reserved').info('served')
+        finally:
+            logging.getLogger().removeHandler(handler)
+        record = handler.records[0]
+        self.assertEqual(record.request_id, 42)
+        self.assertEqual(record.name, 'root')
+        self.assertEqual(handler.messages,
+            ['[name=reserved request_id=42] served'])
+
+
+if __name__ == '__main__':
+    unittest.main()
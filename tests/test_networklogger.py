@@ -0,0 +1,114 @@
+"""
+Tests of NetworkLogger sending to a LogCollector: acknowledgements,
+redelivery after the collector went away, and the collector's connection
+threads.
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from logcollector import LogCollector
+from networklogger import NetworkLogger
+
+
+def wait_for(condition, timeout=5.0):
+    """
+    Method to wait until condition() is true, for up to 'timeout' seconds
+    """
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class NetworkLoggerTest(unittest.TestCase):
+    """
+    Records shipped over TCP to a collector on a local port
+    """
+    def setUp(self):
+        self.received = []
+        self.collector = LogCollector(('127.0.0.1', 0), self.handle)
+        self.collector.start()
+
+    def tearDown(self):
+        self.collector.stop()
+
+    def handle(self, source, records):
+        self.received.extend(message for created, levelname, message in
+            records)
+
+    def make_logger(self, **kwargs):
+        return NetworkLogger('INFO', address=self.collector.address,
+            flush_interval=0.05, **kwargs)
+
+    def test_records_are_acknowledged(self):
+        for compress_level in (None, 6):
+            del self.received[:]
+            logger = self.make_logger(batch_size=100,
+                compress_level=compress_level)
+            for index in range(1000):
+                logger.info('record %d' % index)
+            logger.flush()
+            self.assertEqual(self.received, ['record %d' % index
+                for index in range(1000)])
+            self.assertEqual(logger.sent, 1000)
+            self.assertEqual(len(logger.unacked), 0)
+            self.assertEqual(logger.pending_bytes, 0)
+            logger.close()
+            self.assertEqual(logger.dropped, 0)
+
+    def test_unacknowledged_records_are_sent_again(self):
+        self.collector.stop()
+        gate = threading.Event()
+        first = []
+
+        def handle_without_ack(source, records):
+            first.extend(records)
+            gate.wait()
+        self.collector = LogCollector(('127.0.0.1', 0), handle_without_ack)
+        self.collector.start()
+        address = self.collector.address
+        logger = self.make_logger(batch_size=5)
+        for index in range(10):
+            logger.info('record %d' % index)
+        wait_for(lambda: first)
+        self.assertTrue(first)
+        # The collector goes away before acknowledging the batch
+        self.collector.lock.acquire()
+        try:
+            connections = list(self.collector.connections)
+        finally:
+            self.collector.lock.release()
+        for sock in connections:
+            sock.shutdown(socket.SHUT_RDWR)
+        gate.set()
+        self.collector.stop()
+        self.assertEqual(logger.sent, 0)
+        self.collector = LogCollector(address, self.handle)
+        self.collector.start()
+        logger.flush()
+        self.assertEqual(self.received, ['record %d' % index
+            for index in range(10)])
+        self.assertEqual(logger.sent, 10)
+        logger.close()
+        self.assertEqual(logger.dropped, 0)
+
+    def test_connection_threads_are_released(self):
+        for index in range(5):
+            logger = self.make_logger()
+            logger.info('record %d' % index)
+            logger.close()
+        wait_for(lambda: not self.collector.threads)
+        self.assertEqual(self.collector.threads, [])
+        self.assertEqual(self.collector.connections, [])
+        self.assertEqual(len(self.received), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
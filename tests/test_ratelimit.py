@@ -0,0 +1,45 @@
+"""
+Tests of RateLimiter.
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from base_logger import LogRecord
+from ratelimit import MAX_TEMPLATE_BUCKETS, RateLimiter
+
+
+def make_record(error_message):
+    """
+    Return: INFO LogRecord with the given template
+    """
+    return LogRecord(logging.INFO, 'INFO', error_message, ())
+
+
+class RateLimiterTest(unittest.TestCase):
+    """
+    Token buckets per template
+    """
+    def test_buckets_per_template(self):
+        limiter = RateLimiter(rate=1, per_template=True)
+        self.assertTrue(limiter.allow(make_record('a'), 100.0))
+        self.assertFalse(limiter.allow(make_record('a'), 100.0))
+        self.assertTrue(limiter.allow(make_record('b'), 100.0))
+        self.assertTrue(limiter.allow(make_record('a'), 101.0))
+
+    def test_templates_beyond_cap_share_a_bucket(self):
+        limiter = RateLimiter(rate=1, per_template=True)
+        allowed = 0
+        for index in range(MAX_TEMPLATE_BUCKETS * 10):
+            allowed += limiter.allow(make_record('id %d' % index), 100.0)
+        self.assertEqual(len(limiter.buckets), MAX_TEMPLATE_BUCKETS + 1)
+        self.assertEqual(allowed, MAX_TEMPLATE_BUCKETS + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
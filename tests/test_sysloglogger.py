@@ -0,0 +1,201 @@
+"""
+Tests of SysLogLogger: records sent to a syslog socket, the circuit
+breaker's backoff and the spool file's replay.
+"""
+
+import errno
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from multilogger import MultiLogger
+from standins import UnixDatagramServer
+from sysloglogger import SysLogLogger
+
+
+class FakeSocket(object):
+    """
+    Datagram socket keeping what is sent to it. After 'budget' frames every
+    send fails with 'error'
+    """
+    def __init__(self, budget, error):
+        self.budget = budget
+        self.error = error
+        self.sent = []
+
+    def send(self, data):
+        if self.budget is not None and len(self.sent) >= self.budget:
+            raise socket.error(self.error, os.strerror(self.error))
+        self.sent.append(data)
+        return len(data)
+
+    def settimeout(self, timeout):
+        pass
+
+    def setblocking(self, blocking):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSysLogLogger(SysLogLogger):
+    """
+    SysLogLogger connecting to FakeSockets. 'budget' & 'error' are used for
+    the next socket; 'sent' collects the frames of all sockets
+    """
+    budget = None
+    error = errno.ECONNRESET
+
+    def connect(self):
+        if time.time() < self.retry_at:
+            return False
+        self.connects = getattr(self, 'connects', 0) + 1
+        self.sock = FakeSocket(self.budget, self.error)
+        self.socktype = socket.SOCK_DGRAM
+        return True
+
+    def disconnect(self):
+        if self.sock is not None:
+            self.sent = getattr(self, 'sent', []) + self.sock.sent
+            self.sock = None
+
+
+def messages(frames):
+    """
+    Return: the messages of syslog frames, e.g. 'r1' of "<14>root: INFO 'r1'"
+    """
+    return [frame.decode('utf-8').rstrip('\0').split("'")[1]
+        for frame in frames]
+
+
+class SysLogLoggerTest(unittest.TestCase):
+    """
+    Delivery of the records logged, also when they can not be sent as
+    they are logged
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool_path = os.path.join(self.directory, 'spool')
+
+    def tearDown(self):
+        FakeSysLogLogger.budget = None
+        FakeSysLogLogger.error = errno.ECONNRESET
+        shutil.rmtree(self.directory)
+
+    def test_oversized_record_is_dropped(self):
+        server = UnixDatagramServer(os.path.join(self.directory,
+            'log.sock')).start()
+        try:
+            logger = SysLogLogger('INFO', address=server.path,
+                flush_interval=None)
+            logger.info('before')
+            logger.error('x' * (4 * 1024 * 1024))
+            for index in range(20):
+                logger.info('after %d' % index)
+            logger.flush()
+            deadline = time.time() + 2.0
+            while server.received < 21 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(server.received, 21)
+            self.assertEqual(logger.dropped, 1)
+            self.assertEqual(logger.failures, 0)
+            self.assertEqual(logger.pending, [])
+            logger.close()
+        finally:
+            server.stop()
+
+    def test_multilogger_with_facility(self):
+        server = UnixDatagramServer(os.path.join(self.directory,
+            'log.sock')).start()
+        try:
+            logger = MultiLogger(places={'logger': False, 'email': False,
+                'console': False})
+            logger.set_system_logger('INFO', 'user', address=server.path,
+                flush_interval=None)
+            logger.info('x=%s', 1)
+            logger.flush()
+            deadline = time.time() + 2.0
+            while server.received < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(server.received, 1)
+            system_logger = logger.system_logger
+            logger.set_system_logger('INFO')
+            self.assertTrue(system_logger.sock is None)
+            # The root logger of the logging module has nothing to close
+            logger.set_system_logger('INFO')
+            logger.close()
+        finally:
+            server.stop()
+
+    def test_backoff_grows_while_sends_fail(self):
+        FakeSysLogLogger.budget = 0
+        FakeSysLogLogger.error = errno.ECONNRESET
+        logger = FakeSysLogLogger('INFO', flush_interval=None,
+            max_backoff=0.4)
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            logger.info('x')
+            logger.flush()
+            time.sleep(0.005)
+        self.assertTrue(logger.circuit_open)
+        # Connects at about 0, 0.1, 0.3, 0.7: not once per flush
+        self.assertTrue(logger.connects <= 6, logger.connects)
+        self.assertEqual(logger.backoff, 0.4)
+
+    def test_spool_is_replayed_in_order(self):
+        FakeSysLogLogger.budget = 0
+        FakeSysLogLogger.error = errno.ECONNRESET
+        logger = FakeSysLogLogger('INFO', flush_interval=None,
+            failure_threshold=1, spool_path=self.spool_path)
+        for index in range(10):
+            logger.info('r%d' % index)
+            logger.flush()
+        self.assertEqual(logger.spooled, 10)
+        FakeSysLogLogger.budget = None
+        logger.retry_at = 0.0
+        logger.info('r10')
+        logger.flush()
+        logger.disconnect()
+        self.assertEqual(messages(logger.sent),
+            ['r%d' % index for index in range(11)])
+        self.assertFalse(logger.circuit_open)
+        logger.close()
+        self.assertFalse(os.path.exists(self.spool_path))
+
+    def test_next_run_replays_only_unsent_records(self):
+        FakeSysLogLogger.budget = 0
+        FakeSysLogLogger.error = errno.ECONNRESET
+        logger = FakeSysLogLogger('INFO', flush_interval=None,
+            failure_threshold=1, spool_path=self.spool_path)
+        for index in range(10):
+            logger.info('r%d' % index)
+            logger.flush()
+        # The socket takes 4 records, then is full
+        FakeSysLogLogger.budget = 4
+        FakeSysLogLogger.error = errno.EAGAIN
+        logger.retry_at = 0.0
+        logger.flush()
+        logger.close()
+        self.assertEqual(messages(logger.sent), ['r0', 'r1', 'r2', 'r3'])
+        FakeSysLogLogger.budget = None
+        logger = FakeSysLogLogger('INFO', flush_interval=None,
+            spool_path=self.spool_path)
+        logger.flush()
+        logger.close()
+        self.assertEqual(messages(logger.sent),
+            ['r%d' % index for index in range(4, 10)])
+        self.assertFalse(os.path.exists(self.spool_path))
+
+
+
+if __name__ == '__main__':
+    unittest.main()